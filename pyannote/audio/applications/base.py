@@ -39,9 +39,7 @@ from glob import glob
 from pyannote.database import FileFinder
 from pyannote.database import get_protocol
 from pyannote.audio.util import mkdir_p
-from pyannote.audio.features.utils import get_audio_duration
 from sortedcontainers import SortedDict
-import tensorboardX
 from functools import partial
 from pyannote.core.utils.helper import get_class_by_name
 import warnings
@@ -87,6 +85,9 @@ class Application:
         training : boolean, optional
             When False, data augmentation is disabled.
         """
+        from pyannote.audio.features.utils import get_audio_duration
+        from pyannote.audio.features import CachedFeatureExtraction
+
         self.experiment_dir = experiment_dir
         self.device = None
         self.task_ = None
@@ -179,6 +180,17 @@ class Application:
                 **self.config_['feature_extraction'].get('params', {}),
                 augmentation=augmentation)
 
+            # feature_extraction:
+            #    name: LibrosaMFCC
+            #    cache:
+            #       cache_dir: /path/to/cache
+            #       max_size: 10737418240  # bytes
+            #       use_memmap: False
+            if 'cache' in self.config_['feature_extraction']:
+                self.feature_extraction_ = CachedFeatureExtraction(
+                    self.feature_extraction_,
+                    **self.config_['feature_extraction']['cache'])
+
 
     def train(self, protocol_name, subset='train', restart=0, epochs=1000):
         """Trainer model
@@ -313,7 +325,8 @@ class Application:
 
         params_yml = validate_dir / 'params.yml'
         validate_dir.mkdir(parents=True, exist_ok=False)
-        writer = tensorboardX.SummaryWriter(logdir=str(validate_dir))
+        from tensorboardX import SummaryWriter
+        writer = SummaryWriter(logdir=str(validate_dir))
 
         validation_data = self.validate_init(protocol_name, subset=subset,
                                              **kwargs)
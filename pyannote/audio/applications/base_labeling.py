@@ -89,7 +89,8 @@ class BaseLabeling(Application):
 
         return validation_data
 
-    def apply(self, protocol_name, output_dir, step=None, subset=None):
+    def apply(self, protocol_name, output_dir, step=None, subset=None,
+              dtype=None, quantization=None):
 
         model = self.model_.to(self.device)
         model.eval()
@@ -115,7 +116,9 @@ class BaseLabeling(Application):
         precomputed = Precomputed(
             root_dir=output_dir,
             sliding_window=sliding_window,
-            labels=model.classes)
+            labels=model.classes,
+            dtype=dtype,
+            quantization=quantization)
 
         # file generator
         protocol = get_protocol(protocol_name, progress=True,
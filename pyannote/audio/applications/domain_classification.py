@@ -32,7 +32,7 @@ Domain classification
 Usage:
   pyannote-domain-classification train [options] <experiment_dir> <database.task.protocol>
   pyannote-domain-classification validate [options] [--every=<epoch> --chronological] <train_dir> <database.task.protocol>
-  pyannote-domain-classification apply [options] [--step=<step>] <model.pt> <database.task.protocol> <output_dir>
+  pyannote-domain-classification apply [options] [--step=<step> --dtype=<dtype> --quantization=<quantization>] <model.pt> <database.task.protocol> <output_dir>
   pyannote-domain-classification -h | --help
   pyannote-domain-classification --version
 
@@ -67,6 +67,12 @@ Common options:
   <model.pt>                 Path to the pretrained model.
   --step=<step>              Sliding window step, in seconds.
                              Defaults to 25% of window duration.
+  --dtype=<dtype>            Store raw scores with reduced precision (e.g.
+                             "float16"). Defaults to full precision.
+  --quantization=<quantization>
+                             Store raw scores as "uint8" or "uint16" with
+                             per-file and per-dimension linear quantization.
+                             Defaults to no quantization.
 
 Configuration file:
     The configuration of each experiment is described in a file called
@@ -341,4 +347,8 @@ def main():
             model_pt, db_yml=db_yml, training=False)
         application.device = device
         application.batch_size = batch_size
-        application.apply(protocol_name, output_dir, step=step, subset=subset)
+        dtype = arguments['--dtype']
+        quantization = arguments['--quantization']
+
+        application.apply(protocol_name, output_dir, step=step, subset=subset,
+                          dtype=dtype, quantization=quantization)
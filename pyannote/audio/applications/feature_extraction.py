@@ -30,7 +30,7 @@
 Feature extraction
 
 Usage:
-  pyannote-speech-feature [--robust --parallel --database=<database.yml>] <experiment_dir> <database.task.protocol>
+  pyannote-speech-feature [--robust --parallel --jobs=<n_jobs> --shard=<i/N> --storage=<storage> --dtype=<dtype> --quantization=<quantization> --database=<database.yml>] <experiment_dir> <database.task.protocol>
   pyannote-speech-feature check [--database=<database.yml>] <experiment_dir> <database.task.protocol>
   pyannote-speech-feature -h | --help
   pyannote-speech-feature --version
@@ -44,6 +44,28 @@ Options:
   --database=<database.yml>  Path to pyannote.database configuration file.
   --robust                   When provided, skip files for which feature extraction fails.
   --parallel                 When provided, process files in parallel.
+  --jobs=<n_jobs>            Number of worker processes used by --parallel.
+                             Defaults to the number of CPUs.
+  --shard=<i/N>              Only process the i-th (1-indexed) of N disjoint
+                             shards of the protocol files. Files are assigned
+                             to shards deterministically (based on their URI)
+                             so that extraction can be split across machines.
+                             Defaults to processing all files.
+  --storage=<storage>        Store features of each file into its own .npy
+                             file ("npy") or pack them into a few large shard
+                             files ("shards"), which is recommended for
+                             collections of (hundreds of) thousands of files.
+                             Only used when <experiment_dir> does not contain
+                             features yet. Defaults to "npy".
+  --dtype=<dtype>            Store features with reduced precision (e.g.
+                             "float16"). Only used when <experiment_dir> does
+                             not contain features yet. Defaults to storing
+                             features as they are extracted.
+  --quantization=<quantization>
+                             Store features as "uint8" or "uint16" with
+                             per-file and per-dimension linear quantization.
+                             Only used when <experiment_dir> does not contain
+                             features yet. Defaults to no quantization.
   -h --help                  Show this screen.
   --version                  Show version.
 
@@ -63,12 +85,23 @@ Configuration file:
           DD: True                   # energy derivatives
     ...................................................................
 
+Resuming and failures:
+    URIs of successfully processed files are appended to a completion
+    manifest (<experiment_dir>/manifest.<i>of<N>.txt) so that restarting the
+    extraction (with any sharding) skips them without checking their output.
+    Failures are appended to <experiment_dir>/failures.<i>of<N>.jsonl with one
+    JSON record (uri, error, message, time) per line.
+
 """
 
+import io
+import json
+import time
 import yaml
 import os.path
+import hashlib
 import numpy as np
-import functools
+from pathlib import Path
 from docopt import docopt
 
 from pyannote.database import FileFinder
@@ -84,6 +117,10 @@ from pyannote.audio.features.precomputed import PyannoteFeatureExtractionError
 from multiprocessing import cpu_count, Pool
 
 
+# number of files sent at once to each worker process
+CHUNKSIZE = 4
+
+
 def init_feature_extraction(experiment_dir):
 
     # load configuration file
@@ -99,69 +136,152 @@ def init_feature_extraction(experiment_dir):
 
     return feature_extraction
 
+
+def parse_shard(shard):
+    """Parse "i/N" shard specification
+
+    Returns
+    -------
+    i, N : int
+        0-indexed shard index and number of shards.
+    """
+
+    if shard is None:
+        return 0, 1
+
+    try:
+        i, n_shards = (int(x) for x in shard.split('/'))
+    except ValueError:
+        msg = f'"shard" must be provided as "i/N" (is: "{shard}").'
+        raise ValueError(msg)
+
+    if not (n_shards > 0 and 1 <= i <= n_shards):
+        msg = f'"shard" must satisfy 1 <= i <= N (is: "{shard}").'
+        raise ValueError(msg)
+
+    return i - 1, n_shards
+
+
+def get_shard(uri, n_shards):
+    """Deterministically assign URI to one of `n_shards` shards
+
+    Unlike built-in `hash`, this does not depend on the Python process.
+    """
+    digest = hashlib.md5(uri.encode('utf-8')).hexdigest()
+    return int(digest, 16) % n_shards
+
+
+def load_manifests(experiment_dir):
+    """Get URIs of files already processed (by any shard)"""
+    done = set()
+    for manifest in Path(experiment_dir).glob('manifest.*.txt'):
+        with io.open(manifest, 'r') as f:
+            done.update(line.strip() for line in f)
+    done.discard('')
+    return done
+
+
 def process_current_file(current_file, file_finder=None, precomputed=None,
                          feature_extraction=None, robust=False):
+    """Extract and dump features of one file
+
+    Returns
+    -------
+    status : {'done', 'skipped', 'failed'}
+    info : float or (str, str) tuple
+        Duration of audio (in seconds) when features were extracted,
+        (error type, message) when they were not.
+    """
+
+    uri = get_unique_identifier(current_file)
 
     try:
         current_file['audio'] = file_finder(current_file)
     except ValueError as e:
         if not robust:
             raise PyannoteFeatureExtractionError(*e.args)
-        return e
-
-    uri = get_unique_identifier(current_file)
-    path = precomputed.get_path(current_file)
+        return 'failed', (e.__class__.__name__, str(e))
 
-    if os.path.exists(path):
-        return
+    if current_file in precomputed:
+        return 'skipped', 0.
 
     try:
         features = feature_extraction(current_file)
     except PyannoteFeatureExtractionError as e:
-        msg = 'Feature extraction failed for file "{uri}".'
-        return msg.format(uri=uri)
+        msg = f'Feature extraction failed for file "{uri}".'
+        return 'failed', (e.__class__.__name__, msg)
+    except Exception as e:
+        if not robust:
+            raise e
+        return 'failed', (e.__class__.__name__, str(e))
 
     if features is None:
-        msg = 'Feature extraction returned None for file "{uri}".'
-        return msg.format(uri=uri)
+        msg = f'Feature extraction returned None for file "{uri}".'
+        return 'failed', ('PyannoteFeatureExtractionError', msg)
 
     if np.any(np.isnan(features.data)):
-        msg = 'Feature extraction returned NaNs for file "{uri}".'
-        return msg.format(uri=uri)
+        msg = f'Feature extraction returned NaNs for file "{uri}".'
+        return 'failed', ('PyannoteFeatureExtractionError', msg)
 
     precomputed.dump(current_file, features)
 
-    return
+    return 'done', features.getExtent().duration
+
+
+# feature extraction state of current (worker) process
+# see init_worker and helper_extract
+_worker = {}
 
 
-def helper_extract(current_file, file_finder=None, experiment_dir=None,
-                   config_yml=None, feature_extraction=None,
-                   robust=False):
+def init_worker(experiment_dir, file_finder=None, robust=False):
+    """Initialize feature extraction once per worker process"""
+    _worker['feature_extraction'] = init_feature_extraction(experiment_dir)
+    _worker['precomputed'] = Precomputed(root_dir=experiment_dir)
+    _worker['file_finder'] = file_finder
+    _worker['robust'] = robust
 
-    if feature_extraction is None:
-        feature_extraction = init_feature_extraction(experiment_dir)
 
-    precomputed = Precomputed(root_dir=experiment_dir)
-    return process_current_file(current_file, file_finder=file_finder,
-                                precomputed=precomputed,
-                                feature_extraction=feature_extraction,
-                                robust=robust)
+def helper_extract(current_file):
+    uri = get_unique_identifier(current_file)
+    status, info = process_current_file(
+        current_file, file_finder=_worker['file_finder'],
+        precomputed=_worker['precomputed'],
+        feature_extraction=_worker['feature_extraction'],
+        robust=_worker['robust'])
+    return uri, status, info
 
 
 def extract(protocol_name, file_finder, experiment_dir,
-            robust=False, parallel=False):
-    protocol = get_protocol(protocol_name, progress=False)
+            robust=False, parallel=False, n_jobs=None, shard=None,
+            storage='npy', dtype=None, quantization=None):
+    """Extract features of all files of a protocol
+
+    Parameters
+    ----------
+    protocol_name : str
+    file_finder : `pyannote.database.FileFinder`
+    experiment_dir : str
+    robust : bool, optional
+        Skip (and log) files for which feature extraction fails.
+    parallel : bool, optional
+        Process files with a pool of `n_jobs` worker processes.
+    n_jobs : int, optional
+        Defaults to the number of CPUs.
+    shard : str, optional
+        Only process i-th shard out of N, given as "i/N".
+    storage : {'npy', 'shards'}, optional
+        Storage backend. Defaults to 'npy'. See `Precomputed`.
+    dtype : str, optional
+        Reduced-precision storage data type. See `Precomputed`.
+    quantization : {'uint8', 'uint16'}, optional
+        Quantized storage. See `Precomputed`.
+    """
+
+    shard_index, n_shards = parse_shard(shard)
 
-    # load configuration file
-    config_yml = experiment_dir + '/config.yml'
-    with open(config_yml, 'r') as fp:
-        config = yaml.load(fp, Loader=yaml.SafeLoader)
+    protocol = get_protocol(protocol_name, progress=False)
 
-    FeatureExtraction = get_class_by_name(
-        config['feature_extraction']['name'],
-        default_module_name='pyannote.audio.features')
-    feature_extraction = FeatureExtraction(
-        **config['feature_extraction'].get('params', {}))
+    feature_extraction = init_feature_extraction(experiment_dir)
 
     sliding_window = feature_extraction.sliding_window
     dimension = feature_extraction.dimension
@@ -171,36 +291,87 @@ def extract(protocol_name, file_finder, experiment_dir,
 
     precomputed = Precomputed(root_dir=experiment_dir,
                               sliding_window=sliding_window,
-                              dimension=dimension)
-
-    if parallel:
+                              dimension=dimension,
+                              storage=storage,
+                              dtype=dtype,
+                              quantization=quantization)
+
+    # restart where previous runs stopped
+    done = load_manifests(experiment_dir)
+
+    def files():
+        for current_file in FileFinder.protocol_file_iter(
+            protocol, extra_keys=['audio']):
+            uri = get_unique_identifier(current_file)
+            if uri in done:
+                continue
+            if get_shard(uri, n_shards) != shard_index:
+                continue
+            # do not process the same file twice
+            # (files may be shared by several subsets)
+            done.add(uri)
+            yield current_file
 
-        extract_one = functools.partial(helper_extract,
-                                        file_finder=file_finder,
-                                        experiment_dir=experiment_dir,
-                                        config_yml=config_yml,
-                                        robust=robust)
+    suffix = f'{shard_index + 1:d}of{n_shards:d}'
+    manifest_txt = f'{experiment_dir}/manifest.{suffix}.txt'
+    failures_jsonl = f'{experiment_dir}/failures.{suffix}.jsonl'
 
-        n_jobs = cpu_count()
-        pool = Pool(n_jobs)
-        imap = pool.imap
+    if parallel:
+        n_jobs = cpu_count() if n_jobs is None else n_jobs
+        pool = Pool(n_jobs, initializer=init_worker,
+                    initargs=(experiment_dir, file_finder, robust))
+        results = pool.imap_unordered(helper_extract, files(),
+                                      chunksize=CHUNKSIZE)
 
     else:
+        pool = None
+        init_worker(experiment_dir, file_finder=file_finder, robust=robust)
+        results = map(helper_extract, files())
 
-        feature_extraction = init_feature_extraction(experiment_dir)
-        extract_one = functools.partial(helper_extract,
-                                        file_finder=file_finder,
-                                        experiment_dir=experiment_dir,
-                                        feature_extraction=feature_extraction,
-                                        robust=robust)
-        imap = map
+    n_files, n_skipped, n_failed, total_duration = 0, 0, 0, 0.
+    t_start = time.time()
 
+    try:
+        with io.open(manifest_txt, 'a') as manifest, \
+             io.open(failures_jsonl, 'a') as failures:
+
+            for uri, status, info in results:
+
+                if status == 'failed':
+                    n_failed += 1
+                    error, message = info
+                    record = {'uri': uri,
+                              'error': error,
+                              'message': message,
+                              'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+                    failures.write(json.dumps(record) + '\n')
+                    failures.flush()
+                    continue
+
+                if status == 'skipped':
+                    n_skipped += 1
+                else:
+                    n_files += 1
+                    total_duration += info
+
+                manifest.write(uri + '\n')
+                manifest.flush()
+
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+    elapsed = max(time.time() - t_start, 1e-6)
+    msg = (
+        f'Processed {n_files:d} files ({total_duration / 3600:.2f} hours) '
+        f'in {elapsed:.1f}s: {n_files / elapsed:.2f} files/s, '
+        f'{total_duration / 3600 / elapsed:.4f} audio-hours/s '
+        f'({n_skipped:d} already processed, {n_failed:d} failed).'
+    )
+    print(msg)
+    if n_failed:
+        print(f'See "{failures_jsonl}" for details about failures.')
 
-    for result in imap(extract_one, FileFinder.protocol_file_iter(
-        protocol, extra_keys=['audio'])):
-        if result is None:
-            continue
-        print(result)
 
 def check(protocol_name, file_finder, experiment_dir):
 
@@ -258,5 +429,15 @@ def main():
     else:
         robust = arguments['--robust']
         parallel = arguments['--parallel']
+        n_jobs = arguments['--jobs']
+        if n_jobs is not None:
+            n_jobs = int(n_jobs)
+        shard = arguments['--shard']
+        storage = arguments['--storage']
+        if storage is None:
+            storage = 'npy'
+        dtype = arguments['--dtype']
+        quantization = arguments['--quantization']
         extract(protocol_name, file_finder, experiment_dir,
-                robust=robust, parallel=parallel)
+                robust=robust, parallel=parallel, n_jobs=n_jobs, shard=shard,
+                storage=storage, dtype=dtype, quantization=quantization)
@@ -32,7 +32,7 @@ Multi-label classifier
 Usage: 
   pyannote-multilabel train [options] <experiment_dir> <database.task.protocol>
   pyannote-multilabel validate [options] [--every=<epoch> --chronological --precision=<precision> --detection] <label> <train_dir> <database.task.protocol>
-  pyannote-multilabel apply [options] [--step=<step>] <model.pt> <database.task.protocol> <output_dir>
+  pyannote-multilabel apply [options] [--step=<step> --dtype=<dtype> --quantization=<quantization>] <model.pt> <database.task.protocol> <output_dir>
   pyannote-multilabel -h | --help
   pyannote-multilabel --version
 
@@ -73,6 +73,12 @@ Common options:
   <model.pt>                 Path to the pretrained model.
   --step=<step>              Sliding window step, in seconds.
                              Defaults to 25% of window duration.
+  --dtype=<dtype>            Store raw scores with reduced precision (e.g.
+                             "float16"). Defaults to full precision.
+  --quantization=<quantization>
+                             Store raw scores as "uint8" or "uint16" with
+                             per-file and per-dimension linear quantization.
+                             Defaults to no quantization.
 
 Database configuration file <database.yml>: 
     The database configuration provides details as to where actual files are
@@ -353,7 +359,8 @@ class Multilabel(BaseLabeling):
                                                       'pad_onset': 0.,
                                                       'pad_offset': 0.})}
 
-    def apply(self, protocol_name, output_dir, step=None, subset=None): 
+    def apply(self, protocol_name, output_dir, step=None, subset=None,
+              dtype=None, quantization=None):
 
         model = self.model_.to(self.device)
         model.eval()
@@ -382,7 +389,9 @@ class Multilabel(BaseLabeling):
             root_dir=output_dir,
             sliding_window=sliding_window,
             dimension=n_classes,
-            labels=labels)
+            labels=labels,
+            dtype=dtype,
+            quantization=quantization)
 
         # file generator
         protocol = get_protocol(protocol_name, progress=True,
@@ -505,5 +514,9 @@ def main():
             protocol_name, model_pt, db_yml=db_yml, training=False)
         application.device = device
         application.batch_size = batch_size
-        application.apply(protocol_name, output_dir, step=step, subset=subset)
+        dtype = arguments['--dtype']
+        quantization = arguments['--quantization']
+
+        application.apply(protocol_name, output_dir, step=step, subset=subset,
+                          dtype=dtype, quantization=quantization)
 
@@ -32,7 +32,7 @@ Speaker embedding
 Usage:
   pyannote-speaker-embedding train [options] <experiment_dir> <database.task.protocol>
   pyannote-speaker-embedding validate [options] [--duration=<duration> --every=<epoch> --chronological --purity=<purity> --metric=<metric>] <train_dir> <database.task.protocol>
-  pyannote-speaker-embedding apply [options] [--duration=<duration> --step=<step>] <model.pt> <database.task.protocol> <output_dir>
+  pyannote-speaker-embedding apply [options] [--duration=<duration> --step=<step> --dtype=<dtype> --quantization=<quantization>] <model.pt> <database.task.protocol> <output_dir>
   pyannote-speaker-embedding -h | --help
   pyannote-speaker-embedding --version
 
@@ -74,6 +74,12 @@ Common options:
   <model.pt>                 Path to the pretrained model.
   --step=<step>              Sliding window step, in seconds.
                              Defaults to 25% of window duration.
+  --dtype=<dtype>            Store embeddings with reduced precision (e.g.
+                             "float16"). Defaults to full precision.
+  --quantization=<quantization>
+                             Store embeddings as "uint8" or "uint16" with
+                             per-file and per-dimension linear quantization.
+                             Defaults to no quantization.
 
 Configuration file:
     The configuration of each experiment is described in a file called
@@ -520,7 +526,8 @@ class SpeakerEmbedding(Application):
                          else purity - self.purity}
 
 
-    def apply(self, protocol_name, output_dir, step=None, subset=None):
+    def apply(self, protocol_name, output_dir, step=None, subset=None,
+              dtype=None, quantization=None):
 
         model = self.model_.to(self.device)
         model.eval()
@@ -546,7 +553,9 @@ class SpeakerEmbedding(Application):
         precomputed = Precomputed(
             root_dir=output_dir,
             sliding_window=sliding_window,
-            dimension=dimension)
+            dimension=dimension,
+            dtype=dtype,
+            quantization=quantization)
 
         # file generator
         protocol = get_protocol(protocol_name, progress=True,
@@ -683,4 +692,8 @@ def main():
             duration = float(duration)
         application.duration = duration
 
-        application.apply(protocol_name, output_dir, step=step, subset=subset)
+        dtype = arguments['--dtype']
+        quantization = arguments['--quantization']
+
+        application.apply(protocol_name, output_dir, step=step, subset=subset,
+                          dtype=dtype, quantization=quantization)
@@ -35,6 +35,7 @@ import numpy as np
 from pyannote.core import Segment
 from pyannote.audio.features.utils import RawAudio
 from pyannote.audio.features.utils import get_audio_duration
+from pyannote.audio.features.utils import prefetch_audio_metadata
 from pyannote.generators.fragment import random_subsegment
 from pyannote.generators.fragment import random_segment
 from pyannote.database import get_protocol
@@ -81,7 +82,8 @@ class AddNoise(Augmentation):
                          'duration': get_audio_duration}
         for collection in self.collection:
             protocol = get_protocol(collection, preprocessors=preprocessors)
-            self.files_.extend(protocol.files())
+            self.files_.extend(
+                prefetch_audio_metadata(protocol, subset='files'))
 
     def __call__(self, original, sample_rate):
         """Augment original waveform
@@ -184,7 +186,7 @@ class AddNoiseFromGaps(Augmentation):
 
         protocol = get_protocol(self.protocol,
                                 preprocessors=preprocessors)
-        self.files_ = list(getattr(protocol, self.subset)())
+        self.files_ = prefetch_audio_metadata(protocol, subset=self.subset)
 
         # remove files with no gaps
         self.files_ = [f for f in self.files_ if f['gaps']]
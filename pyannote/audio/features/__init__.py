@@ -28,39 +28,65 @@
 
 """
 # Feature extraction
+
+Feature extractors are imported lazily (on first access) so that importing
+`pyannote.audio.features` (or any of its submodules) does not pay for the
+import of heavy optional dependencies (yaafelib, librosa, ...).
 """
 
+import sys
+import importlib
 
-try:
-    from .with_yaafe import YaafeCompound, YaafeZCR, YaafeMFCC
-except ModuleNotFoundError as e:
-    if e.args[0] == "No module named 'yaafelib'":
-        msg = (
-            'Feature extractors based on "yaafe" are not available '
-            'because "yaafelib" could not be found.')
-        print(msg)
 
-try:
-    from .with_librosa import LibrosaMFCC, LibrosaSpectrogram, LibrosaMelSpectrogram
-except Exception as e:
-        msg = (
-            f'Feature extractors based on "librosa" are not available '
-            f'because something went wrong when importing them: "{e}".')
-        print(msg)
+# {name: (submodule, missing dependency message)}
+_LAZY = {
+    'YaafeCompound': ('with_yaafe', 'yaafe'),
+    'YaafeZCR': ('with_yaafe', 'yaafe'),
+    'YaafeMFCC': ('with_yaafe', 'yaafe'),
+    'LibrosaMFCC': ('with_librosa', 'librosa'),
+    'LibrosaSpectrogram': ('with_librosa', 'librosa'),
+    'LibrosaMelSpectrogram': ('with_librosa', 'librosa'),
+    'PySpeechFeaturesMFCC': ('with_python_speech_features',
+                             'python_speech_features'),
+    'Precomputed': ('precomputed', None),
+    'PrecomputedHTK': ('precomputed', None),
+    'CachedFeatureExtraction': ('cache', None),
+    'RawAudio': ('utils', None),
+}
+
+
+def __getattr__(name):
+
+    if name not in _LAZY:
+        msg = f'module {__name__!r} has no attribute {name!r}'
+        raise AttributeError(msg)
 
-try:
-    from .with_python_speech_features import PySpeechFeaturesMFCC
-except Exception as e:
+    submodule, backend = _LAZY[name]
+    try:
+        module = importlib.import_module(f'.{submodule}', __name__)
+    except Exception as e:
+        if backend is None:
+            raise e
         msg = (
-            f'Feature extractors based on "python_speech_features" are not available '
-            f'because something went wrong when importing them: "{e}".')
-        print(msg)
-
-from .precomputed import Precomputed
-from .precomputed import PrecomputedHTK
-
-try:
-    from .utils import RawAudio
-except Exception as e:
-    msg = f'Loading raw audio might fail because something went wrong: {e}.'
-    print(msg)
+            f'Feature extractors based on "{backend}" are not available '
+            f'because something went wrong when importing them: "{e}".'
+        )
+        raise ImportError(msg) from e
+
+    value = getattr(module, name)
+    # cache it so that __getattr__ is only called once per name
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY))
+
+
+# module-level __getattr__ (PEP 562) is only supported by Python 3.7+
+if sys.version_info < (3, 7):
+    for _name in _LAZY:
+        try:
+            __getattr__(_name)
+        except ImportError as e:
+            print(e)
@@ -27,6 +27,7 @@
 # Hervé BREDIN - http://herve.niderb.fr
 
 import warnings
+import threading
 import numpy as np
 
 from .utils import RawAudio
@@ -38,9 +39,6 @@ from pyannote.core import SlidingWindowFeature
 
 from pyannote.database import get_unique_identifier
 
-from librosa.util import valid_audio
-from librosa.util.exceptions import ParameterError
-
 
 class FeatureExtraction(object):
     """Base class for feature extraction
@@ -51,16 +49,44 @@ class FeatureExtraction(object):
         Data augmentation.
     sample_rate : int, optional
         Convert audio to use this sample rate.
+    crop_cache : float, optional
+        Set to a positive duration (in seconds) to have `crop` keep that many
+        seconds of already computed feature frames of the current file.
+        Consecutive overlapping crops (e.g. sliding windows) then only compute
+        new frames. Defaults to 0. (no cache). Only supported by feature
+        extractors with LOCAL_FEATURES set to True, as this is the only way
+        for cached crops to be the same as regular ones.
 
     See also
     --------
     `pyannote.audio.augmentation.AddNoise`
     """
 
-    def __init__(self, augmentation=None, sample_rate=None):
+    # True when every feature frame only depends on audio samples located
+    # less than `get_context_duration()` away from it, so that frames
+    # returned by `crop` depend neither on boundary effects (e.g. padding of
+    # centered STFT frames) nor on excerpt-wide normalization (e.g. dB scale
+    # relative to the loudest frame).
+    LOCAL_FEATURES = False
+
+    # number of additional frames (on top of feature extraction context)
+    # computed on both sides of cached frames so that they do not depend on
+    # where computation chunks start and end.
+    CROP_CACHE_MARGIN = 10
+
+    def __init__(self, augmentation=None, sample_rate=None, crop_cache=0.):
         super().__init__()
         self.sample_rate = sample_rate
 
+        if crop_cache > 0 and not self.LOCAL_FEATURES:
+            msg = (
+                f'{self.__class__.__name__} features are not local: '
+                f'`crop_cache` is ignored.'
+            )
+            warnings.warn(msg)
+            crop_cache = 0.
+        self.crop_cache = crop_cache
+
         # used in FeatureExtraction.crop
         self.raw_audio_ = RawAudio(
             sample_rate=self.sample_rate, mono=True,
@@ -149,6 +175,49 @@ class FeatureExtraction(object):
         # wrap features in a `SlidingWindowFeature` instance
         return SlidingWindowFeature(features, self.sliding_window)
 
+    def multichannel(self, current_file, channels=None):
+        """Extract features from several channels with a single decode
+
+        Parameters
+        ----------
+        current_file : dict
+            `pyannote.database` file. Its 'channel' key (if any) is ignored.
+        channels : iterable of int, optional
+            (1-indexed) channels. Defaults to all channels.
+
+        Returns
+        -------
+        features : dict
+            {channel: `pyannote.core.SlidingWindowFeature`} dictionary.
+        """
+
+        waveforms, sample_rate = self.raw_audio_.multichannel(
+            current_file, channels=channels, return_sr=True)
+
+        features = {}
+        for channel, y in waveforms.items():
+            data = self.get_features(y.data, sample_rate)
+
+            if np.any(np.isnan(data)):
+                uri = get_unique_identifier(current_file)
+                msg = (f'Features extracted from channel {channel:d} of '
+                       f'"{uri}" contain NaNs.')
+                warnings.warn(msg)
+
+            features[channel] = SlidingWindowFeature(data,
+                                                     self.sliding_window)
+
+        return features
+
+    def incremental(self):
+        """Get stateful (incremental) version of this feature extraction
+
+        Returns
+        -------
+        incremental : `IncrementalFeatureExtraction`
+        """
+        return IncrementalFeatureExtraction(self)
+
     def get_context_duration(self):
         """
 
@@ -193,6 +262,12 @@ class FeatureExtraction(object):
 
         context = self.get_context_duration()
 
+        if self.crop_cache > 0 and self.raw_audio_.augmentation is None:
+            features = self._crop_cached(current_file, segment, mode=mode,
+                                         fixed=fixed)
+            if features is not None:
+                return features
+
         # extend segment on both sides with requested context
         xsegment = Segment(max(0, segment.start - context),
                            min(duration, segment.end + context))
@@ -203,6 +278,121 @@ class FeatureExtraction(object):
 
         features = self.get_features(y, self.sample_rate)
 
+        return self._crop_features(features, xsegment, segment,
+                                   mode=mode, fixed=fixed)
+
+    def __getstate__(self):
+        # crop's rolling cache cannot (and should not) be pickled
+        state = dict(self.__dict__)
+        state.pop('crop_cache_', None)
+        return state
+
+    def _crop_cached(self, current_file, segment, mode='center', fixed=None):
+        """Crop features using (and updating) a rolling cache of frames
+
+        Frames are indexed on a file-wide grid and computed by chunks, with
+        CROP_CACHE_MARGIN additional frames (and feature extraction context)
+        on both sides, so that cached frames are the ones `__call__` would
+        return. Only frames that are not cached yet are computed, and only
+        the last `crop_cache` seconds of frames are kept.
+
+        Returns None when the requested frames cannot be served from the
+        cache (e.g. segment is not fully inside the file, or regular cropping
+        would not be aligned on the file-wide grid), in which case the caller
+        falls back to regular cropping.
+        """
+
+        # each thread has its own cache
+        if not hasattr(self, 'crop_cache_'):
+            self.crop_cache_ = threading.local()
+        cache = self.crop_cache_
+
+        duration = current_file['duration']
+        frames = self.sliding_window
+        step = frames.step
+
+        # compute range of frames exactly like regular cropping would...
+        context = self.get_context_duration()
+        xsegment = Segment(max(0, segment.start - context),
+                           min(duration, segment.end + context))
+        if xsegment.end >= duration:
+            return None
+        shifted_frames = SlidingWindow(start=xsegment.start - step, step=step,
+                                       duration=frames.duration)
+        (start, end), = shifted_frames.crop(segment, mode=mode, fixed=fixed,
+                                            return_ranges=True)
+        if start < 0:
+            return None
+
+        # ... including when it would return fewer frames than requested
+        (first, last), = self.raw_audio_.sliding_window_.crop(
+            xsegment, mode='center', fixed=xsegment.duration,
+            return_ranges=True)
+        end = min(end, self._n_frames(last - first))
+
+        # ... and convert it to file-wide frame indices (i.e. frames of
+        # features extracted from a waveform starting at t=0). this is only
+        # possible when regular cropping extracts features from a waveform
+        # starting on the file-wide grid (up to a fraction of a sample).
+        offset = int(np.rint(xsegment.start / step))
+        if abs(xsegment.start - offset * step) * self.sample_rate > 1e-3:
+            return None
+        start, end = start + offset, end + offset
+        if end * step > duration:
+            return None
+
+        uri = get_unique_identifier(current_file)
+        if (getattr(cache, 'uri', None) != uri or
+            start < cache.start or start > cache.end):
+            cache.uri = uri
+            cache.start, cache.end = start, start
+            cache.data = None
+
+        if end > cache.end:
+
+            # compute missing frames [cache.end, end) from a waveform chunk
+            # extended on both sides
+            margin = self.CROP_CACHE_MARGIN + int(np.ceil(
+                self.get_context_duration() / step))
+            first = max(0, cache.end - margin)
+            chunk = Segment(first * step, min(duration, (end + margin) * step))
+            y = self.raw_audio_.crop(current_file, chunk, mode='center',
+                                     fixed=chunk.duration)
+            new = self.get_features(y, self.sample_rate)
+            new = new[cache.end - first:end - first]
+            if len(new) != end - cache.end:
+                return None
+
+            if cache.data is None:
+                cache.data = new
+            else:
+                cache.data = np.concatenate([cache.data, new], axis=0)
+            cache.end = end
+
+            # only keep the last `crop_cache` seconds (but at least what has
+            # just been requested)
+            n_frames = max(end - start, int(self.crop_cache / step))
+            if len(cache.data) > n_frames:
+                cache.data = cache.data[-n_frames:]
+                cache.start = cache.end - n_frames
+
+        return np.array(cache.data[start - cache.start:end - cache.start])
+
+    def _n_frames(self, n_samples):
+        """Number of feature frames extracted from `n_samples` samples"""
+
+        if not hasattr(self, 'n_frames_'):
+            self.n_frames_ = {}
+        n_frames = self.n_frames_.get(n_samples, None)
+        if n_frames is None:
+            y = np.zeros((n_samples, 1), dtype=np.float32)
+            n_frames = len(self.get_features(y, self.sample_rate))
+            self.n_frames_[n_samples] = n_frames
+        return n_frames
+
+    def _crop_features(self, features, xsegment, segment,
+                       mode='center', fixed=None):
+        """Crop `segment` out of features extracted from `xsegment`"""
 
         # get rid of additional context before returning
         frames = self.sliding_window
@@ -222,3 +412,250 @@ class FeatureExtraction(object):
             start = 0
 
         return features[start:end]
+
+    def crop_many(self, current_file, segments, mode='center', fixed=None,
+                  exact=True):
+        """Batched version of [self.crop(current_file, s) for s in segments]
+
+        Segments (extended with context) are merged into covering spans, and
+        the (resampled) waveform of each span is read only once.
+
+        Parameters
+        ----------
+        current_file : dict
+            `pyannote.database` file. Must contain a 'duration' key that
+            provides the duration (in seconds) of the audio file.
+        segments : iterable of `pyannote.core.Segment`
+            Segments from which to extract features.
+        mode, fixed :
+            See `FeatureExtraction.crop`.
+        exact : bool, optional
+            When True (default), features are extracted from each segment
+            waveform separately, so that the output is exactly the same as
+            calling `crop` repeatedly. When False, features are extracted only
+            once per span and cropped from there: this is much faster for
+            overlapping segments, but frames near segment boundaries will
+            differ slightly (they are then closer to what `__call__` returns).
+
+        Returns
+        -------
+        features : list of (n_frames, dimension) numpy arrays
+            Extracted features, in the same order as `segments`.
+
+        See also
+        --------
+        `FeatureExtraction.crop`
+        """
+
+        if 'duration' not in current_file:
+            msg = ('`FeatureExtraction.crop_many` method expects '
+                   '`current_file` to contain a precomputed "duration" key.')
+            raise ValueError(msg)
+        duration = current_file['duration']
+
+        context = self.get_context_duration()
+        raw_audio = self.raw_audio_
+
+        segments = list(segments)
+        xsegments = [Segment(max(0, segment.start - context),
+                             min(duration, segment.end + context))
+                     for segment in segments]
+
+        # samples range of each extended segment (as used by crop)
+        ranges = []
+        for xsegment in xsegments:
+            (start, end), = raw_audio.sliding_window.crop(
+                xsegment, mode='center', fixed=xsegment.duration,
+                return_ranges=True)
+            ranges.append((start, end))
+
+        # group segments whose extended segments overlap into spans
+        spans = []
+        for i in sorted(range(len(segments)), key=lambda i: ranges[i]):
+            start, end = ranges[i]
+            if spans and start < spans[-1][1]:
+                spans[-1][1] = max(spans[-1][1], end)
+                spans[-1][2].append(i)
+            else:
+                spans.append([start, end, [i]])
+
+        from librosa.util import valid_audio
+        from librosa.util.exceptions import ParameterError
+
+        features = [None] * len(segments)
+        for span_start, span_end, indices in spans:
+
+            # read (non-augmented) waveform once per span
+            y = raw_audio.read(current_file, span_start, span_end)
+            try:
+                valid = valid_audio(y[:, 0], mono=True)
+            except ParameterError as e:
+                uri = get_unique_identifier(current_file)
+                msg = (f'Something went wrong when trying to extract waveform '
+                       f'of file {uri} between samples {span_start:d} and '
+                       f'{span_end:d}.')
+                raise ValueError(msg)
+
+            if exact:
+                for i in indices:
+                    start, end = ranges[i]
+                    y_i = y[start - span_start:end - span_start]
+                    if raw_audio.augmentation is not None:
+                        y_i = raw_audio.augmentation(y_i, self.sample_rate)
+                    features[i] = self._crop_features(
+                        self.get_features(y_i, self.sample_rate),
+                        xsegments[i], segments[i], mode=mode, fixed=fixed)
+                continue
+
+            if raw_audio.augmentation is not None:
+                y = raw_audio.augmentation(y, self.sample_rate)
+            span_features = self.get_features(y, self.sample_rate)
+
+            # span features are aligned with the first extended segment
+            xsegment = xsegments[indices[0]]
+            for i in indices:
+                features[i] = self._crop_features(
+                    span_features, xsegment, segments[i],
+                    mode=mode, fixed=fixed)
+
+        return features
+
+
+class IncrementalFeatureExtraction(object):
+    """Stateful (incremental) version of a feature extraction
+
+    Consumes consecutive waveform chunks of a stream (e.g. yielded by
+    `pyannote.audio.stream.stream_audio`) and returns feature frames as soon
+    as they are final, i.e. as soon as they are the ones `__call__` would
+    return for the whole stream.
+
+    Like `FeatureExtraction.crop` with `crop_cache`, features are computed on
+    the part of the waveform that has not been processed yet, extended on both
+    sides by CROP_CACHE_MARGIN frames (and feature extraction context): the
+    waveform needed by those margins is carried from one chunk to the next.
+
+    Parameters
+    ----------
+    feature_extraction : `FeatureExtraction`
+
+    Usage
+    -----
+    >>> incremental = feature_extraction.incremental()
+    >>> for chunk in stream_audio(current_file, mono=False):
+    ...     features = incremental(chunk)
+    >>> features = incremental.flush()
+
+    Notes
+    -----
+    Data augmentation is not applied.
+    """
+
+    def __init__(self, feature_extraction):
+        super().__init__()
+        self.feature_extraction = feature_extraction
+        self.raw_audio_ = feature_extraction.raw_audio_.incremental()
+
+        frames = feature_extraction.sliding_window
+        context = feature_extraction.get_context_duration()
+        self.margin_ = feature_extraction.CROP_CACHE_MARGIN + \
+            int(np.ceil(context / frames.step))
+
+        self.reset()
+
+    def reset(self):
+        """Forget about the current stream"""
+        self.raw_audio_.reset()
+        self.sample_rate_ = None
+        self.buffer_ = None
+        # index of first buffered sample
+        self.offset_ = 0
+        # number of frames returned so far
+        self.n_frames_ = 0
+
+    def get_features(self, y, sample_rate):
+        """Extract features from (part of) the stream waveform
+
+        Defaults to `feature_extraction.get_features`. Subclasses may override
+        it to carry additional state from one chunk to the next.
+        """
+        return self.feature_extraction.get_features(y, sample_rate)
+
+    def _process(self, waveform, final=False):
+
+        y = waveform.data
+        if self.buffer_ is None:
+            self.buffer_ = y
+        else:
+            self.buffer_ = np.concatenate([self.buffer_, y], axis=0)
+
+        sample_rate = self.sample_rate_
+        frames = self.feature_extraction.sliding_window
+        hop_length = int(np.rint(frames.step * sample_rate))
+
+        # buffered waveform starts at the beginning of frame #first
+        first = self.offset_ // hop_length
+        n_samples = self.offset_ + len(self.buffer_)
+
+        # last `margin` frames may still be changed by upcoming samples
+        end = n_samples // hop_length - self.margin_
+        if final or end > self.n_frames_:
+            data = self.get_features(self.buffer_, sample_rate)
+            end = first + len(data) if final else \
+                min(end, first + len(data) - self.margin_)
+        end = max(end, self.n_frames_)
+
+        start = self.n_frames_
+        sliding_window = SlidingWindow(start=frames[start].start,
+                                       duration=frames.duration,
+                                       step=frames.step)
+        if end > start:
+            data = data[start - first:end - first]
+        else:
+            dimension = self.feature_extraction.dimension
+            data = np.zeros((0, dimension), dtype=np.float32)
+        self.n_frames_ = end
+
+        # only keep samples needed by the first `margin` frames before next
+        # (not returned yet) frame
+        offset = max(0, end - self.margin_) * hop_length
+        if offset > self.offset_:
+            self.buffer_ = self.buffer_[offset - self.offset_:]
+            self.offset_ = offset
+
+        return SlidingWindowFeature(data, sliding_window)
+
+    def __call__(self, waveform):
+        """Process next waveform chunk
+
+        Parameters
+        ----------
+        waveform : `pyannote.core.SlidingWindowFeature`
+            (n_samples, n_channels) waveform chunk.
+
+        Returns
+        -------
+        features : `pyannote.core.SlidingWindowFeature`
+            (n_frames, dimension) features that became final. Because of
+            feature extraction context, those lag behind input chunks:
+            remaining ones are returned by `flush`.
+        """
+        waveform = self.raw_audio_(waveform)
+        self.sample_rate_ = self.raw_audio_.sample_rate
+        return self._process(waveform)
+
+    def flush(self):
+        """Return remaining features (if any) and reset
+
+        Returns
+        -------
+        features : `pyannote.core.SlidingWindowFeature`
+            Remaining features. None if no chunk was ever received.
+        """
+
+        waveform = self.raw_audio_.flush()
+        if waveform is None:
+            return None
+
+        features = self._process(waveform, final=True)
+        self.reset()
+        return features
@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# The MIT License (MIT)
+
+# Copyright (c) 2019 CNRS
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# AUTHORS
+# Hervé BREDIN - http://herve.niderb.fr
+
+"""
+Content-addressed on-disk feature cache
+"""
+
+import os
+import json
+import hashlib
+import threading
+import warnings
+from pathlib import Path
+
+import numpy as np
+from pyannote.core import SlidingWindowFeature
+from pyannote.database import get_unique_identifier
+
+from pyannote.audio import __version__
+from pyannote.audio.util import mkdir_p
+from .precomputed import Precomputed
+from .utils import RawAudio
+
+
+class CachedFeatureExtraction(object):
+    """Transparent on-disk cache for feature extraction
+
+    Features returned by `feature_extraction(current_file)` are stored as
+    `.npy` files under `cache_dir`. Their location depends on a hash of the
+    feature extraction (class, parameters and pyannote.audio version) and of
+    the file (unique identifier, channel, path, modification time and size of
+    audio file), so that any change invalidates the cache.
+
+    Least recently used files are evicted whenever the cache grows larger than
+    `max_size`.
+
+    Parameters
+    ----------
+    feature_extraction : `FeatureExtraction`
+        Feature extraction.
+    cache_dir : `Path` or str
+        Cache directory. Can be shared by several feature extractions (and
+        processes).
+    max_size : int, optional
+        Maximum size of cache directory (in bytes). Defaults to 10GB.
+    use_memmap : bool, optional
+        Return memory-mapped cached features instead of loading them into
+        memory. Beware that each memory map holds a file descriptor for as
+        long as the returned features are alive. Defaults to False.
+
+    Notes
+    -----
+    Features are not cached (but simply extracted) when data augmentation is
+    enabled, or when `current_file` provides its own "waveform".
+
+    All other attributes (e.g. `sliding_window`, `dimension`, or `crop`) are
+    those of the wrapped feature extraction.
+
+    Usage
+    -----
+    >>> feature_extraction = CachedFeatureExtraction(LibrosaMFCC(),
+    ...                                              '/path/to/cache')
+    >>> features = feature_extraction(current_file)  # extract and cache
+    >>> features = feature_extraction(current_file)  # load from cache
+    """
+
+    def __init__(self, feature_extraction, cache_dir, max_size=10 * 2 ** 30,
+                 use_memmap=False):
+        super().__init__()
+
+        if isinstance(feature_extraction, (Precomputed, RawAudio)):
+            msg = (
+                f'{feature_extraction.__class__.__name__} does not need '
+                f'(and does not support) CachedFeatureExtraction.'
+            )
+            raise ValueError(msg)
+
+        self.feature_extraction = feature_extraction
+        self.cache_dir = Path(cache_dir).expanduser().resolve(strict=False)
+        self.max_size = max_size
+        self.use_memmap = use_memmap
+
+        # approximate size of cache directory (see CachedFeatureExtraction.add)
+        self.size_ = None
+        self.key_ = self.get_extraction_key()
+
+    def __getattr__(self, name):
+        # do not delegate (possibly missing) attributes used by pickle
+        if name.startswith('__') or name == 'feature_extraction':
+            raise AttributeError(name)
+        return getattr(self.feature_extraction, name)
+
+    def get_parameters(self):
+        """Get (JSON-serializable) parameters of wrapped feature extraction
+
+        By convention, public attributes not ending with an underscore are
+        parameters (e.g. `LibrosaMFCC.coefs`).
+        """
+
+        parameters = {}
+        for name, value in sorted(vars(self.feature_extraction).items()):
+            if name.startswith('_') or name.endswith('_'):
+                continue
+            try:
+                json.dumps(value)
+            except TypeError:
+                continue
+            parameters[name] = value
+        return parameters
+
+    def get_extraction_key(self):
+        """Hash of feature extraction class, parameters and version"""
+        klass = self.feature_extraction.__class__
+        description = {
+            'name': f'{klass.__module__}.{klass.__qualname__}',
+            'params': self.get_parameters(),
+            'version': __version__}
+        description = json.dumps(description, sort_keys=True)
+        return hashlib.sha1(description.encode('utf-8')).hexdigest()
+
+    def get_file_key(self, current_file):
+        """Hash of file unique identifier, channel and audio file stat
+
+        Returns
+        -------
+        key : str or None
+            None when `current_file` cannot be cached.
+        """
+
+        if 'waveform' in current_file:
+            return None
+
+        description = {'uri': get_unique_identifier(current_file),
+                       'channel': current_file.get('channel', None)}
+
+        audio = current_file.get('audio', None)
+        if audio is not None:
+            stat = os.stat(audio)
+            description['audio'] = str(audio)
+            description['mtime'] = stat.st_mtime_ns
+            description['size'] = stat.st_size
+
+        description = json.dumps(description, sort_keys=True)
+        return hashlib.sha1(description.encode('utf-8')).hexdigest()
+
+    @property
+    def augmentation(self):
+        """Data augmentation of wrapped feature extraction (if any)"""
+        raw_audio = getattr(self.feature_extraction, 'raw_audio_',
+                            self.feature_extraction)
+        return getattr(raw_audio, 'augmentation', None)
+
+    def get_path(self, current_file):
+        """Path to cached features (None when they cannot be cached)"""
+
+        if self.augmentation is not None:
+            return None
+
+        key = self.get_file_key(current_file)
+        if key is None:
+            return None
+
+        return self.cache_dir / self.key_ / key[:2] / f'{key}.npy'
+
+    def __call__(self, current_file):
+        """Extract (or load cached) features from file
+
+        Parameters
+        ----------
+        current_file : dict
+            `pyannote.database` files.
+
+        Returns
+        -------
+        features : `pyannote.core.SlidingWindowFeature`
+            Extracted features
+        """
+
+        path = self.get_path(current_file)
+        if path is None:
+            return self.feature_extraction(current_file)
+
+        try:
+            data = np.load(path, mmap_mode='r' if self.use_memmap else None)
+        except (FileNotFoundError, ValueError):
+            # not cached yet (or partially evicted by another process)
+            pass
+        else:
+            # mark as recently used
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return SlidingWindowFeature(data, self.sliding_window)
+
+        features = self.feature_extraction(current_file)
+        self.add(path, features.data)
+        return features
+
+    def add(self, path, data):
+        """Add features to cache (and evict old ones when needed)"""
+
+        mkdir_p(path.parent)
+        # write to temporary file first so that readers never see partial files
+        tmp = f'{path}.{os.getpid():d}.{threading.get_ident():d}.tmp'
+        with open(tmp, 'wb') as f:
+            np.save(f, data)
+        os.replace(tmp, path)
+
+        if self.max_size is None:
+            return
+
+        # other processes may be writing to the same cache directory
+        # so size_ is only an approximation: it is updated by scanning the
+        # cache directory when it gets larger than max_size.
+        if self.size_ is None:
+            self.size_ = sum(size for _, size, _ in self._scan())
+        else:
+            self.size_ += path.stat().st_size
+
+        if self.size_ > self.max_size:
+            self.evict()
+
+    def _scan(self):
+        """Yield (mtime, size, path) of all cached files"""
+        for path in self.cache_dir.glob('*/*/*.npy'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            yield stat.st_mtime, stat.st_size, path
+
+    def evict(self, ratio=0.9):
+        """Remove least recently used files until cache is small enough
+
+        Parameters
+        ----------
+        ratio : float, optional
+            Remove files until cache size is below ratio x max_size, so that
+            eviction does not happen at every single addition.
+            Defaults to 0.9.
+        """
+
+        cached = sorted(self._scan())
+        size = sum(size for _, size, _ in cached)
+
+        for _, file_size, path in cached:
+            if size <= ratio * self.max_size:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            size -= file_size
+
+        if size > self.max_size:
+            msg = (
+                f'Cache directory "{self.cache_dir}" is still larger than '
+                f'max_size ({self.max_size:d} bytes) after eviction.'
+            )
+            warnings.warn(msg)
+
+        self.size_ = size
@@ -28,10 +28,50 @@
 
 
 import numpy as np
-import pandas as pd
+from pyannote.core import SlidingWindow
 from pyannote.core import SlidingWindowFeature
 
 
+def short_term_moments(data, lower, upper):
+    """Compute mean and (unbiased) standard deviation over windows
+
+    Relies on cumulative sums so that the overall cost is linear in the
+    number of samples, whatever the size of the windows.
+
+    Parameters
+    ----------
+    data : (n_samples, n_features) `numpy.ndarray`
+        Features.
+    lower, upper : (n_windows, ) `numpy.ndarray`
+        Window boundaries (i.e. kth window is data[lower[k]:upper[k]]).
+
+    Returns
+    -------
+    mu, sigma : (n_windows, n_features) `numpy.ndarray`
+        Mean and standard deviation of each window.
+    """
+
+    # centering data first limits round-off errors in cumulative sums
+    x = np.array(data, dtype=np.float64)
+    shift = np.mean(x, axis=0) if len(x) else 0.
+    x -= shift
+
+    zero = np.zeros((1, ) + x.shape[1:])
+    S1 = np.concatenate([zero, np.cumsum(x, axis=0)], axis=0)
+    S2 = np.concatenate([zero, np.cumsum(x ** 2, axis=0)], axis=0)
+
+    count = (upper - lower).reshape((-1, ) + (1, ) * (x.ndim - 1))
+    s1 = S1[upper] - S1[lower]
+    s2 = S2[upper] - S2[lower]
+
+    # windows with just one sample have undefined standard deviation
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mu = s1 / count
+        var = (s2 - s1 * mu) / (count - 1)
+
+    return mu + shift, np.sqrt(np.maximum(var, 0.))
+
+
 class GlobalStandardization(object):
     """Mean/variance normalization"""
 
@@ -87,6 +127,13 @@ class ShortTermStandardization(object):
     def get_context_duration(self):
         return .5 * self.duration
 
+    def get_half_window(self, sliding_window):
+        """Number of frames on each side of the (centered) window"""
+        window = sliding_window.samples(self.duration, mode='center')
+        if not window % 2:
+            window += 1
+        return window // 2
+
     def __call__(self, features, sliding_window=None):
         """Apply short-term standardization
 
@@ -109,25 +156,13 @@ class ShortTermStandardization(object):
         else:
             features_ = SlidingWindowFeature(features, sliding_window)
 
-        window = features_.sliding_window.samples(self.duration,
-                                                  mode='center')
-        if not window % 2:
-            window += 1
-
-        rolling = pd.DataFrame(features_.data).rolling(
-            window=window, center=True, min_periods=window)
-        mu = np.array(rolling.mean())
-        sigma = np.array(rolling.std(ddof=1))
-
-        for i in range(window // 2):
+        half = self.get_half_window(features_.sliding_window)
 
-            data = features_.data[:i + window // 2 + 1, :]
-            mu[i] = np.mean(data, axis=0)
-            sigma[i] = np.std(data, axis=0, ddof=1)
-
-            data = features_.data[-i - window // 2 - 1:, :]
-            mu[-i - 1] = np.mean(data, axis=0)
-            sigma[-i - 1] = np.std(data, axis=0, ddof=1)
+        n_samples = len(features_.data)
+        t = np.arange(n_samples)
+        lower = np.maximum(t - half, 0)
+        upper = np.minimum(t + half + 1, n_samples)
+        mu, sigma = short_term_moments(features_.data, lower, upper)
 
         sigma[sigma == 0.] = 1e-6
 
@@ -137,3 +172,143 @@ class ShortTermStandardization(object):
             return SlidingWindowFeature(normalized_, features.sliding_window)
         else:
             return normalized_
+
+
+class StreamingShortTermStandardization(ShortTermStandardization):
+    """Incremental short term mean/variance normalization
+
+    Processes adjacent chunks of features one after the other, and returns
+    normalized features as soon as their (centered) window is complete.
+    Concatenating all outputs (including the one returned by `flush`) gives
+    the same result as applying `ShortTermStandardization` on the whole
+    sequence at once.
+
+    Parameters
+    ----------
+    duration : float
+        Window duration in seconds.
+
+    Usage
+    -----
+    >>> normalization = StreamingShortTermStandardization(duration=3.)
+    >>> for chunk in chunks:
+    ...     do_something_with(normalization(chunk))
+    >>> do_something_with(normalization.flush())
+    """
+
+    def __init__(self, duration=3.):
+        super().__init__(duration=duration)
+        self.reset()
+
+    def reset(self):
+        """Forget about previous chunks"""
+        self.initialized_ = False
+
+    def initialize(self, sliding_window):
+
+        self.frames_ = sliding_window
+        self.half_ = self.get_half_window(sliding_window)
+
+        # buffer_ contains frames [offset_, n_samples_)
+        self.buffer_ = None
+        self.offset_ = 0
+        self.n_samples_ = 0
+
+        # index of the next frame to be normalized
+        self.next_ = 0
+
+        self.initialized_ = True
+
+    @property
+    def n_pending(self):
+        """Number of frames received but not normalized yet"""
+        if not self.initialized_:
+            return 0
+        return self.n_samples_ - self.next_
+
+    def _normalize(self, end):
+        """Normalize frames [next_, end) and discard useless frames"""
+
+        t = np.arange(self.next_, end)
+        lower = np.maximum(t - self.half_, 0)
+        upper = np.minimum(t + self.half_ + 1, self.n_samples_)
+        mu, sigma = short_term_moments(self.buffer_,
+                                       lower - self.offset_,
+                                       upper - self.offset_)
+        sigma[sigma == 0.] = 1e-6
+
+        i, j = self.next_ - self.offset_, end - self.offset_
+        normalized = (self.buffer_[i:j] - mu) / sigma
+
+        sliding_window = SlidingWindow(
+            start=self.frames_[self.next_].start,
+            duration=self.frames_.duration, step=self.frames_.step)
+
+        # only keep frames needed by upcoming windows
+        self.next_ = end
+        first = max(0, self.next_ - self.half_)
+        self.buffer_ = self.buffer_[first - self.offset_:]
+        self.offset_ = first
+
+        return SlidingWindowFeature(normalized, sliding_window)
+
+    def __call__(self, features, sliding_window=None):
+        """Process next chunk
+
+        Parameters
+        ----------
+        features : `SlidingWindowFeature` or (n_samples, n_features ) `numpy.ndarray`
+            Next chunk of features.
+        sliding_window : `SlidingWindow`, optional
+            Sliding window of the first chunk, when `features` are provided
+            as `numpy.ndarray`. Not used for the following chunks.
+
+        Returns
+        -------
+        normalized : `SlidingWindowFeature` or (n_samples, n_features ) `numpy.ndarray`
+            Standardized features of all frames whose window is complete
+            (possibly none of them).
+        """
+
+        if isinstance(features, SlidingWindowFeature):
+            data = features.data
+            if not self.initialized_:
+                sw = features.sliding_window
+                self.initialize(SlidingWindow(start=sw.start,
+                                              duration=sw.duration,
+                                              step=sw.step))
+        else:
+            data = features
+            if not self.initialized_:
+                self.initialize(sliding_window)
+
+        if self.buffer_ is None:
+            self.buffer_ = np.array(data)
+        else:
+            self.buffer_ = np.concatenate([self.buffer_, data], axis=0)
+        self.n_samples_ += len(data)
+
+        end = max(self.next_, self.n_samples_ - self.half_)
+        normalized = self._normalize(end)
+
+        if isinstance(features, SlidingWindowFeature):
+            return normalized
+        return normalized.data
+
+    def flush(self):
+        """Normalize remaining frames and reset
+
+        Returns
+        -------
+        normalized : `SlidingWindowFeature`
+            Standardized features of remaining frames, or None when there
+            is none.
+        """
+
+        if self.n_pending == 0:
+            self.reset()
+            return None
+
+        normalized = self._normalize(self.n_samples_)
+        self.reset()
+        return normalized
@@ -29,15 +29,19 @@
 
 import yaml
 import io
+import threading
+from cachetools import LRUCache
 from pathlib import Path
 from glob import glob
 import numpy as np
 from numpy.lib.format import open_memmap
-from struct import unpack
+from struct import pack, unpack
 
 from pyannote.core import SlidingWindow, SlidingWindowFeature
 from pyannote.database.util import get_unique_identifier
 from pyannote.audio.util import mkdir_p
+from .shards import ShardedStorage
+from .shards import crop_frames
 
 
 class PyannoteFeatureExtractionError(Exception):
@@ -61,6 +65,29 @@ class Precomputed(object):
         exists and contains `metadata.yml`.
     labels : iterable, optional
         Human-readable name for each dimension.
+    storage : {'npy', 'shards'}, optional
+        Store features of each file into its own `.npy` file ('npy', default)
+        or pack them into a few large shard files ('shards'). The latter is
+        recommended for collections of (hundreds of) thousands of files. This
+        is not used when `root_dir` already exists and contains
+        `metadata.yml`.
+    max_open : `int`, optional
+        Maximum number of `.npy` files kept open (as memory maps) by `crop`
+        and `shape` for later reuse. Least recently used files are closed
+        first. Defaults to 128.
+    dtype : `str`, optional
+        Store features with this (floating point) data type (e.g. 'float16'
+        to halve disk footprint of float32 features). Features stored with
+        less than 32 bits are returned as float32. Defaults to storing
+        features with their original data type. This is not used when
+        `root_dir` already exists and contains `metadata.yml`.
+    quantization : {'uint8', 'uint16'}, optional
+        Store features as 8-bit (or 16-bit) unsigned integers, linearly
+        mapping the [min, max] range of each dimension of each file to the
+        whole integer range. Features are dequantized (as float32) on the
+        fly by `__call__` and `crop`. Best suited for bounded scores such as
+        probabilities. Defaults to no quantization. This is not used when
+        `root_dir` already exists and contains `metadata.yml`.
 
     Notes
     -----
@@ -70,14 +97,22 @@ class Precomputed(object):
 
     """
 
+    STORAGE = {'npy', 'shards'}
+    QUANTIZATION = {'uint8', 'uint16'}
+
     def get_path(self, item):
         uri = get_unique_identifier(item)
         path = '{root_dir}/{uri}.npy'.format(root_dir=self.root_dir, uri=uri)
         return path
 
+    def get_quantization_path(self, item):
+        uri = get_unique_identifier(item)
+        return f'{self.root_dir}/{uri}.quantization.npy'
+
     def __init__(self, root_dir=None, use_memmap=True,
                  sliding_window=None, dimension=None, labels=None,
-                 augmentation=None):
+                 augmentation=None, storage='npy', max_open=128,
+                 dtype=None, quantization=None):
 
         if augmentation is not None:
             msg = 'Data augmentation is not supported by `Precomputed`.'
@@ -86,6 +121,11 @@ class Precomputed(object):
         super(Precomputed, self).__init__()
         self.root_dir = Path(root_dir).expanduser().resolve(strict=False)
         self.use_memmap = use_memmap
+        self.max_open = max_open
+
+        # pool of open memory maps (see Precomputed.memmap)
+        self.memmaps_ = LRUCache(maxsize=self.max_open)
+        self.memmaps_lock_ = threading.Lock()
 
         path = self.root_dir / 'metadata.yml'
         if path.exists():
@@ -95,6 +135,9 @@ class Precomputed(object):
 
             self.dimension_ = params.pop('dimension')
             self.labels_ = params.pop('labels', None)
+            self.storage_ = params.pop('storage', 'npy')
+            self.dtype_ = params.pop('dtype', None)
+            self.quantization_ = params.pop('quantization', None)
             self.sliding_window_ = SlidingWindow(**params)
 
             if dimension is not None and self.dimension_ != dimension:
@@ -114,6 +157,34 @@ class Precomputed(object):
 
         else:
 
+            if storage not in self.STORAGE:
+                msg = (
+                    f'"storage" must be one of {self.STORAGE} '
+                    f'(is: "{storage}").'
+                )
+                raise ValueError(msg)
+
+            if quantization is not None:
+                if quantization not in self.QUANTIZATION:
+                    msg = (
+                        f'"quantization" must be one of {self.QUANTIZATION} '
+                        f'(is: "{quantization}").'
+                    )
+                    raise ValueError(msg)
+                if dtype is not None:
+                    msg = '"dtype" and "quantization" are mutually exclusive.'
+                    raise ValueError(msg)
+
+            if dtype is not None:
+                dtype = np.dtype(dtype)
+                if dtype.kind != 'f':
+                    msg = (
+                        f'"dtype" must be a floating point data type '
+                        f'(is: "{dtype}"). Use "quantization" instead.'
+                    )
+                    raise ValueError(msg)
+                dtype = dtype.name
+
             if dimension is None:
                 if labels is None:
                     msg = (
@@ -142,6 +213,13 @@ class Precomputed(object):
                       'dimension': dimension}
             if labels is not None:
                 params['labels'] = labels
+            # only record non-default storage for backward compatibility
+            if storage != 'npy':
+                params['storage'] = storage
+            if dtype is not None:
+                params['dtype'] = dtype
+            if quantization is not None:
+                params['quantization'] = quantization
 
             with io.open(path, 'w') as f:
                 yaml.dump(params, f, default_flow_style=False)
@@ -149,6 +227,12 @@ class Precomputed(object):
             self.sliding_window_ = sliding_window
             self.dimension_ = dimension
             self.labels_ = labels
+            self.storage_ = storage
+            self.dtype_ = dtype
+            self.quantization_ = quantization
+
+        if self.storage_ == 'shards':
+            self.shards_ = ShardedStorage(self.root_dir / 'shards')
 
     @property
     def sliding_window(self):
@@ -165,6 +249,110 @@ class Precomputed(object):
         """Human-readable label of each dimension"""
         return self.labels_
 
+    @property
+    def dtype(self):
+        """Storage data type (None for original data type)"""
+        return self.dtype_
+
+    @property
+    def quantization(self):
+        """Storage quantization (None for no quantization)"""
+        return self.quantization_
+
+    def encode(self, data):
+        """Convert features to their storage representation
+
+        Parameters
+        ----------
+        data : numpy array
+            Features.
+
+        Returns
+        -------
+        data : numpy array
+            Features in storage data type.
+        quantization : (2, dimension) numpy array or None
+            Offset and scale of each dimension (when quantized).
+        """
+
+        if self.quantization_ is not None:
+            levels = np.iinfo(self.quantization_).max
+            data = np.asarray(data, dtype=np.float64)
+            if len(data) > 0:
+                offset = np.min(data, axis=0)
+                scale = (np.max(data, axis=0) - offset) / levels
+            else:
+                offset = np.zeros(data.shape[1:])
+                scale = np.ones(data.shape[1:])
+            scale[scale == 0.] = 1.
+            quantized = np.clip(np.round((data - offset) / scale), 0, levels)
+            quantization = np.stack([offset, scale]).astype(np.float32)
+            return quantized.astype(self.quantization_), quantization
+
+        if self.dtype_ is not None:
+            return np.asarray(data, dtype=self.dtype_), None
+
+        return data, None
+
+    def decode(self, data, quantization=None):
+        """Convert features back from their storage representation
+
+        Parameters
+        ----------
+        data : numpy array
+            Features in storage data type.
+        quantization : (2, dimension) numpy array, optional
+            Offset and scale of each dimension (when quantized).
+
+        Returns
+        -------
+        data : numpy array
+            Features.
+        """
+
+        if self.quantization_ is not None:
+            offset, scale = quantization
+            return (data * scale + offset).astype(np.float32)
+
+        if self.dtype_ is not None and np.dtype(self.dtype_).itemsize < 4:
+            return np.asarray(data, dtype=np.float32)
+
+        return data
+
+    def load_quantization(self, current_file):
+        """Load offset and scale of quantized features"""
+
+        if self.quantization_ is None:
+            return None
+
+        if self.storage_ == 'shards':
+            uri = get_unique_identifier(current_file)
+            return self.shards_.read(f'{uri}.quantization')
+
+        return self._memmap(self.get_quantization_path(current_file))
+
+    def __getstate__(self):
+        # memory maps and locks cannot (and should not) be pickled
+        state = dict(self.__dict__)
+        del state['memmaps_'], state['memmaps_lock_']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.memmaps_ = LRUCache(maxsize=self.max_open)
+        self.memmaps_lock_ = threading.Lock()
+
+    @property
+    def storage(self):
+        """Storage backend ('npy' or 'shards')"""
+        return self.storage_
+
+    def __contains__(self, current_file):
+        """Check whether features have already been precomputed for file"""
+        if self.storage_ == 'shards':
+            return get_unique_identifier(current_file) in self.shards_
+        return Path(self.get_path(current_file)).exists()
+
     def __call__(self, current_file):
         """Obtain features for file
 
@@ -179,20 +367,49 @@ class Precomputed(object):
             Features
         """
 
-        path = Path(self.get_path(current_file))
-
-        if not path.exists():
+        if current_file not in self:
             uri = get_unique_identifier(current_file)
             msg = f'No precomputed features for "{uri}".'
             raise PyannoteFeatureExtractionError(msg)
 
-        if self.use_memmap:
-            data = np.load(str(path), mmap_mode='r')
+        if self.storage_ == 'shards':
+            uri = get_unique_identifier(current_file)
+            data = self.shards_.read(uri, use_memmap=self.use_memmap)
+
+        elif self.use_memmap:
+            data = self.memmap(current_file)
+
         else:
-            data = np.load(str(path))
+            data = np.load(self.get_path(current_file))
 
+        data = self.decode(data, self.load_quantization(current_file))
         return SlidingWindowFeature(data, self.sliding_window_)
 
+    def memmap(self, current_file):
+        """Get (pooled) read-only memory map of precomputed features
+
+        Parameters
+        ----------
+        current_file : dict
+            `pyannote.database` file.
+
+        Returns
+        -------
+        memmap : `np.memmap`
+            Memory map. Up to `max_open` memory maps are kept open for later
+            reuse.
+        """
+
+        return self._memmap(self.get_path(current_file))
+
+    def _memmap(self, path):
+        with self.memmaps_lock_:
+            memmap = self.memmaps_.get(path, None)
+            if memmap is None:
+                memmap = open_memmap(path, mode='r')
+                self.memmaps_[path] = memmap
+        return memmap
+
     def crop(self, current_file, segment, mode='center', fixed=None):
         """Fast version of self(current_file).crop(segment, **kwargs)
 
@@ -217,31 +434,103 @@ class Precomputed(object):
         if mode == 'center' and fixed is None:
             fixed = segment.duration
 
-        memmap = open_memmap(self.get_path(current_file), mode='r')
-        swf = SlidingWindowFeature(memmap, self.sliding_window_)
-        result = swf.crop(segment, mode=mode, fixed=fixed)
-        del memmap
-        return result
+        # compute frame range directly rather than building an intermediate
+        # SlidingWindowFeature instance and calling its "crop" method
+        (start, end), = self.sliding_window_.crop(
+            segment, mode=mode, fixed=fixed, return_ranges=True)
+
+        quantization = self.load_quantization(current_file)
+
+        if self.storage_ == 'shards':
+            uri = get_unique_identifier(current_file)
+            n_samples = self.shards_.shape(uri)[0]
+            read = lambda i, j: self.decode(
+                self.shards_.read(uri, start=i, end=j), quantization)
+
+        else:
+            memmap = self.memmap(current_file)
+            n_samples = memmap.shape[0]
+            read = lambda i, j: self.decode(
+                np.array(memmap[i:j]), quantization)
+
+        return crop_frames(read, n_samples, start, end, fixed=fixed)
 
     def shape(self, item):
         """Faster version of precomputed(item).data.shape"""
-        memmap = open_memmap(self.get_path(item), mode='r')
-        shape = memmap.shape
-        del memmap
-        return shape
+        if self.storage_ == 'shards':
+            return self.shards_.shape(get_unique_identifier(item))
+        return self.memmap(item).shape
 
     def dump(self, item, features):
-        path = Path(self.get_path(item))
-        mkdir_p(path.parent)
-        np.save(path, features.data)
+
+        data, quantization = self.encode(features.data)
+
+        # quantization parameters are written first so that they are
+        # available as soon as features are
+        if self.storage_ == 'shards':
+            uri = get_unique_identifier(item)
+            if quantization is not None:
+                self.shards_.write(f'{uri}.quantization', quantization)
+            self.shards_.write(uri, data)
+            return
+
+        path = self.get_path(item)
+        quantization_path = self.get_quantization_path(item)
+        # do not keep a memory map on a file that is about to be overwritten
+        with self.memmaps_lock_:
+            self.memmaps_.pop(path, None)
+            self.memmaps_.pop(quantization_path, None)
+        mkdir_p(Path(path).parent)
+        if quantization is not None:
+            np.save(quantization_path, quantization)
+        np.save(path, data)
 
 
 class PrecomputedHTK(object):
+    """Precomputed features stored in HTK format
+
+    Parameters
+    ----------
+    root_dir : `str`
+        Path to directory where HTK files are stored.
+    duration : `float`, optional
+        Duration of feature frames. Defaults to 0.025 (25ms).
+    step : `float`, optional
+        Step between consecutive feature frames. Defaults to the sample period
+        found in HTK files header.
+    dimension : `int`, optional
+        Dimension of feature vectors. Only used when `root_dir` does not
+        contain any HTK file yet (in which case `step` must be provided too).
+    max_open : `int`, optional
+        Maximum number of HTK files kept open (as memory maps) by `crop` for
+        later reuse. Defaults to 128.
+
+    Notes
+    -----
+    Only uncompressed 32-bit float HTK files are supported.
+    """
+
+    # HTK header is made of four big-endian fields:
+    # n_samples (int32), sample_period (int32, in 100ns), sample_size (int16,
+    # in bytes) and parameter_kind (int16).
+    HEADER = '>iihh'
+    HEADER_SIZE = 12
+    DTYPE = np.dtype('>f4')
+
+    # parameter kind used by "dump": USER (9)
+    PARAMETER_KIND = 9
+    # parameter kind flag for compressed files
+    COMPRESSED = 0o2000
 
-    def __init__(self, root_dir=None, duration=0.025, step=None):
+    def __init__(self, root_dir=None, duration=0.025, step=None,
+                 dimension=None, max_open=128):
         super(PrecomputedHTK, self).__init__()
         self.root_dir = root_dir
         self.duration = duration
+        self.max_open = max_open
+
+        self.memmaps_ = LRUCache(maxsize=self.max_open)
+        self.memmaps_lock_ = threading.Lock()
 
         # load any htk file in root_dir/database
         path = '{root_dir}/*/*.htk'.format(root_dir=root_dir)
@@ -253,14 +542,18 @@ class PrecomputedHTK(object):
 
         if len(found) > 0:
             file_htk = found[0]
+            n_samples, sample_period, dimension = self.load_header(file_htk)
+            self.dimension_ = dimension
+            self.step = sample_period * 1e-7
+
+        elif step is not None and dimension is not None:
+            self.dimension_ = dimension
+            self.step = step
+
         else:
             msg = "Could not find any HTK file in '{root_dir}'."
             raise ValueError(msg.format(root_dir=root_dir))
 
-        X, sample_period = self.load_htk(file_htk)
-        self.dimension_ = X.shape[1]
-        self.step = sample_period * 1e-7
-
         # don't trust HTK header when 'step' is provided by the user.
         # HACK remove this when Pepe's HTK files are fixed...
         if step is not None:
@@ -269,6 +562,18 @@ class PrecomputedHTK(object):
         self.sliding_window_ = SlidingWindow(start=0.,
                                              duration=self.duration,
                                              step=self.step)
+
+    def __getstate__(self):
+        # memory maps and locks cannot (and should not) be pickled
+        state = dict(self.__dict__)
+        del state['memmaps_'], state['memmaps_lock_']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.memmaps_ = LRUCache(maxsize=self.max_open)
+        self.memmaps_lock_ = threading.Lock()
+
     @property
     def sliding_window(self):
         return self.sliding_window_
@@ -283,22 +588,136 @@ class PrecomputedHTK(object):
         path = '{root_dir}/{uri}.htk'.format(root_dir=root_dir, uri=uri)
         return path
 
-    # http://codereview.stackexchange.com/questions/
-    # 1496/reading-a-binary-file-containing-periodic-samples
-    @staticmethod
-    def load_htk(file_htk):
+    @classmethod
+    def load_header(cls, file_htk):
+        """Read HTK header
+
+        Returns
+        -------
+        n_samples : int
+            Number of feature vectors.
+        sample_period : int
+            Sample period, in 100ns units.
+        dimension : int
+            Dimension of feature vectors.
+        """
         with open(file_htk, 'rb') as fp:
-            data = fp.read(12)
-            num_samples, sample_period, sample_size, _ = unpack('>iihh', data)
-            num_features = int(sample_size / 4)
-            num_samples = int(num_samples)
-            X = np.empty((num_samples, num_features))
-            for i in range(num_samples):
-                data = fp.read(sample_size)
-                X[i, :] = unpack('>' + ('f' * (sample_size // 4)), data)
-        return X, sample_period
+            n_samples, sample_period, sample_size, kind = unpack(
+                cls.HEADER, fp.read(cls.HEADER_SIZE))
+
+        if kind & cls.COMPRESSED:
+            msg = f'Compressed HTK files are not supported ("{file_htk}").'
+            raise ValueError(msg)
+
+        return n_samples, sample_period, sample_size // cls.DTYPE.itemsize
+
+    @classmethod
+    def memmap_htk(cls, file_htk):
+        """Memory-map HTK file
+
+        Returns
+        -------
+        memmap : (n_samples, dimension) big-endian float32 `np.memmap`
+        sample_period : int
+            Sample period, in 100ns units.
+        """
+        n_samples, sample_period, dimension = cls.load_header(file_htk)
+        memmap = np.memmap(file_htk, dtype=cls.DTYPE, mode='r',
+                           offset=cls.HEADER_SIZE,
+                           shape=(n_samples, dimension))
+        return memmap, sample_period
+
+    @classmethod
+    def load_htk(cls, file_htk):
+        """Load HTK file
+
+        Returns
+        -------
+        X : (n_samples, dimension) float32 numpy array
+        sample_period : int
+            Sample period, in 100ns units.
+        """
+        memmap, sample_period = cls.memmap_htk(file_htk)
+        return memmap.astype(np.float32), sample_period
+
+    def memmap(self, item):
+        """Get (pooled) memory map of HTK file"""
+        path = self.get_path(self.root_dir, item)
+        with self.memmaps_lock_:
+            memmap = self.memmaps_.get(path, None)
+            if memmap is None:
+                memmap, _ = self.memmap_htk(path)
+                self.memmaps_[path] = memmap
+        return memmap
+
+    def __contains__(self, item):
+        return Path(self.get_path(self.root_dir, item)).exists()
 
     def __call__(self, item):
         file_htk = self.get_path(self.root_dir, item)
         X, _ = self.load_htk(file_htk)
         return SlidingWindowFeature(X, self.sliding_window_)
+
+    def crop(self, current_file, segment, mode='center', fixed=None):
+        """Fast version of self(current_file).crop(segment, **kwargs)
+
+        Parameters
+        ----------
+        current_file : dict
+            `pyannote.database` file.
+        segment : `pyannote.core.Segment`
+            Segment from which to extract features.
+
+        Returns
+        -------
+        features : (n_frames, dimension) numpy array
+            Extracted features
+
+        See also
+        --------
+        `pyannote.core.SlidingWindowFeature.crop`
+        """
+
+        # match default FeatureExtraction.crop behavior
+        if mode == 'center' and fixed is None:
+            fixed = segment.duration
+
+        (start, end), = self.sliding_window_.crop(
+            segment, mode=mode, fixed=fixed, return_ranges=True)
+
+        memmap = self.memmap(current_file)
+        read = lambda i, j: memmap[i:j].astype(np.float32)
+        return crop_frames(read, memmap.shape[0], start, end, fixed=fixed)
+
+    def shape(self, item):
+        """Faster version of precomputed(item).data.shape"""
+        n_samples, _, dimension = self.load_header(
+            self.get_path(self.root_dir, item))
+        return (n_samples, dimension)
+
+    def dump(self, item, features):
+        """Save features in HTK format
+
+        Parameters
+        ----------
+        item : dict
+            `pyannote.database` file.
+        features : `SlidingWindowFeature` or (n_samples, dimension) array
+            Features.
+        """
+
+        data = getattr(features, 'data', features)
+        n_samples, dimension = data.shape
+
+        path = self.get_path(self.root_dir, item)
+        # do not keep a memory map on a file that is about to be overwritten
+        with self.memmaps_lock_:
+            self.memmaps_.pop(path, None)
+        mkdir_p(Path(path).parent)
+
+        sample_period = int(round(self.step * 1e7))
+        sample_size = dimension * self.DTYPE.itemsize
+        with open(path, 'wb') as fp:
+            fp.write(pack(self.HEADER, n_samples, sample_period,
+                          sample_size, self.PARAMETER_KIND))
+            fp.write(np.ascontiguousarray(data, dtype=self.DTYPE).tobytes())
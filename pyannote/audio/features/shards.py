@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# The MIT License (MIT)
+
+# Copyright (c) 2019 CNRS
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# AUTHORS
+# Hervé BREDIN - http://herve.niderb.fr
+
+import os
+import socket
+from pathlib import Path
+
+import numpy as np
+
+from pyannote.audio.util import mkdir_p
+
+
+def crop_frames(read, n_samples, start, end, fixed=None):
+    """Read frames [start, end) with out-of-bounds handling
+
+    This mimics what `SlidingWindowFeature.crop` does with ranges returned by
+    `SlidingWindow.crop`: ranges are clipped to [0, n_samples) and, when
+    `fixed` is set, first (resp. last) frame is repeated as many times as
+    needed to get the expected number of frames.
+
+    Parameters
+    ----------
+    read : callable
+        read(i, j) returns frames [i, j) as a numpy array (0 <= i <= j).
+    n_samples : int
+        Total number of frames.
+    start, end : int
+        Requested range (may be out of bounds).
+    fixed : float, optional
+        Set to repeat first/last frames when range is out of bounds.
+
+    Returns
+    -------
+    data : numpy array
+    """
+
+    repeat_first = min(end, 0) - min(start, 0)
+    repeat_last = max(end, n_samples) - max(start, n_samples)
+
+    if end < 0 or start >= n_samples:
+        data = read(0, 0)
+    else:
+        i, j = max(start, 0), min(end, n_samples)
+        data = read(i, max(i, j))
+
+    if fixed is None or (repeat_first == 0 and repeat_last == 0):
+        return data
+
+    return np.concatenate([np.repeat(read(0, 1), repeat_first, axis=0),
+                           data,
+                           np.repeat(read(n_samples - 1, n_samples),
+                                     repeat_last, axis=0)])
+
+
+class ShardedStorage(object):
+    """Pack many feature matrices into a few large shard files
+
+    Each writer (i.e. each process) appends feature matrices to its own shard
+    files (starting a new one whenever the current one exceeds `shard_size`)
+    and records their location in its own index file:
+
+        <root_dir>/<writer>-<k>.shard  # raw concatenated feature matrices
+        <root_dir>/<writer>.idx        # uri -> shard, offset, shape, dtype
+
+    Reading a range of frames boils down to a single `os.pread` call on a file
+    descriptor that is opened once and for all.
+
+    Parameters
+    ----------
+    root_dir : `Path`
+        Path to directory where shards are stored.
+    shard_size : `int`, optional
+        Start a new shard when the current one is bigger than `shard_size`
+        bytes. Defaults to 1GB.
+    """
+
+    def __init__(self, root_dir, shard_size=2**30):
+        super().__init__()
+        self.root_dir = Path(root_dir)
+        self.shard_size = shard_size
+
+        self.index_ = None
+        self.offsets_ = None
+        self.fds_ = {}
+        self.shard_ = None
+
+    def __getstate__(self):
+        # file descriptors cannot be shared across processes
+        return {'root_dir': self.root_dir,
+                'shard_size': self.shard_size}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __del__(self):
+        for fd in self.fds_.values():
+            os.close(fd)
+
+    @property
+    def writer(self):
+        return f'{socket.gethostname()}-{os.getpid():d}'
+
+    def load_index(self):
+        """(Re)load index written by all writers"""
+        self.index_ = {}
+        self.offsets_ = {}
+        self.update_index()
+
+    def update_index(self):
+        """Parse lines appended to index files since they were last read
+
+        Index files are append-only: only their new (complete) lines are
+        parsed, so that keeping up with concurrent writers costs time
+        proportional to what they wrote, not to the size of the index.
+        """
+
+        sizes = {}
+        for path in self.root_dir.glob('*.idx'):
+            try:
+                sizes[path.name] = path.stat().st_size
+            except FileNotFoundError as e:
+                continue
+
+        # an index file shrank (i.e. it has been rewritten): start over
+        if any(size < self.offsets_.get(name, 0)
+               for name, size in sizes.items()):
+            self.index_, self.offsets_ = {}, {}
+
+        for name, size in sizes.items():
+            offset = self.offsets_.get(name, 0)
+            if size == offset:
+                continue
+            with open(self.root_dir / name, 'rb') as f:
+                f.seek(offset)
+                chunk = f.read(size - offset)
+            # only parse complete lines (a writer may be writing the last one)
+            chunk = chunk[:chunk.rfind(b'\n') + 1]
+            for line in chunk.decode('utf-8').splitlines():
+                uri, shard, start, shape, dtype = line.split('\t')
+                shape = tuple(int(s) for s in shape.split('x'))
+                self.index_[uri] = (shard, int(start), shape, np.dtype(dtype))
+            self.offsets_[name] = offset + len(chunk)
+
+    def entry(self, uri):
+        """Return (shard, offset, shape, dtype) entry for `uri`
+
+        Raises
+        ------
+        KeyError when `uri` is not found.
+        """
+
+        if self.index_ is None:
+            self.load_index()
+
+        # another writer might have dumped it in the meantime
+        elif uri not in self.index_:
+            self.update_index()
+
+        return self.index_[uri]
+
+    def __contains__(self, uri):
+        try:
+            self.entry(uri)
+        except KeyError as e:
+            return False
+        return True
+
+    def shape(self, uri):
+        _, _, shape, _ = self.entry(uri)
+        return shape
+
+    def _fd(self, shard):
+        fd = self.fds_.get(shard, None)
+        if fd is None:
+            fd = os.open(str(self.root_dir / shard), os.O_RDONLY)
+            self.fds_[shard] = fd
+        return fd
+
+    def read(self, uri, start=0, end=None, use_memmap=False):
+        """Read frames [start, end) of `uri` feature matrix
+
+        Parameters
+        ----------
+        uri : `str`
+        start, end : `int`, optional
+            Range of frames. Defaults to reading the whole matrix.
+        use_memmap : `bool`, optional
+            Return a memory map instead of reading data. Defaults to False.
+
+        Returns
+        -------
+        data : numpy array
+        """
+
+        shard, offset, shape, dtype = self.entry(uri)
+        n_samples, dimension = shape[0], shape[1:]
+        if end is None:
+            end = n_samples
+
+        frame_size = dtype.itemsize * int(np.prod(dimension))
+        offset += start * frame_size
+        n_frames = end - start
+
+        if use_memmap and n_frames > 0:
+            return np.memmap(self.root_dir / shard, dtype=dtype, mode='r',
+                             offset=offset, shape=(n_frames, ) + dimension)
+
+        buffer = os.pread(self._fd(shard), n_frames * frame_size, offset)
+        return np.frombuffer(bytearray(buffer), dtype=dtype).reshape(
+            (n_frames, ) + dimension)
+
+    def _writable_shard(self):
+
+        # writer changes when forked
+        writer = self.writer
+        if self.shard_ is None or not self.shard_.startswith(f'{writer}-'):
+            shards = sorted(self.root_dir.glob(f'{writer}-*.shard'))
+            if shards:
+                self.shard_ = shards[-1].name
+            else:
+                self.shard_ = f'{writer}-{0:04d}.shard'
+
+        path = self.root_dir / self.shard_
+        if path.exists() and path.stat().st_size >= self.shard_size:
+            k = int(self.shard_[len(writer) + 1:-len('.shard')])
+            self.shard_ = f'{writer}-{k+1:04d}.shard'
+
+        return self.shard_
+
+    def write(self, uri, data):
+        """Append `uri` feature matrix to current shard
+
+        Parameters
+        ----------
+        uri : `str`
+        data : numpy array
+        """
+
+        if '\t' in uri or '\n' in uri:
+            msg = f'Unsupported URI: "{uri}" contains tabs or new lines.'
+            raise ValueError(msg)
+
+        mkdir_p(self.root_dir)
+
+        data = np.ascontiguousarray(data)
+        shard = self._writable_shard()
+        with open(self.root_dir / shard, 'ab') as f:
+            offset = f.tell()
+            f.write(data.tobytes())
+
+        idx = self.root_dir / f'{self.writer}.idx'
+        shape = 'x'.join(str(s) for s in data.shape)
+        line = f'{uri}\t{shard}\t{offset:d}\t{shape}\t{data.dtype.str}\n'
+        line = line.encode('utf-8')
+        with open(idx, 'ab') as f:
+            position = f.tell()
+            f.write(line)
+
+        if self.index_ is not None:
+            self.index_[uri] = (shard, offset, data.shape, data.dtype)
+            # skip own line when updating index, unless the index file has
+            # not been read up to this line yet
+            if self.offsets_.get(idx.name, 0) == position:
+                self.offsets_[idx.name] = position + len(line)
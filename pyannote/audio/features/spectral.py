@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# The MIT License (MIT)
+
+# Copyright (c) 2019 CNRS
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# AUTHORS
+# Hervé BREDIN - http://herve.niderb.fr
+
+"""
+Cached-basis NumPy implementation of librosa spectral features
+
+Window, mel filterbank, DCT matrix and delta filters only depend on feature
+extraction parameters: they are computed once and for all (and shared between
+feature extractors with the same parameters). All frames of a waveform are
+then processed at once by a single batched FFT followed by matrix products.
+
+Outputs match their `librosa` counterparts (as of librosa 0.6, i.e. with
+reflect padding of centered frames) up to float32 precision: absolute
+difference is below 1e-4 for dB-scaled mel spectrograms and MFCCs, relative
+difference is below 1e-4 for magnitude spectrograms. All outputs are float32.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+import scipy.signal
+import scipy.fftpack
+from numpy.lib.stride_tricks import as_strided
+
+import librosa
+
+
+@lru_cache(maxsize=None)
+def get_window(window, n_fft):
+    """Periodic analysis window (as used by librosa.core.stft)"""
+    return scipy.signal.get_window(window, n_fft, fftbins=True)
+
+
+@lru_cache(maxsize=None)
+def get_mel_basis(sample_rate, n_fft, n_mels, fmin=0.0, fmax=None, htk=False):
+    """(n_fft // 2 + 1, n_mels) mel filterbank"""
+    return librosa.filters.mel(sr=sample_rate, n_fft=n_fft, n_mels=n_mels,
+                               fmin=fmin, fmax=fmax, htk=htk).T
+
+
+@lru_cache(maxsize=None)
+def get_dct_basis(n_mels, n_mfcc):
+    """(n_mels, n_mfcc) orthonormal type-II DCT basis
+
+    The basis is float32 so that projecting (float32) log-mel spectrograms
+    onto it does not upcast MFCCs to float64.
+    """
+    basis = scipy.fftpack.dct(np.eye(n_mels), axis=0, type=2, norm='ortho')
+    return np.ascontiguousarray(basis[:n_mfcc].T, dtype=np.float32)
+
+
+@lru_cache(maxsize=None)
+def get_delta_filters(width, orders):
+    """Savitzky-Golay derivative filters (as used by librosa.feature.delta)
+
+    Returns
+    -------
+    kernels : (n_orders, width) numpy array
+        Filters applied to any full window of `width` frames.
+    head : (n_orders, width // 2, width) numpy array
+    tail : (n_orders, width // 2, width) numpy array
+        Linear maps from first (resp. last) `width` frames to first (resp.
+        last) `width // 2` output frames, as computed by 'interp' mode.
+    """
+
+    half = width // 2
+    kernels, head, tail = [], [], []
+    for order in orders:
+        kernels.append(scipy.signal.savgol_coeffs(
+            width, order, deriv=order, use='dot'))
+        M = scipy.signal.savgol_filter(np.eye(width), width, order,
+                                       deriv=order, axis=0, mode='interp')
+        head.append(M[:half])
+        tail.append(M[half + 1:])
+    return np.stack(kernels), np.stack(head), np.stack(tail)
+
+
+def frame(y, n_fft, hop_length):
+    """Centered, reflect-padded (n_frames, n_fft) view on waveform `y`"""
+    y = np.pad(y, n_fft // 2, mode='reflect')
+    n_frames = 1 + (len(y) - n_fft) // hop_length
+    stride, = y.strides
+    return as_strided(y, shape=(n_frames, n_fft),
+                      strides=(hop_length * stride, stride),
+                      writeable=False)
+
+
+def stft_power(y, n_fft, hop_length, window='hann', power=2.):
+    """Equivalent to np.abs(librosa.stft(y, ...).T) ** power
+
+    Parameters
+    ----------
+    y : (n_samples, ) numpy array
+        Waveform
+    n_fft : int
+    hop_length : int
+    window : str, optional
+        Defaults to 'hann'.
+    power : float, optional
+        Defaults to 2 (power spectrogram).
+
+    Returns
+    -------
+    S : (n_frames, n_fft // 2 + 1) float32 numpy array
+    """
+    frames = frame(y, n_fft, hop_length) * get_window(window, n_fft)
+    S = np.abs(np.fft.rfft(frames, axis=1)).astype(np.float32)
+    if power != 1.:
+        S **= power
+    return S
+
+
+def power_to_db(S, ref=1.0, amin=1e-10, top_db=80.0):
+    """Equivalent to librosa.power_to_db"""
+    if callable(ref):
+        ref = ref(S)
+    log_spec = 10.0 * np.log10(np.maximum(amin, S))
+    log_spec -= 10.0 * np.log10(np.maximum(amin, ref))
+    if top_db is not None and log_spec.size:
+        log_spec = np.maximum(log_spec, log_spec.max() - top_db)
+    return log_spec
+
+
+def deltas(X, width=9, orders=(1, 2)):
+    """Equivalent to [librosa.feature.delta(X.T, width, order).T ...]
+
+    All requested derivatives are computed by a single convolution.
+
+    Parameters
+    ----------
+    X : (n_frames, dimension) numpy array
+    width : int, optional
+        Defaults to 9.
+    orders : tuple, optional
+        Derivative orders. Defaults to (1, 2).
+
+    Returns
+    -------
+    deltas : (n_orders, n_frames, dimension) numpy array
+    """
+
+    n_frames, dimension = X.shape
+
+    if n_frames < width:
+        return np.stack([librosa.feature.delta(X, width=width, order=order,
+                                               axis=0)
+                         for order in orders])
+
+    kernels, head, tail = get_delta_filters(width, tuple(orders))
+    half = width // 2
+
+    D = np.zeros((len(orders), n_frames, dimension), dtype=X.dtype)
+
+    # interior frames: one (multi-output) convolution
+    interior = D[:, half:n_frames - half]
+    for w in range(width):
+        interior += kernels[:, w, None, None] * X[w:n_frames - width + 1 + w]
+
+    # boundary frames: polynomial fit on first (resp. last) frames
+    D[:, :half] = np.einsum('ohw,wd->ohd', head, X[:width])
+    D[:, n_frames - half:] = np.einsum('ohw,wd->ohd', tail, X[-width:])
+    return D
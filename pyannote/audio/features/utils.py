@@ -26,17 +26,421 @@
 # AUTHORS
 # Hervé BREDIN - http://herve.niderb.fr
 
+import os
+import sqlite3
+import threading
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from math import gcd
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
 import numpy as np
-
-import librosa
-from librosa.util import valid_audio
-from librosa.util.exceptions import ParameterError
+import scipy.signal
+from numpy.lib.format import open_memmap
+from cachetools import LRUCache
 
 from pyannote.core import SlidingWindow, SlidingWindowFeature
+from pyannote.database import get_unique_identifier
+from pyannote.audio.util import mkdir_p
 
 from soundfile import SoundFile
 import soundfile as sf
 
+class SoundFilePool(object):
+    """Per-thread LRU pool of open `SoundFile` handles
+
+    Opening an audio file (and parsing its header) is expensive for some
+    formats (e.g. NIST sphere or FLAC seek tables). This pool keeps the
+    `maxsize` most recently used handles open, for later reuse. Each thread
+    (and each process) gets its own handles so that seeking and reading
+    never interfere between `batchify` background threads.
+
+    Parameters
+    ----------
+    maxsize : int, optional
+        Maximum number of open handles per thread. Defaults to 32.
+
+    Usage
+    -----
+    >>> with SOUNDFILE_POOL.open(path) as audio_file:
+    ...     audio_file.seek(start)
+    ...     data = audio_file.read(n_samples)
+    """
+
+    def __init__(self, maxsize=32):
+        super().__init__()
+        self.maxsize = maxsize
+        self._reset()
+
+    def _reset(self):
+        self.pid_ = os.getpid()
+        self.local_ = threading.local()
+
+    @property
+    def maxsize(self):
+        return self.maxsize_
+
+    @maxsize.setter
+    def maxsize(self, maxsize):
+        self.maxsize_ = maxsize
+        # handles will be re-opened lazily
+        self._reset()
+
+    def _handles(self):
+        # do not share handles (and their file offset) with parent process
+        if os.getpid() != self.pid_:
+            self._reset()
+        handles = getattr(self.local_, 'handles', None)
+        if handles is None:
+            handles = _SoundFileCache(maxsize=self.maxsize_)
+            self.local_.handles = handles
+        return handles
+
+    @contextmanager
+    def open(self, path):
+        """Get (pooled) read-only `SoundFile` handle
+
+        Handles must not be closed by the caller and must only be used
+        within the context manager.
+        """
+
+        path = str(path)
+
+        if self.maxsize_ < 1:
+            with SoundFile(path, 'r') as audio_file:
+                yield audio_file
+            return
+
+        handles = self._handles()
+        audio_file = handles.get(path, None)
+        if audio_file is None:
+            audio_file = SoundFile(path, 'r')
+            handles[path] = audio_file
+
+        try:
+            yield audio_file
+        except Exception as e:
+            # do not keep a handle in a possibly inconsistent state
+            handles.pop(path, None)
+            audio_file.close()
+            raise e
+
+
+class _SoundFileCache(LRUCache):
+    """LRU cache that closes evicted `SoundFile` handles"""
+
+    def popitem(self):
+        path, audio_file = super().popitem()
+        audio_file.close()
+        return path, audio_file
+
+
+# process-wide pool of SoundFile handles
+# use SOUNDFILE_POOL.maxsize = n to change the number of open files per thread
+SOUNDFILE_POOL = SoundFilePool()
+
+
+class AudioMetadataIndex(object):
+    """Persistent index of audio files metadata
+
+    Native sample rate, number of channels and number of frames are stored
+    in a (sidecar) SQLite database, keyed by absolute path, modification time
+    and size of audio files, so that (possibly slow) audio headers are only
+    read once, across processes and runs.
+
+    Parameters
+    ----------
+    path : `Path` or str, optional
+        Path to SQLite database. Defaults to only keeping metadata in memory.
+    n_jobs : int, optional
+        Number of threads used to read headers in `update`. Defaults to 8.
+
+    Usage
+    -----
+    >>> index = AudioMetadataIndex('/path/to/audio_metadata.db')
+    >>> index.update(paths)  # read missing headers in parallel
+    >>> sample_rate, n_channels, n_frames = index.info(path)
+    """
+
+    def __init__(self, path=None, n_jobs=8):
+        super().__init__()
+        self.path = None if path is None else Path(path).expanduser()
+        self.n_jobs = n_jobs
+        self.info_ = {}
+        self._reset()
+
+    def _reset(self):
+        self.pid_ = os.getpid()
+        self.lock_ = threading.Lock()
+        self.connection_ = None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['lock_']
+        del state['connection_']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset()
+
+    def _connect(self):
+        """Get (per-process) connection to SQLite database
+
+        Must be called with `lock_` acquired. Returns None when metadata
+        are only kept in memory.
+        """
+
+        if self.path is None:
+            return None
+
+        # sqlite connections must not be shared with child processes
+        if os.getpid() != self.pid_:
+            self.pid_ = os.getpid()
+            self.connection_ = None
+
+        if self.connection_ is None:
+            try:
+                mkdir_p(self.path.parent)
+                connection = sqlite3.connect(str(self.path), timeout=60.,
+                                             check_same_thread=False)
+                connection.execute(
+                    'CREATE TABLE IF NOT EXISTS audio '
+                    '(path TEXT PRIMARY KEY, mtime INTEGER, size INTEGER, '
+                    'sample_rate INTEGER, channels INTEGER, frames INTEGER)')
+                connection.commit()
+            except (OSError, sqlite3.Error) as e:
+                self._disable(e)
+                return None
+            self.connection_ = connection
+
+        return self.connection_
+
+    def _disable(self, error):
+        """Fall back to keeping metadata in memory (with a single warning)
+
+        Must be called with `lock_` acquired.
+        """
+
+        msg = (
+            f'Audio metadata will only be kept in memory because '
+            f'"{self.path}" could not be used: {error}.'
+        )
+        warnings.warn(msg)
+        self.path = None
+        if self.connection_ is not None:
+            try:
+                self.connection_.close()
+            except sqlite3.Error:
+                pass
+            self.connection_ = None
+
+    @staticmethod
+    def _resolve(path):
+        return str(Path(path).resolve())
+
+    @staticmethod
+    def _stat(path):
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    @classmethod
+    def _try_stat(cls, path):
+        try:
+            return cls._stat(path)
+        except OSError:
+            return None
+
+    @staticmethod
+    def _probe(path):
+        with SoundFile(path, 'r') as audio_file:
+            return (audio_file.samplerate,
+                    audio_file.channels,
+                    audio_file.frames)
+
+    @classmethod
+    def _try_probe(cls, path):
+        try:
+            return cls._probe(path)
+        except Exception:
+            return None
+
+    def _lookup(self, stats):
+        """Get up-to-date metadata from database
+
+        Parameters
+        ----------
+        stats : dict
+            Maps paths to their (mtime, size) stat.
+        """
+
+        found = {}
+        with self.lock_:
+            connection = self._connect()
+            if connection is None:
+                return found
+            try:
+                for path, stat in stats.items():
+                    row = connection.execute(
+                        'SELECT mtime, size, sample_rate, channels, frames '
+                        'FROM audio WHERE path = ?', (path, )).fetchone()
+                    if row is not None and tuple(row[:2]) == stat:
+                        found[path] = tuple(row[2:])
+            # e.g. "database is locked" or disk I/O error on network homes
+            except sqlite3.Error as e:
+                self._disable(e)
+
+        return found
+
+    def _store(self, infos, stats):
+        with self.lock_:
+            connection = self._connect()
+            if connection is None:
+                return
+            try:
+                connection.executemany(
+                    'INSERT OR REPLACE INTO audio VALUES (?, ?, ?, ?, ?, ?)',
+                    [(path, ) + stats[path] + info
+                     for path, info in infos.items()])
+                connection.commit()
+            except sqlite3.Error as e:
+                self._disable(e)
+
+    def update(self, paths, n_jobs=None):
+        """Make sure metadata of all audio files are available
+
+        Paths are resolved and files are stat'ed in parallel (both can be
+        slow on network file systems), then headers of files missing from the
+        index (or modified since they were indexed) are read in parallel.
+        Files that cannot be read are skipped.
+
+        Parameters
+        ----------
+        paths : iterable
+            Paths to audio files.
+        n_jobs : int, optional
+            Number of threads. Defaults to `n_jobs` passed to constructor.
+        """
+
+        paths = sorted(set(str(path) for path in paths))
+        if not paths:
+            return
+
+        n_jobs = self.n_jobs if n_jobs is None else n_jobs
+        with ThreadPoolExecutor(max_workers=max(1, n_jobs)) as executor:
+
+            paths = set(executor.map(self._resolve, paths))
+            paths = sorted(path for path in paths if path not in self.info_)
+            if not paths:
+                return
+
+            stats = {path: stat
+                     for path, stat in zip(paths,
+                                           executor.map(self._try_stat, paths))
+                     if stat is not None}
+
+            found = self._lookup(stats)
+            self.info_.update(found)
+
+            missing = [path for path in stats if path not in found]
+            if not missing:
+                return
+
+            infos = {path: info
+                     for path, info in zip(missing,
+                                           executor.map(self._try_probe,
+                                                        missing))
+                     if info is not None}
+
+        self._store(infos, stats)
+        self.info_.update(infos)
+
+    def info(self, path):
+        """Get native sample rate, number of channels and number of frames
+
+        Returns
+        -------
+        sample_rate : int
+        n_channels : int
+        n_frames : int
+        """
+
+        path = str(Path(path).resolve())
+        info = self.info_.get(path, None)
+        if info is None:
+            self.update([path])
+            info = self.info_.get(path, None)
+        if info is None:
+            # raise the actual reason why file cannot be read
+            self._stat(path)
+            info = self._probe(path)
+        return info
+
+
+def get_audio_metadata_path():
+    """Path to persistent audio metadata index
+
+    Persistence is opt-in: set PYANNOTE_AUDIO_METADATA environment variable
+    to the path of the SQLite database (e.g. ~/.pyannote/audio_metadata.db).
+    Audio metadata are only kept in memory when it is unset (or empty).
+    """
+    path = os.environ.get('PYANNOTE_AUDIO_METADATA', '')
+    return path if path else None
+
+
+# process-wide audio metadata index
+AUDIO_METADATA = AudioMetadataIndex(path=get_audio_metadata_path())
+
+
+def prefetch_audio_metadata(protocol, subset='train', n_jobs=None):
+    """Iterate over a protocol subset, reading audio metadata in parallel
+
+    Protocol files are gathered in a single pass, with the (possibly slow)
+    "duration" preprocessor temporarily disabled. Metadata of all their audio
+    files are then read in parallel before "duration" is computed.
+
+    Parameters
+    ----------
+    protocol : `pyannote.database.Protocol`
+        Protocol.
+    subset : {'train', 'development', 'test', 'files'}, optional
+        Defaults to 'train'.
+    n_jobs : int, optional
+        Number of threads. Defaults to AUDIO_METADATA.n_jobs.
+
+    Returns
+    -------
+    files : list
+        Protocol files, as yielded by getattr(protocol, subset)().
+    """
+
+    preprocessors = getattr(protocol, 'preprocessors', None)
+    duration = None
+    if preprocessors is not None and \
+       callable(preprocessors.get('duration', None)):
+        duration = preprocessors['duration']
+        protocol.preprocessors = {key: value
+                                  for key, value in preprocessors.items()
+                                  if key != 'duration'}
+    try:
+        files = list(getattr(protocol, subset)())
+    finally:
+        if duration is not None:
+            protocol.preprocessors = preprocessors
+
+    AUDIO_METADATA.update([current_file['audio'] for current_file in files
+                           if 'duration' not in current_file and
+                              'audio' in current_file],
+                          n_jobs=n_jobs)
+
+    if duration is not None:
+        for current_file in files:
+            current_file['duration'] = duration(current_file)
+
+    return files
+
+
 def get_audio_duration(current_file):
     """Return audio file duration
 
@@ -55,9 +459,9 @@ def get_audio_duration(current_file):
     if 'duration' in current_file:
         return current_file['duration']
 
-    # otherwise use SoundFile
-    with SoundFile(current_file['audio'], 'r') as f:
-        duration = float(f.frames) / f.samplerate
+    # otherwise use audio metadata index
+    sample_rate, _, n_frames = AUDIO_METADATA.info(current_file['audio'])
+    duration = float(n_frames) / sample_rate
 
     return duration
 
@@ -75,12 +479,220 @@ def get_audio_sample_rate(current_file):
     sample_rate : int
         Sampling rate
     """
-    with SoundFile(current_file['audio'], 'r') as f:
-        sample_rate = f.samplerate
-
+    sample_rate, _, _ = AUDIO_METADATA.info(current_file['audio'])
     return sample_rate
 
 
+class Resampler(object):
+    """Polyphase resampler
+
+    Filter design is the one of `scipy.signal.resample_poly` (Kaiser window
+    with beta = 5.0 and 10 zero-crossings on each side).
+
+    Unlike `scipy.signal.resample_poly`, it can resample any excerpt of a
+    longer signal (provided a `margin` of additional samples on each side)
+    and return exactly the same output samples as resampling the whole
+    signal at once would. Use `get_resampler` to share filter taps between
+    `Resampler` instances with the same sample rates.
+
+    Parameters
+    ----------
+    orig_sr : int
+        Original sample rate.
+    target_sr : int
+        Target sample rate.
+    """
+
+    def __init__(self, orig_sr, target_sr):
+        super().__init__()
+        self.orig_sr = orig_sr
+        self.target_sr = target_sr
+
+        g = gcd(orig_sr, target_sr)
+        self.up = target_sr // g
+        self.down = orig_sr // g
+
+        max_rate = max(self.up, self.down)
+        self.half_len = 10 * max_rate
+        self.taps_ = self.up * scipy.signal.firwin(
+            2 * self.half_len + 1, 1. / max_rate, window=('kaiser', 5.0))
+
+        # taps left-padded with 0 <= offset < down zeros, indexed by offset
+        self.padded_taps_ = {}
+
+    def n_out(self, n_in):
+        """Number of output samples when resampling `n_in` input samples"""
+        return -(-n_in * self.up // self.down)
+
+    def input_range(self, start, end):
+        """Range of input samples needed to compute output samples [start, end)
+
+        Returns
+        -------
+        i_start, i_end : int
+            Output samples [start, end) only depend on input samples
+            [i_start, i_end). Those may be out of bounds, in which case they
+            should be set to zero.
+        """
+        i_start = -(-(start * self.down - self.half_len) // self.up)
+        i_end = ((end - 1) * self.down + self.half_len) // self.up + 1
+        return i_start, i_end
+
+    def __call__(self, x, start=0, end=None, offset=0):
+        """Resample
+
+        Parameters
+        ----------
+        x : (n_samples, n_channels) numpy array
+            Input samples [offset, offset + n_samples) of the whole signal.
+        start, end : int, optional
+            Range of output samples to compute, in the whole signal time base.
+            Defaults to all output samples of `x` (which is only meaningful
+            when `x` is the whole signal, i.e. `offset` = 0).
+        offset : int, optional
+            Index of first sample of `x` in the whole signal. Defaults to 0.
+
+        Returns
+        -------
+        y : (end - start, n_channels) float32 numpy array
+            Output samples [start, end).
+        """
+
+        if end is None:
+            end = self.n_out(offset + len(x))
+
+        # global output sample n is local output sample n - n_base
+        # when taps are left-padded with "shift" zeros
+        n_base, shift = divmod(offset * self.up - self.half_len, self.down)
+        taps = self.padded_taps_.get(shift, None)
+        if taps is None:
+            taps = np.concatenate([np.zeros(shift), self.taps_])
+            self.padded_taps_[shift] = taps
+
+        y = scipy.signal.upfirdn(taps, x, up=self.up, down=self.down, axis=0)
+        return y[start - n_base:end - n_base].astype(np.float32)
+
+
+class StreamingResampler(object):
+    """Stateful polyphase resampler
+
+    Resamples a signal given block by block, carrying the filter context
+    from one block to the next. Concatenating all outputs (including the one
+    of `flush`) gives exactly the same samples as resampling the whole signal
+    at once with `Resampler`.
+
+    Parameters
+    ----------
+    orig_sr : int
+        Original sample rate.
+    target_sr : int
+        Target sample rate.
+
+    Usage
+    -----
+    >>> resampler = StreamingResampler(44100, 16000)
+    >>> for x in blocks:
+    ...     y = resampler(x)
+    >>> y = resampler.flush()
+    """
+
+    def __init__(self, orig_sr, target_sr):
+        super().__init__()
+        self.orig_sr = orig_sr
+        self.target_sr = target_sr
+        self.resampler_ = get_resampler(orig_sr, target_sr)
+        self.reset()
+
+    def reset(self):
+        """Forget about the current signal"""
+        self.buffer_ = None
+        # index of first buffered input sample
+        self.offset_ = 0
+        # number of input samples received so far
+        self.n_in_ = 0
+        # number of output samples returned so far
+        self.n_out_ = 0
+
+    def _resample(self, end):
+
+        if end <= self.n_out_:
+            return np.zeros((0, ) + self.buffer_.shape[1:], dtype=np.float32)
+
+        y = self.resampler_(self.buffer_, start=self.n_out_, end=end,
+                            offset=self.offset_)
+        self.n_out_ = end
+
+        # only keep input samples needed by next output samples
+        i_start, _ = self.resampler_.input_range(end, end + 1)
+        i_start = max(self.offset_, i_start)
+        self.buffer_ = self.buffer_[i_start - self.offset_:]
+        self.offset_ = i_start
+
+        return y
+
+    def __call__(self, x):
+        """Resample next block
+
+        Parameters
+        ----------
+        x : (n_samples, n_channels) numpy array
+            Next block of input samples.
+
+        Returns
+        -------
+        y : (n_out, n_channels) float32 numpy array
+            Next output samples. Because of the filter context, those lag
+            behind input samples: the remaining ones are returned by `flush`.
+        """
+
+        if self.buffer_ is None:
+            self.buffer_ = x
+        else:
+            self.buffer_ = np.concatenate([self.buffer_, x], axis=0)
+        self.n_in_ += len(x)
+
+        # output samples that only depend on input samples received so far
+        up, down = self.resampler_.up, self.resampler_.down
+        end = (self.n_in_ * up - self.resampler_.half_len - 1) // down + 1
+        end = min(end, self.resampler_.n_out(self.n_in_))
+
+        return self._resample(end)
+
+    def flush(self):
+        """Return remaining output samples and reset resampler
+
+        Returns
+        -------
+        y : (n_out, n_channels) float32 numpy array
+            Remaining output samples. None if no sample was ever received.
+        """
+
+        if self.buffer_ is None:
+            return None
+
+        y = self._resample(self.resampler_.n_out(self.n_in_))
+        self.reset()
+        return y
+
+
+@lru_cache(maxsize=None)
+def get_resampler(orig_sr, target_sr):
+    """Get (shared) polyphase resampler
+
+    Parameters
+    ----------
+    orig_sr : int
+        Original sample rate.
+    target_sr : int
+        Target sample rate.
+
+    Returns
+    -------
+    resampler : `Resampler`
+    """
+    return Resampler(orig_sr, target_sr)
+
+
 def read_audio(current_file, sample_rate=None, mono=True):
     """Read audio file
 
@@ -121,8 +733,10 @@ def read_audio(current_file, sample_rate=None, mono=True):
         y = np.mean(y, axis=1, keepdims=True)
 
     # resample if sample rates mismatch
-    if file_sample_rate != sample_rate:
-        y = librosa.core.resample(y.T, file_sample_rate, sample_rate).T
+    if sample_rate is not None and file_sample_rate != sample_rate:
+        y = get_resampler(file_sample_rate, sample_rate)(y)
+    else:
+        sample_rate = file_sample_rate
 
     return y, sample_rate
 
@@ -138,10 +752,32 @@ class RawAudio(object):
         Convert multi-channel to mono. Defaults to True.
     augmentation : `pyannote.audio.augmentation.Augmentation`, optional
         Data augmentation.
+    cache_dir : `str`, optional
+        When provided, the (resampled, channel-selected and down-mixed)
+        waveform of each file is stored once and for all in this directory
+        and memory-mapped by subsequent calls to `__call__` and `crop`.
+        Requires `sample_rate` to be set. Defaults to not caching anything.
+    cache_dtype : {'float32', 'int16'}, optional
+        Type used to store cached waveforms. 'int16' halves disk usage at the
+        cost of 16-bit quantization. Defaults to 'float32'.
+
+    Notes
+    -----
+    Multi-channel files are often exposed as several `pyannote.database` files
+    that only differ by their 'channel' key. Their decoded (and resampled)
+    channels are kept in memory (for the DECODED_MAXSIZE most recently used
+    files) so that sibling channels do not decode the same file again. Use
+    `multichannel` to get several channels at once.
     """
 
+    # maximum number of cached waveforms kept open (as memory maps)
+    CACHE_MAX_OPEN = 128
+
+    # maximum number of decoded multi-channel files kept in memory
+    DECODED_MAXSIZE = 1
+
     def __init__(self, sample_rate=None, mono=True,
-                 augmentation=None):
+                 augmentation=None, cache_dir=None, cache_dtype='float32'):
 
         super(RawAudio, self).__init__()
         self.sample_rate = sample_rate
@@ -149,15 +785,244 @@ class RawAudio(object):
 
         self.augmentation = augmentation
 
+        if cache_dir is not None and sample_rate is None:
+            msg = ('`RawAudio` needs to be instantiated with an actual '
+                   '`sample_rate` if one wants to use `cache_dir`.')
+            raise ValueError(msg)
+        self.cache_dir = cache_dir
+
+        if cache_dtype not in {'float32', 'int16'}:
+            msg = f'"cache_dtype" must be "float32" or "int16".'
+            raise ValueError(msg)
+        self.cache_dtype = cache_dtype
+
+        self.memmaps_ = LRUCache(maxsize=self.CACHE_MAX_OPEN)
+        self.memmaps_lock_ = threading.Lock()
+        self.decoded_ = LRUCache(maxsize=self.DECODED_MAXSIZE)
+
         if sample_rate is not None:
             self.sliding_window_ = SlidingWindow(start=-.5/sample_rate,
                                                  duration=1./sample_rate,
                                                  step=1./sample_rate)
 
+    def __getstate__(self):
+        # memory maps and locks cannot (and should not) be pickled
+        state = dict(self.__dict__)
+        del state['memmaps_'], state['memmaps_lock_'], state['decoded_']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.memmaps_ = LRUCache(maxsize=self.CACHE_MAX_OPEN)
+        self.memmaps_lock_ = threading.Lock()
+        self.decoded_ = LRUCache(maxsize=self.DECODED_MAXSIZE)
+
     @property
     def dimension(self):
         return 1
 
+    def _select(self, y, channels=None):
+        """Extract (1-indexed) channel(s) and convert to mono (if needed)"""
+
+        if channels is not None:
+            y = y[:, [channel - 1 for channel in channels]]
+
+        if self.mono:
+            y = np.mean(y, axis=1, keepdims=True)
+
+        return y
+
+    def decode(self, current_file):
+        """Decode and resample all channels of audio file
+
+        Decoded channels of multi-channel files are kept in memory for later
+        reuse (by sibling 'channel' files, for instance).
+
+        Parameters
+        ----------
+        current_file : dict
+            `pyannote.database` file.
+
+        Returns
+        -------
+        y : (n_samples, n_channels) numpy array
+            Waveform (with all channels).
+        sample_rate : int
+            Sample rate.
+        """
+
+        if 'waveform' in current_file:
+
+            if self.sample_rate is None:
+                msg = ('`RawAudio` needs to be instantiated with an actual '
+                       '`sample_rate` if one wants to use precomputed '
+                       'waveform.')
+                raise ValueError(msg)
+
+            y = current_file['waveform']
+            if len(y.shape) != 2:
+                msg = (
+                    f'Precomputed waveform should be provided as a '
+                    f'(n_samples, n_channels) `np.ndarray`.'
+                )
+                raise ValueError(msg)
+
+            return y, self.sample_rate
+
+        path = str(current_file['audio'])
+        key = (path, self.sample_rate)
+
+        with self.memmaps_lock_:
+            decoded = self.decoded_.get(key, None)
+        if decoded is not None:
+            return decoded
+
+        y, sample_rate = sf.read(path, dtype='float32', always_2d=True)
+        if (self.sample_rate is not None) and (self.sample_rate != sample_rate):
+            y = get_resampler(sample_rate, self.sample_rate)(y)
+            sample_rate = self.sample_rate
+
+        # there is no sibling channel to share mono files with
+        if y.shape[1] > 1:
+            with self.memmaps_lock_:
+                self.decoded_[key] = (y, sample_rate)
+
+        return y, sample_rate
+
+    def multichannel(self, current_file, channels=None, return_sr=False):
+        """Obtain waveform of several channels from a single decode
+
+        Parameters
+        ----------
+        current_file : dict
+            `pyannote.database` file. Its 'channel' key (if any) is ignored.
+        channels : iterable of int, optional
+            (1-indexed) channels. Defaults to all channels.
+        return_sr : `bool`, optional
+            Return sample rate. Defaults to False
+
+        Returns
+        -------
+        waveforms : dict
+            {channel: `pyannote.core.SlidingWindowFeature`} dictionary.
+        sample_rate : `int`
+            Only when `return_sr` is set to True
+        """
+
+        y, sample_rate = self.decode(current_file)
+        if channels is None:
+            channels = range(1, y.shape[1] + 1)
+
+        sliding_window = SlidingWindow(start=-.5/sample_rate,
+                                       duration=1./sample_rate,
+                                       step=1./sample_rate)
+
+        waveforms = {channel: SlidingWindowFeature(
+                         self._augment(self._select(y, channels=[channel]),
+                                       sample_rate),
+                         sliding_window)
+                     for channel in channels}
+
+        if return_sr:
+            return waveforms, sample_rate
+
+        return waveforms
+
+    def _augment(self, y, sample_rate):
+        """Apply data augmentation (if any)"""
+
+        if self.augmentation is None:
+            return y
+
+        y = self.augmentation(y, sample_rate)
+
+        from librosa.util import valid_audio
+        from librosa.util.exceptions import ParameterError
+
+        # TODO: how time consuming is this thing (needs profiling...)
+        try:
+            valid = valid_audio(y[:, 0], mono=True)
+        except ParameterError as e:
+            msg = (f"Something went wrong when augmenting waveform.")
+            raise ValueError(msg)
+
+        return y
+
+    def _convert(self, y, sample_rate, current_file):
+        """Extract channel, convert to mono and resample (if needed)"""
+
+        # extract specific channel if requested, and convert to mono
+        channel = current_file.get('channel', None)
+        y = self._select(y, channels=None if channel is None else [channel])
+
+        # resample if sample rates mismatch
+        if (self.sample_rate is not None) and (self.sample_rate != sample_rate):
+            y = get_resampler(sample_rate, self.sample_rate)(y)
+            sample_rate = self.sample_rate
+
+        return y, sample_rate
+
+    def get_cache_path(self, current_file):
+        """Get path to cached waveform"""
+        uri = get_unique_identifier(current_file)
+        channel = current_file.get('channel', None)
+        if channel is not None:
+            suffix = f'channel{channel:d}'
+        else:
+            suffix = 'mono' if self.mono else 'all'
+        return (f'{self.cache_dir}/{self.sample_rate:d}Hz.{self.cache_dtype}/'
+                f'{uri}.{suffix}.npy')
+
+    def cached(self, current_file):
+        """Get (memory-mapped) cached waveform, creating it if needed
+
+        Parameters
+        ----------
+        current_file : dict
+            `pyannote.database` file.
+
+        Returns
+        -------
+        waveform : (n_samples, n_channels) `np.memmap`
+            Read-only cached waveform at `sample_rate`, stored as
+            `cache_dtype`.
+        """
+
+        path = self.get_cache_path(current_file)
+
+        with self.memmaps_lock_:
+            memmap = self.memmaps_.get(path, None)
+        if memmap is not None:
+            return memmap
+
+        if not os.path.exists(path):
+            y, sample_rate = sf.read(current_file['audio'],
+                                     dtype='float32',
+                                     always_2d=True)
+            y, _ = self._convert(y, sample_rate, current_file)
+
+            if self.cache_dtype == 'int16':
+                y = np.clip(np.round(y * 32768), -32768, 32767)
+            y = y.astype(self.cache_dtype)
+
+            # write to temporary file first so that concurrent
+            # processes never see a partially written cache
+            mkdir_p(Path(path).parent)
+            tmp = f'{path}.{os.getpid():d}.{threading.get_ident():d}.npy'
+            np.save(tmp, y)
+            os.replace(tmp, path)
+
+        memmap = open_memmap(path, mode='r')
+        with self.memmaps_lock_:
+            self.memmaps_[path] = memmap
+        return memmap
+
+    def _from_cache(self, data):
+        """Convert cached waveform to float32"""
+        if self.cache_dtype == 'int16':
+            return data.astype(np.float32) / 32768
+        return data
+
     @property
     def sliding_window(self):
         return self.sliding_window_
@@ -198,35 +1063,25 @@ class RawAudio(object):
                 )
                 raise ValueError(msg)
 
+            y, sample_rate = self._convert(y, sample_rate, current_file)
+
+        elif self.cache_dir is not None:
+            y = self._from_cache(self.cached(current_file))
+            sample_rate = self.sample_rate
+
+        # decode (and resample) all channels once for all sibling channels
+        elif 'channel' in current_file:
+            y, sample_rate = self.decode(current_file)
+            y = self._select(y, channels=[current_file['channel']])
+
         else:
             y, sample_rate = sf.read(current_file['audio'],
                                      dtype='float32',
                                      always_2d=True)
-
-        # extract specific channel if requested
-        channel = current_file.get('channel', None)
-        if channel is not None:
-            y = y[:, channel-1:channel]
-
-        # convert to mono
-        if self.mono:
-            y = np.mean(y, axis=1, keepdims=True)
-
-        # resample if sample rates mismatch
-        if (self.sample_rate is not None) and (self.sample_rate != sample_rate):
-            y = librosa.core.resample(y.T, sample_rate, self.sample_rate).T
-            sample_rate = self.sample_rate
+            y, sample_rate = self._convert(y, sample_rate, current_file)
 
         # augment data
-        if self.augmentation is not None:
-            y = self.augmentation(y, sample_rate)
-
-            # TODO: how time consuming is this thing (needs profiling...)
-            try:
-                valid = valid_audio(y[:, 0], mono=True)
-            except ParameterError as e:
-                msg = (f"Something went wrong when augmenting waveform.")
-                raise ValueError(msg)
+        y = self._augment(y, sample_rate)
 
         sliding_window = SlidingWindow(
             start=-.5/sample_rate,
@@ -281,9 +1136,45 @@ class RawAudio(object):
         (start, end), = self.sliding_window_.crop(
             segment, mode=mode, fixed=fixed, return_ranges=True)
 
-        # this is expected number of samples.
-        # this will be useful later in case of on-the-fly resampling
-        n_samples = end - start
+        data = self.read(current_file, start, end)
+
+        from librosa.util import valid_audio
+        from librosa.util.exceptions import ParameterError
+
+        # TODO: how time consuming is this thing (needs profiling...)
+        try:
+            valid = valid_audio(data[:, 0], mono=True)
+        except ParameterError as e:
+            msg = (f"Something went wrong when trying to extract waveform of "
+                   f"file {current_file['database']}/{current_file['uri']} "
+                   f"between {segment.start:.3f}s and {segment.end:.3f}s.")
+            raise ValueError(msg)
+
+        if self.augmentation is not None:
+            data = self.augmentation(data, self.sample_rate)
+
+        return data
+
+    def read(self, current_file, start, end):
+        """Read samples [start, end) of the (non-augmented) waveform
+
+        Parameters
+        ----------
+        current_file : dict
+            `pyannote.database` file.
+        start, end : int
+            Range of samples, at `sample_rate`. Samples beyond the end of the
+            file are not returned.
+
+        Returns
+        -------
+        waveform : (n_samples, n_channels) numpy array
+            Waveform
+
+        See also
+        --------
+        `RawAudio.crop`
+        """
 
         if 'waveform' in current_file:
 
@@ -299,59 +1190,187 @@ class RawAudio(object):
             sample_rate = self.sample_rate
             data = y[start:end]
 
+        elif self.cache_dir is not None:
+
+            sample_rate = self.sample_rate
+            cached = self.cached(current_file)
+            data = np.array(self._from_cache(cached[start:end]),
+                            dtype=np.float32)
+
+        # reuse decoded channels when available
+        elif (str(current_file['audio']), self.sample_rate) in self.decoded_:
+
+            with self.memmaps_lock_:
+                y, sample_rate = self.decoded_.get(
+                    (str(current_file['audio']), self.sample_rate),
+                    (None, None))
+
+            if y is None:
+                return self.read(current_file, start, end)
+
+            data = y[start:end]
+
         else:
             # read file with SoundFile, which supports various fomats
             # including NIST sphere
-            with SoundFile(current_file['audio'], 'r') as audio_file:
+            with SOUNDFILE_POOL.open(current_file['audio']) as audio_file:
 
                 sample_rate = audio_file.samplerate
+                n_frames = audio_file.frames
 
-                # if the sample rates are mismatched,
-                # recompute the start and end
+                # if the sample rates are mismatched, read the input samples
+                # needed to compute output samples [start, end) exactly as
+                # if the whole file were resampled at once
                 if sample_rate != self.sample_rate:
 
-                    sliding_window = SlidingWindow(start=-.5/sample_rate,
-                                                   duration=1./sample_rate,
-                                                   step=1./sample_rate)
-                    (start, end), = sliding_window.crop(
-                        segment, mode=mode, fixed=fixed,
-                        return_ranges=True)
+                    resampler = get_resampler(sample_rate, self.sample_rate)
+                    # do not go past the end of the resampled file
+                    end = max(start, min(end, resampler.n_out(n_frames)))
+                    i_start, i_end = resampler.input_range(start, end)
+                    i_end = max(i_start, i_end)
+
+                    # out of bounds input samples are zero-padded
+                    r_start = min(max(0, i_start), n_frames)
+                    r_end = min(max(r_start, i_end), n_frames)
+                    audio_file.seek(r_start)
+                    data = audio_file.read(r_end - r_start,
+                                           dtype='float32',
+                                           always_2d=True)
+                    pad_start = r_start - i_start
+                    pad_end = i_end - i_start - pad_start - len(data)
+                    data = np.pad(data, ((pad_start, pad_end), (0, 0)),
+                                  mode='constant')
+
+                else:
+                    audio_file.seek(start)
+                    data = audio_file.read(end - start,
+                                           dtype='float32',
+                                           always_2d=True)
+
+        # cached waveform is already channel-selected and down-mixed
+        if 'waveform' in current_file or self.cache_dir is None:
+
+            # extract specific channel if requested, and convert to mono
+            channel = current_file.get('channel', None)
+            data = self._select(
+                data, channels=None if channel is None else [channel])
 
-                audio_file.seek(start)
-                data = audio_file.read(end - start,
-                                       dtype='float32',
-                                       always_2d=True)
+        # resample if sample rates mismatch
+        if sample_rate != self.sample_rate:
+            data = resampler(data, start=start, end=end, offset=i_start)
 
-        # extract specific channel if requested
-        channel = current_file.get('channel', None)
-        if channel is not None:
-            data = data[:, channel-1:channel]
+        return data
 
-        # convert to mono if needed
-        if self.mono:
-            data = np.mean(data, axis=1, keepdims=True)
+    def incremental(self):
+        """Get stateful (incremental) version of this waveform loader
 
-        # resample if sample rates mismatch
-        if sample_rate != self.sample_rate:
-            data = librosa.core.resample(data.T,
-                                         sample_rate,
-                                         self.sample_rate).T
-            sample_rate = self.sample_rate
-            data = data[:n_samples]
+        Returns
+        -------
+        incremental : `IncrementalRawAudio`
+        """
+        return IncrementalRawAudio(self)
 
-        # TODO: how time consuming is this thing (needs profiling...)
-        try:
-            valid = valid_audio(data[:, 0], mono=True)
-        except ParameterError as e:
-            msg = (f"Something went wrong when trying to extract waveform of "
-                   f"file {current_file['database']}/{current_file['uri']} "
-                   f"between {segment.start:.3f}s and {segment.end:.3f}s.")
-            raise ValueError(msg)
 
-        if self.augmentation is not None:
-            data = self.augmentation(data, sample_rate)
+class IncrementalRawAudio(object):
+    """Stateful (incremental) version of `RawAudio`
 
-        return data
+    Converts consecutive waveform chunks of a stream (e.g. yielded by
+    `pyannote.audio.stream.stream_audio`) to mono and resamples them, exactly
+    like `RawAudio` would do on the whole waveform at once.
+
+    Parameters
+    ----------
+    raw_audio : `RawAudio`
+
+    Usage
+    -----
+    >>> incremental = raw_audio.incremental()
+    >>> for chunk in stream_audio(current_file, mono=False):
+    ...     waveform = incremental(chunk)
+    >>> waveform = incremental.flush()
+
+    Notes
+    -----
+    Data augmentation is not applied.
+    """
+
+    def __init__(self, raw_audio):
+        super().__init__()
+        self.raw_audio = raw_audio
+        self.reset()
+
+    def reset(self):
+        """Forget about the current stream"""
+        self.resampler_ = None
+        self.sample_rate_ = None
+        # number of output samples so far
+        self.n_samples_ = 0
+
+    @property
+    def sample_rate(self):
+        """Output sample rate (None until first chunk is received)"""
+        return self.sample_rate_
+
+    def _wrap(self, y):
+
+        sample_rate = self.sample_rate_
+        sliding_window = SlidingWindow(
+            start=(self.n_samples_ - .5) / sample_rate,
+            duration=1. / sample_rate,
+            step=1. / sample_rate)
+        self.n_samples_ += len(y)
+        return SlidingWindowFeature(y, sliding_window)
+
+    def __call__(self, waveform):
+        """Process next waveform chunk
+
+        Parameters
+        ----------
+        waveform : `pyannote.core.SlidingWindowFeature`
+            (n_samples, n_channels) waveform chunk.
+
+        Returns
+        -------
+        waveform : `pyannote.core.SlidingWindowFeature`
+            Next (n_samples, 1) mono waveform samples, or (n_samples,
+            n_channels) if `raw_audio.mono` is False. Resampling lags behind
+            input chunks: remaining samples are returned by `flush`.
+        """
+
+        if self.sample_rate_ is None:
+            sample_rate = int(np.rint(1. / waveform.sliding_window.step))
+            target_sr = self.raw_audio.sample_rate
+            if target_sr is not None and target_sr != sample_rate:
+                self.resampler_ = StreamingResampler(sample_rate, target_sr)
+                sample_rate = target_sr
+            self.sample_rate_ = sample_rate
+
+        y = self.raw_audio._select(waveform.data)
+        self.n_channels_ = y.shape[1]
+        if self.resampler_ is not None:
+            y = self.resampler_(y)
+        return self._wrap(y)
+
+    def flush(self):
+        """Return remaining samples (if any) and reset
+
+        Returns
+        -------
+        waveform : `pyannote.core.SlidingWindowFeature`
+            Remaining samples. None if no chunk was ever received.
+        """
+
+        if self.sample_rate_ is None:
+            return None
+
+        if self.resampler_ is None:
+            y = np.zeros((0, self.n_channels_), dtype=np.float32)
+        else:
+            y = self.resampler_.flush()
+        waveform = self._wrap(y)
+
+        self.reset()
+        return waveform
 
 # # THIS SCRIPT CAN BE USED TO CRASH-TEST THE ON-THE-FLY RESAMPLING
 
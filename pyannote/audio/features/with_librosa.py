@@ -34,6 +34,8 @@ import librosa
 import numpy as np
 
 from .base import FeatureExtraction
+from .base import IncrementalFeatureExtraction
+from . import spectral
 from pyannote.core.segment import SlidingWindow
 
 
@@ -50,16 +52,31 @@ class LibrosaFeatureExtraction(FeatureExtraction):
         Defaults to 0.025 (25ms).
     step : float, optional
         Defaults to 0.010 (10ms).
+    engine : {'numpy', 'librosa'}, optional
+        Use cached-basis NumPy implementation ('numpy', default) or call
+        `librosa` directly ('librosa'). Both match up to float32 precision but
+        the former is much faster on short excerpts.
+    crop_cache : float, optional
+        Duration (in seconds) of `crop` rolling cache of feature frames.
+        Defaults to 0. (no cache). See `FeatureExtraction`.
     """
 
+    ENGINES = {'numpy', 'librosa'}
+
     def __init__(self, sample_rate=16000, augmentation=None,
-                 duration=0.025, step=0.01):
+                 duration=0.025, step=0.01, engine='numpy', crop_cache=0.):
 
         super().__init__(sample_rate=sample_rate,
-                         augmentation=augmentation)
+                         augmentation=augmentation,
+                         crop_cache=crop_cache)
         self.duration = duration
         self.step = step
 
+        if engine not in self.ENGINES:
+            msg = f'"engine" must be one of {self.ENGINES} (is: "{engine}").'
+            raise ValueError(msg)
+        self.engine = engine
+
         self.sliding_window_ = SlidingWindow(start=-.5*self.duration,
                                              duration=self.duration,
                                              step=self.step)
@@ -81,17 +98,31 @@ class LibrosaSpectrogram(LibrosaFeatureExtraction):
         Defaults to 0.025.
     step : float, optional
         Defaults to 0.010.
+    engine : {'numpy', 'librosa'}, optional
+        Defaults to 'numpy'. See `LibrosaFeatureExtraction`.
+    crop_cache : float, optional
+        Duration (in seconds) of `crop` rolling cache of feature frames.
+        Defaults to 0. (no cache). See `FeatureExtraction`.
     """
 
+    # frames only depend on the `duration` long window they are centered on
+    LOCAL_FEATURES = True
+
     def __init__(self, sample_rate=16000, augmentation=None,
-                 duration=0.025, step=0.010):
+                 duration=0.025, step=0.010, engine='numpy', crop_cache=0.):
 
         super().__init__(sample_rate=sample_rate, augmentation=augmentation,
-                         duration=duration, step=step)
+                         duration=duration, step=step, engine=engine,
+                         crop_cache=crop_cache)
 
         self.n_fft_ = int(self.duration * self.sample_rate)
         self.hop_length_ = int(self.step * self.sample_rate)
 
+    def get_context_duration(self):
+        # (a whole number of frames) larger than half a window, so that
+        # cropped frames do not depend on the reflect padding of the excerpt
+        return (np.ceil(self.duration / self.step) + 1) * self.step
+
     def get_dimension(self):
         return self.n_fft_ // 2 + 1
 
@@ -111,6 +142,11 @@ class LibrosaSpectrogram(LibrosaFeatureExtraction):
             Features
         """
 
+        if self.engine == 'numpy':
+            return spectral.stft_power(y.squeeze(), self.n_fft_,
+                                       self.hop_length_, window='hamming',
+                                       power=1.)
+
         fft = librosa.core.stft(y=y.squeeze(), n_fft=self.n_fft_,
                                 hop_length=self.hop_length_,
                                 center=True, window='hamming')
@@ -132,13 +168,20 @@ class LibrosaMelSpectrogram(LibrosaFeatureExtraction):
         Defaults to 0.010.
     n_mels : int, optional
         Defaults to 96.
+    engine : {'numpy', 'librosa'}, optional
+        Defaults to 'numpy'. See `LibrosaFeatureExtraction`.
+    crop_cache : float, optional
+        Duration (in seconds) of `crop` rolling cache of feature frames.
+        Defaults to 0. (no cache). See `FeatureExtraction`.
     """
 
     def __init__(self, sample_rate=16000, augmentation=None,
-                 duration=0.025, step=0.010, n_mels=96):
+                 duration=0.025, step=0.010, n_mels=96, engine='numpy',
+                 crop_cache=0.):
 
         super().__init__(sample_rate=sample_rate, augmentation=augmentation,
-                         duration=duration, step=step)
+                         duration=duration, step=step, engine=engine,
+                         crop_cache=crop_cache)
         self.n_mels = n_mels
         self.n_fft_ = int(self.duration * self.sample_rate)
         self.hop_length_ = int(self.step * self.sample_rate)
@@ -161,6 +204,12 @@ class LibrosaMelSpectrogram(LibrosaFeatureExtraction):
         data : (n_frames, n_mels) numpy array
             Features
         """
+
+        if self.engine == 'numpy':
+            log_mel = self.get_log_mel(y, sample_rate)
+            max_db = log_mel.max() if log_mel.size else 0.
+            return self.get_features_from_log_mel(log_mel, max_db)
+
         mel_spec = librosa.feature.melspectrogram(
             y.squeeze(), sr=sample_rate, n_mels=self.n_mels,
             n_fft=self.n_fft_, hop_length=self.hop_length_, power=2)
@@ -169,6 +218,21 @@ class LibrosaMelSpectrogram(LibrosaFeatureExtraction):
 
         return mel_spec.T
 
+    def get_log_mel(self, y, sample_rate):
+        """Log-mel spectrogram (in dB, before dynamic range compression)"""
+        S = spectral.stft_power(y.squeeze(), self.n_fft_,
+                                self.hop_length_, power=2.)
+        mel_basis = spectral.get_mel_basis(sample_rate, self.n_fft_,
+                                           self.n_mels)
+        return spectral.power_to_db(S @ mel_basis, top_db=None)
+
+    def get_features_from_log_mel(self, log_mel, max_db):
+        """Mel-spectrogram relative to `max_db`, clipped to -80dB"""
+        return np.maximum(log_mel - max_db, -80.)
+
+    def incremental(self):
+        return IncrementalLogMelFeatureExtraction(self)
+
 
 class LibrosaMFCC(LibrosaFeatureExtraction):
     """librosa MFCC
@@ -214,6 +278,11 @@ class LibrosaMFCC(LibrosaFeatureExtraction):
         Keep energy second derivative. Defaults to False.
     DD : bool, optional
         Add second order derivatives. Defaults to False.
+    engine : {'numpy', 'librosa'}, optional
+        Defaults to 'numpy'. See `LibrosaFeatureExtraction`.
+    crop_cache : float, optional
+        Duration (in seconds) of `crop` rolling cache of feature frames.
+        Defaults to 0. (no cache). See `FeatureExtraction`.
 
     Notes
     -----
@@ -229,10 +298,12 @@ class LibrosaMFCC(LibrosaFeatureExtraction):
                  duration=0.025, step=0.01,
                  e=False, De=True, DDe=True,
                  coefs=19, D=True, DD=True,
-                 fmin=0.0, fmax=None, n_mels=40):
+                 fmin=0.0, fmax=None, n_mels=40, engine='numpy',
+                 crop_cache=0.):
 
         super().__init__(sample_rate=sample_rate, augmentation=augmentation,
-                         duration=duration, step=step)
+                         duration=duration, step=step, engine=engine,
+                         crop_cache=crop_cache)
 
         self.e = e
         self.coefs = coefs
@@ -264,6 +335,11 @@ class LibrosaMFCC(LibrosaFeatureExtraction):
             Features
         """
 
+        if self.engine == 'numpy':
+            log_mel = self.get_log_mel(y, sample_rate)
+            max_db = log_mel.max() if log_mel.size else 0.
+            return self.get_features_from_log_mel(log_mel, max_db)
+
         # adding because C0 is the energy
         n_mfcc = self.coefs + 1
 
@@ -305,6 +381,59 @@ class LibrosaMFCC(LibrosaFeatureExtraction):
 
         return np.vstack(stack).T
 
+    def get_log_mel(self, y, sample_rate):
+        """Log-mel spectrogram (in dB, before dynamic range compression)"""
+
+        n_fft = int(self.duration * sample_rate)
+        hop_length = int(self.step * sample_rate)
+
+        S = spectral.stft_power(y.squeeze(), n_fft, hop_length, power=2.)
+        mel_basis = spectral.get_mel_basis(sample_rate, n_fft, self.n_mels,
+                                           fmin=self.fmin, fmax=self.fmax,
+                                           htk=True)
+        return spectral.power_to_db(S @ mel_basis, top_db=None)
+
+    def get_features_from_log_mel(self, log_mel, max_db):
+        """MFCC (and derivatives) from log-mel spectrogram clipped to
+        `max_db` - 80dB"""
+
+        # adding because C0 is the energy
+        n_mfcc = self.coefs + 1
+
+        dct_basis = spectral.get_dct_basis(self.n_mels, n_mfcc)
+        mfcc = np.maximum(log_mel, max_db - 80.) @ dct_basis
+
+        # first and/or second order derivatives in one go
+        orders = []
+        if self.De or self.D:
+            orders.append(1)
+        if self.DDe or self.DD:
+            orders.append(2)
+        if orders:
+            mfcc_d = dict(zip(orders, spectral.deltas(mfcc, width=9,
+                                                      orders=tuple(orders))))
+
+        stack = []
+
+        if self.e:
+            stack.append(mfcc[:, :1])
+
+        stack.append(mfcc[:, 1:])
+
+        if self.De:
+            stack.append(mfcc_d[1][:, :1])
+
+        if self.D:
+            stack.append(mfcc_d[1][:, 1:])
+
+        if self.DDe:
+            stack.append(mfcc_d[2][:, :1])
+
+        if self.DD:
+            stack.append(mfcc_d[2][:, 1:])
+
+        return np.hstack(stack)
+
     def get_dimension(self):
         n_features = 0
         n_features += self.e
@@ -314,3 +443,39 @@ class LibrosaMFCC(LibrosaFeatureExtraction):
         n_features += self.coefs * self.D
         n_features += self.coefs * self.DD
         return n_features
+
+    def incremental(self):
+        return IncrementalLogMelFeatureExtraction(self)
+
+
+class IncrementalLogMelFeatureExtraction(IncrementalFeatureExtraction):
+    """Stateful (incremental) version of log-mel based feature extraction
+
+    `LibrosaMelSpectrogram` and `LibrosaMFCC` compress the dynamic range of
+    log-mel spectrograms with respect to their maximum over the whole file,
+    which is not known in advance when streaming. Here, the maximum over the
+    part of the stream processed so far is used instead: returned frames are
+    therefore the ones `__call__` would return, except that mel-spectrogram
+    values are relative to this running maximum (and that both are clipped
+    80dB below it). Both coincide once the loudest frame of the stream has
+    been processed.
+
+    Parameters
+    ----------
+    feature_extraction : `LibrosaMelSpectrogram` or `LibrosaMFCC`
+
+    Notes
+    -----
+    Features are always computed with the 'numpy' engine.
+    """
+
+    def reset(self):
+        super().reset()
+        self.max_db_ = -np.inf
+
+    def get_features(self, y, sample_rate):
+        log_mel = self.feature_extraction.get_log_mel(y, sample_rate)
+        if log_mel.size:
+            self.max_db_ = max(self.max_db_, log_mel.max())
+        return self.feature_extraction.get_features_from_log_mel(
+            log_mel, self.max_db_)
@@ -51,13 +51,17 @@ class PySpeechFeaturesExtraction(FeatureExtraction):
         Defaults to 0.025.
     step : float, optional
         Defaults to 0.010.
+    crop_cache : float, optional
+        Duration (in seconds) of `crop` rolling cache of feature frames.
+        Defaults to 0. (no cache). See `FeatureExtraction`.
     """
 
     def __init__(self, sample_rate=16000, augmentation=None,
-                 duration=0.025, step=0.01):
+                 duration=0.025, step=0.01, crop_cache=0.):
 
         super().__init__(sample_rate=sample_rate,
-                         augmentation=augmentation)
+                         augmentation=augmentation,
+                         crop_cache=crop_cache)
         self.duration = duration
         self.step = step
 
@@ -84,13 +88,17 @@ class PySpeechFeaturesMFCC(PySpeechFeaturesExtraction):
         Defaults to 0.010.
     coefs : int, optional
         Number of coefficients. Defaults to 13.
+    crop_cache : float, optional
+        Duration (in seconds) of `crop` rolling cache of feature frames.
+        Defaults to 0. (no cache). See `FeatureExtraction`.
     """
 
     def __init__(self, sample_rate=16000, augmentation=None,
-                 duration=0.025, step=0.01, coefs=13):
+                 duration=0.025, step=0.01, coefs=13, crop_cache=0.):
 
         super().__init__(sample_rate=sample_rate, augmentation=augmentation,
-                         duration=duration, step=step)
+                         duration=duration, step=step,
+                         crop_cache=crop_cache)
         self.coefs = coefs
 
     def get_dimension(self):
@@ -53,13 +53,17 @@ class YaafeFeatureExtraction(FeatureExtraction):
         Defaults to 0.010.
     stack : int, optional
         Stack `stack` consecutive features. Defaults to 1.
+    crop_cache : float, optional
+        Duration (in seconds) of `crop` rolling cache of feature frames.
+        Defaults to 0. (no cache). See `FeatureExtraction`.
     """
 
     def __init__(self, sample_rate=16000, augmentation=None,
-                 duration=0.025, step=0.010, stack=1):
+                 duration=0.025, step=0.010, stack=1, crop_cache=0.):
 
         super().__init__(sample_rate=sample_rate,
-                         augmentation=augmentation)
+                         augmentation=augmentation,
+                         crop_cache=crop_cache)
         self.duration = duration
         self.step = step
         self.stack = stack
@@ -136,7 +140,7 @@ class YaafeFeatureExtraction(FeatureExtraction):
 class YaafeCompound(YaafeFeatureExtraction):
 
     def __init__(self, extractors, sample_rate=16000, augmentation=None,
-                 duration=0.025, step=0.010, stack=1):
+                 duration=0.025, step=0.010, stack=1, crop_cache=0.):
 
         assert all(e.sample_rate == sample_rate for e in extractors)
         assert all(e.duration == duration for e in extractors)
@@ -144,7 +148,8 @@ class YaafeCompound(YaafeFeatureExtraction):
         assert all(e.stack == stack for e in extractors)
 
         super().__init__(sample_rate=sample_rate, augmentation=augmentation,
-                         duration=duration, step=step, stack=stack)
+                         duration=duration, step=step, stack=stack,
+                         crop_cache=crop_cache)
 
         self.extractors = extractors
 
@@ -220,6 +225,9 @@ class YaafeMFCC(YaafeFeatureExtraction):
         Keep energy second derivative. Defaults to False.
     DD : bool, optional
         Add second order derivatives. Defaults to False.
+    crop_cache : float, optional
+        Duration (in seconds) of `crop` rolling cache of feature frames.
+        Defaults to 0. (no cache). See `FeatureExtraction`.
 
     Notes
     -----
@@ -233,10 +241,12 @@ class YaafeMFCC(YaafeFeatureExtraction):
 
     def __init__(self, sample_rate=16000, augmentation=None,
                  duration=0.025, step=0.010, stack=1,
-                 e=True, coefs=11, De=False, DDe=False, D=False, DD=False):
+                 e=True, coefs=11, De=False, DDe=False, D=False, DD=False,
+                 crop_cache=0.):
 
         super().__init__(sample_rate=sample_rate, augmentation=augmentation,
-                         duration=duration, step=step, stack=stack)
+                         duration=duration, step=step, stack=stack,
+                         crop_cache=crop_cache)
 
         self.e = e
         self.coefs = coefs
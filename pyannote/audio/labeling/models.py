@@ -147,21 +147,49 @@ class StackedRNN(nn.Module):
     def n_classes(self):
         return len(self.specifications['y']['classes'])
 
-    def forward(self, sequences):
+    @property
+    def supports_stateful(self):
+        """Whether long sequences can be processed chunk by chunk
+
+        This is only possible with causal models (i.e. with mono-directional
+        recurrent layers, and without pooling nor instance normalization).
+        See `hidden` and `return_hidden` parameters of `forward`.
+        """
+        return not (self.bidirectional or self.pooling is not None or
+                    self.instance_normalize)
+
+    def forward(self, sequences, hidden=None, return_hidden=False):
         """
 
         Parameters
         ----------
         sequences : (batch_size, n_samples, n_features) `torch.tensor`
             Batch of sequences.
+        hidden : `list`, optional
+            Initial hidden state of each recurrent layer, as returned when
+            `return_hidden` is True. Defaults to zeros.
+        return_hidden : `boolean`, optional
+            Return final hidden state of each recurrent layer, so that the
+            next chunk of `sequences` can be processed later by passing it
+            as `hidden`. Only supported when `supports_stateful` is True.
 
         Returns
         -------
         predictions : `torch.tensor`
             Shape is (batch_size, n_samples, n_classes) without pooling, and
             (batch_size, n_classes) with pooling.
+        hidden : `list`
+            Final hidden state of each recurrent layer. Only returned when
+            `return_hidden` is True.
         """
 
+        if (hidden is not None or return_hidden) and \
+           not self.supports_stateful:
+            msg = ('Carrying hidden state across chunks is only supported by '
+                   'mono-directional models without pooling nor instance '
+                   'normalization.')
+            raise ValueError(msg)
+
         if isinstance(sequences, PackedSequence):
             msg = (f'{self.__class__.__name__} does not support batches '
                    f'containing sequences of variable length.')
@@ -180,25 +208,31 @@ class StackedRNN(nn.Module):
             output = F.instance_norm(output)
             output = output.transpose(1, 2)
 
+        if hidden is None:
+            hidden = [None] * len(self.recurrent_layers_)
+        final_hidden = []
+
         # stack recurrent layers
-        for hidden_dim, layer in zip(self.recurrent, self.recurrent_layers_):
+        for hidden_dim, layer, layer_hidden in zip(
+            self.recurrent, self.recurrent_layers_, hidden):
 
-            if self.rnn == 'LSTM':
+            if layer_hidden is None and self.rnn == 'LSTM':
                 # initial hidden and cell states
                 h = torch.zeros(self.num_directions_, batch_size, hidden_dim,
                                 device=device, requires_grad=False)
                 c = torch.zeros(self.num_directions_, batch_size, hidden_dim,
                                 device=device, requires_grad=False)
-                hidden = (h, c)
+                layer_hidden = (h, c)
 
-            elif self.rnn == 'GRU':
+            elif layer_hidden is None and self.rnn == 'GRU':
                 # initial hidden state
-                hidden = torch.zeros(
+                layer_hidden = torch.zeros(
                     self.num_directions_, batch_size, hidden_dim,
                     device=device, requires_grad=False)
 
             # apply current recurrent layer and get output sequence
-            output, _ = layer(output, hidden)
+            output, layer_hidden = layer(output, layer_hidden)
+            final_hidden.append(layer_hidden)
 
             # average both directions in case of bidirectional layers
             if self.bidirectional:
@@ -224,13 +258,18 @@ class StackedRNN(nn.Module):
         output = self.final_layer_(output)
 
         if self.task_type_ == TASK_MULTI_CLASS_CLASSIFICATION:
-            return torch.log_softmax(output, dim=-1)
+            output = torch.log_softmax(output, dim=-1)
 
         elif self.task_type_ == TASK_MULTI_LABEL_CLASSIFICATION:
-            return torch.sigmoid(output)
+            output = torch.sigmoid(output)
 
         elif self.task_type_ == TASK_REGRESSION:
-            return torch.sigmoid(output)
+            output = torch.sigmoid(output)
+
+        if return_hidden:
+            return output, final_hidden
+
+        return output
 
 
 class ConvRNN(nn.Module):
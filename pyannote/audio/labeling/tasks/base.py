@@ -31,6 +31,7 @@ import scipy.signal
 import torch
 import torch.nn.functional as F
 from pyannote.audio.features.utils import get_audio_duration
+from pyannote.audio.features.utils import prefetch_audio_metadata
 from pyannote.audio.train.trainer import Trainer
 from pyannote.core import Annotation
 from pyannote.core import Segment
@@ -200,8 +201,8 @@ class LabelingTaskGenerator:
         self.data_ = {}
         segment_labels, file_labels = set(), dict()
 
-        # loop once on all files
-        for current_file in getattr(protocol, subset)():
+        # loop once on all files (whose audio headers are read in parallel)
+        for current_file in prefetch_audio_metadata(protocol, subset=subset):
 
             # ensure annotation/annotated are cropped to actual file duration
             support = Segment(start=0, end=get_audio_duration(current_file))
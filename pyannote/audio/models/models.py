@@ -36,6 +36,8 @@ from . import TASK_REGRESSION
 from . import TASK_REPRESENTATION_LEARNING
 
 from .sincnet import SincNet
+from .spectral import MFCC
+from .spectral import MelSpectrogram
 
 
 class RNN(nn.Module):
@@ -313,6 +315,10 @@ class PyanNet(nn.Module):
     Parameters
     ----------
     sincnet : `dict`, optional
+    mfcc : `dict`, optional
+        Use (on-tensor) MFCC front-end instead of SincNet.
+    melspectrogram : `dict`, optional
+        Use (on-tensor) mel spectrogram front-end instead of SincNet.
     rnn : `dict`, optional
     ff : `dict`, optional
     embedding : `dict`, optional
@@ -323,11 +329,18 @@ class PyanNet(nn.Module):
     supports_packed = False
 
     @staticmethod
-    def get_frame_info(**kwargs):
-        return SincNet.get_frame_info(**kwargs)
+    def get_frame_info(sincnet=None, mfcc=None, melspectrogram=None,
+                       **kwargs):
+        if mfcc is not None:
+            return MFCC.get_frame_info(**mfcc)
+        if melspectrogram is not None:
+            return MelSpectrogram.get_frame_info(**melspectrogram)
+        if sincnet is None:
+            sincnet = dict()
+        return SincNet.get_frame_info(**sincnet)
 
-    def __init__(self, specifications, sincnet=None, rnn=None, ff=None,
-                 embedding=None):
+    def __init__(self, specifications, sincnet=None, mfcc=None,
+                 melspectrogram=None, rnn=None, ff=None, embedding=None):
         super().__init__()
 
         self.specifications = specifications
@@ -342,12 +355,33 @@ class PyanNet(nn.Module):
             )
             raise ValueError(msg)
 
-        if sincnet is None:
-            sincnet = dict()
-        self.sincnet = sincnet
-        self.sincnet_ = SincNet(**sincnet)
-        self.frame_info_ = self.sincnet_.get_frame_info(**sincnet)
-        n_features = self.sincnet_.dimension
+        if sum(x is not None for x in [sincnet, mfcc, melspectrogram]) > 1:
+            msg = (
+                f'PyanNet only supports one front-end among "sincnet", '
+                f'"mfcc", and "melspectrogram".'
+            )
+            raise ValueError(msg)
+
+        self.mfcc = mfcc
+        self.melspectrogram = melspectrogram
+
+        if mfcc is not None:
+            self.mfcc_ = MFCC(**mfcc)
+            self.frame_info_ = self.mfcc_.get_frame_info(**mfcc)
+
+        elif melspectrogram is not None:
+            self.melspectrogram_ = MelSpectrogram(**melspectrogram)
+            self.frame_info_ = self.melspectrogram_.get_frame_info(
+                **melspectrogram)
+
+        else:
+            if sincnet is None:
+                sincnet = dict()
+            self.sincnet = sincnet
+            self.sincnet_ = SincNet(**sincnet)
+            self.frame_info_ = self.sincnet_.get_frame_info(**sincnet)
+
+        n_features = self.frontend_.dimension
 
         if rnn is None:
             rnn = dict()
@@ -384,6 +418,14 @@ class PyanNet(nn.Module):
             msg = f'Unsupported task type: {self.task_}'
             raise NotImplementedError(msg)
 
+    @property
+    def frontend_(self):
+        if self.mfcc is not None:
+            return self.mfcc_
+        if self.melspectrogram is not None:
+            return self.melspectrogram_
+        return self.sincnet_
+
     def forward(self, waveforms, return_intermediate=None):
         """
 
@@ -403,7 +445,7 @@ class PyanNet(nn.Module):
             Intermediate network output (only when `return_intermediate`
             is provided).
         """
-        output = self.sincnet_(waveforms)
+        output = self.frontend_(waveforms)
 
         if return_intermediate is None:
             output = self.rnn_(output)
@@ -0,0 +1,354 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# The MIT License (MIT)
+
+# Copyright (c) 2019 CNRS
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# AUTHORS
+# Hervé BREDIN - http://herve.niderb.fr
+
+"""
+On-tensor (batched) spectral feature extraction
+
+These modules compute the same features as their `librosa`-based counterparts
+(`pyannote.audio.features.LibrosaMelSpectrogram` and `LibrosaMFCC`) but on a
+whole batch of waveforms at once, on CPU or GPU. They can therefore be used as
+model front-end (like `SincNet`) while batch generators only provide raw
+waveforms (i.e. with `pyannote.audio.features.RawAudio` feature extraction).
+
+Unlike their `librosa`-based counterparts, frames are not centered (and
+waveforms are therefore not padded) so that, exactly like `SincNet`, output
+frames are aligned with labels cropped in 'strict' mode.
+"""
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from pyannote.core import SlidingWindow
+
+from pyannote.audio.features.spectral import get_window
+from pyannote.audio.features.spectral import get_mel_basis
+from pyannote.audio.features.spectral import get_dct_basis
+from pyannote.audio.features.spectral import get_delta_filters
+
+
+class MelSpectrogram(nn.Module):
+    """(log-scaled) Mel spectrogram
+
+    Parameters
+    ----------
+    sample_rate : int, optional
+        Defaults to 16000 (i.e. 16kHz)
+    duration : float, optional
+        Defaults to 0.025.
+    step : float, optional
+        Defaults to 0.010.
+    n_mels : int, optional
+        Defaults to 96.
+    fmin : float, optional
+        Defaults to 0.
+    fmax : float, optional
+        Defaults to sample_rate / 2.
+    htk : bool, optional
+        Use HTK formula for mel scale. Defaults to False.
+    window : str, optional
+        Defaults to 'hann'.
+    ref : {'max', float}, optional
+        Reference power used for log-scaling. Defaults to 'max', i.e. maximum
+        power of each waveform, as in `LibrosaMelSpectrogram`.
+    top_db : float, optional
+        Threshold the output at `top_db` below the peak. Defaults to 80.
+    """
+
+    frame_crop = 'strict'
+
+    @staticmethod
+    def get_frame_info(sample_rate=16000, duration=0.025, step=0.010,
+                       **kwargs):
+        n_fft = int(duration * sample_rate)
+        hop_length = int(step * sample_rate)
+        return SlidingWindow(start=0.,
+                             duration=n_fft / sample_rate,
+                             step=hop_length / sample_rate)
+
+    def __init__(self, sample_rate=16000, duration=0.025, step=0.010,
+                 n_mels=96, fmin=0.0, fmax=None, htk=False, window='hann',
+                 ref='max', top_db=80.0):
+
+        super().__init__()
+
+        self.sample_rate = sample_rate
+        self.duration = duration
+        self.step = step
+        self.n_mels = n_mels
+        self.fmin = fmin
+        self.fmax = fmax
+        self.htk = htk
+        self.window = window
+        self.ref = ref
+        self.top_db = top_db
+
+        self.n_fft_ = int(self.duration * self.sample_rate)
+        self.hop_length_ = int(self.step * self.sample_rate)
+
+        # windowed real DFT basis: (n_fft, n_fft // 2 + 1) each
+        n = np.arange(self.n_fft_)[:, None]
+        k = np.arange(self.n_fft_ // 2 + 1)[None, :]
+        angle = 2 * np.pi * n * k / self.n_fft_
+        w = get_window(self.window, self.n_fft_)[:, None]
+        self.register_buffer('cos_', torch.tensor(w * np.cos(angle),
+                                                  dtype=torch.float32))
+        self.register_buffer('sin_', torch.tensor(w * np.sin(angle),
+                                                  dtype=torch.float32))
+
+        # (n_fft // 2 + 1, n_mels)
+        mel_basis = get_mel_basis(self.sample_rate, self.n_fft_, self.n_mels,
+                                  fmin=self.fmin, fmax=self.fmax,
+                                  htk=self.htk)
+        self.register_buffer('mel_basis_', torch.tensor(mel_basis,
+                                                        dtype=torch.float32))
+
+    def power_spectrogram(self, waveforms):
+        """
+        Parameters
+        ----------
+        waveforms : (batch_size, n_samples, 1) `torch.Tensor`
+
+        Returns
+        -------
+        power : (batch_size, n_frames, n_fft // 2 + 1) `torch.Tensor`
+        """
+
+        n_samples = waveforms.shape[1]
+        if n_samples < self.n_fft_:
+            msg = (
+                f'Waveforms are too short ({n_samples:d} samples) for '
+                f'{self.n_fft_:d}-sample frames.'
+            )
+            raise ValueError(msg)
+
+        frames = waveforms[:, :, 0].unfold(1, self.n_fft_, self.hop_length_)
+        return torch.matmul(frames, self.cos_) ** 2 + \
+               torch.matmul(frames, self.sin_) ** 2
+
+    def power_to_db(self, S, amin=1e-10):
+        """Equivalent to librosa.power_to_db, for each batch item"""
+
+        batch_size = S.shape[0]
+
+        log_spec = 10.0 * torch.log10(torch.clamp(S, min=amin))
+
+        if self.ref == 'max':
+            ref = log_spec.view(batch_size, -1).max(dim=1)[0]
+            log_spec = log_spec - torch.clamp(ref, min=10.0 * np.log10(amin)).view(batch_size, 1, 1)
+        else:
+            log_spec = log_spec - 10.0 * np.log10(max(amin, self.ref))
+
+        if self.top_db is not None:
+            peak = log_spec.view(batch_size, -1).max(dim=1)[0]
+            log_spec = torch.max(
+                log_spec, (peak - self.top_db).view(batch_size, 1, 1))
+
+        return log_spec
+
+    def forward(self, waveforms):
+        """Extract mel spectrogram
+
+        Parameters
+        ----------
+        waveforms : (batch_size, n_samples, 1) `torch.Tensor`
+            Batch of waveforms
+
+        Returns
+        -------
+        features : (batch_size, n_frames, n_mels) `torch.Tensor`
+        """
+        S = torch.matmul(self.power_spectrogram(waveforms), self.mel_basis_)
+        return self.power_to_db(S)
+
+    @property
+    def dimension(self):
+        """Output features dimension"""
+        return self.n_mels
+
+
+class MFCC(MelSpectrogram):
+    """MFCC (with optional derivatives)
+
+    Parameters
+    ----------
+    sample_rate : int, optional
+        Defaults to 16000 (i.e. 16kHz)
+    duration : float, optional
+        Defaults to 0.025.
+    step : float, optional
+        Defaults to 0.010.
+    e : bool, optional
+        Energy. Defaults to False.
+    coefs : int, optional
+        Number of coefficients. Defaults to 19.
+    De : bool, optional
+        Keep energy first derivative. Defaults to True.
+    D : bool, optional
+        Add first order derivatives. Defaults to True.
+    DDe : bool, optional
+        Keep energy second derivative. Defaults to True.
+    DD : bool, optional
+        Add second order derivatives. Defaults to True.
+    fmin : float, optional
+        Defaults to 0.
+    fmax : float, optional
+        Defaults to sample_rate / 2.
+    n_mels : int, optional
+        Defaults to 40.
+
+    See also
+    --------
+    `pyannote.audio.features.LibrosaMFCC`
+    """
+
+    def __init__(self, sample_rate=16000, duration=0.025, step=0.01,
+                 e=False, De=True, DDe=True,
+                 coefs=19, D=True, DD=True,
+                 fmin=0.0, fmax=None, n_mels=40):
+
+        super().__init__(sample_rate=sample_rate, duration=duration,
+                         step=step, n_mels=n_mels, fmin=fmin, fmax=fmax,
+                         htk=True, ref=1.0, top_db=80.0)
+
+        self.e = e
+        self.coefs = coefs
+        self.De = De
+        self.DDe = DDe
+        self.D = D
+        self.DD = DD
+
+        # (n_mels, coefs + 1). adding 1 because C0 is the energy
+        dct_basis = get_dct_basis(self.n_mels, self.coefs + 1)
+        self.register_buffer('dct_basis_', torch.tensor(dct_basis,
+                                                        dtype=torch.float32))
+
+        self.orders_ = []
+        if self.De or self.D:
+            self.orders_.append(1)
+        if self.DDe or self.DD:
+            self.orders_.append(2)
+
+        if self.orders_:
+            kernels, head, tail = get_delta_filters(9, tuple(self.orders_))
+            self.register_buffer('delta_kernels_', torch.tensor(
+                kernels[:, None, :], dtype=torch.float32))
+            self.register_buffer('delta_head_', torch.tensor(
+                head, dtype=torch.float32))
+            self.register_buffer('delta_tail_', torch.tensor(
+                tail, dtype=torch.float32))
+
+    def deltas(self, X):
+        """Equivalent to librosa.feature.delta(width=9, mode='interp')
+
+        Parameters
+        ----------
+        X : (batch_size, n_frames, dimension) `torch.Tensor`
+
+        Returns
+        -------
+        deltas : list of (batch_size, n_frames, dimension) `torch.Tensor`
+            First and/or second order derivatives.
+        """
+
+        batch_size, n_frames, dimension = X.shape
+        width = self.delta_kernels_.shape[-1]
+        if n_frames < width:
+            msg = (
+                f'Derivatives cannot be computed on less than {width:d} '
+                f'frames (here, {n_frames:d}).'
+            )
+            raise ValueError(msg)
+
+        # interior frames: one (multi-output) convolution
+        # (batch_size x dimension, 1, n_frames)
+        x = X.transpose(1, 2).contiguous().view(-1, 1, n_frames)
+        # (batch_size x dimension, n_orders, n_frames - width + 1)
+        interior = F.conv1d(x, self.delta_kernels_)
+        interior = interior.view(batch_size, dimension, -1, n_frames - width + 1)
+        # (batch_size, n_orders, n_frames - width + 1, dimension)
+        interior = interior.permute(0, 2, 3, 1)
+
+        # boundary frames: polynomial fit on first (resp. last) frames
+        head = torch.einsum('ohw,bwd->bohd', [self.delta_head_, X[:, :width]])
+        tail = torch.einsum('ohw,bwd->bohd', [self.delta_tail_, X[:, -width:]])
+
+        D = torch.cat([head, interior, tail], dim=2)
+        return list(torch.unbind(D, dim=1))
+
+    def forward(self, waveforms):
+        """Extract MFCC
+
+        Parameters
+        ----------
+        waveforms : (batch_size, n_samples, 1) `torch.Tensor`
+            Batch of waveforms
+
+        Returns
+        -------
+        features : (batch_size, n_frames, dimension) `torch.Tensor`
+        """
+
+        S = torch.matmul(self.power_spectrogram(waveforms), self.mel_basis_)
+        mfcc = torch.matmul(self.power_to_db(S), self.dct_basis_)
+
+        if self.orders_:
+            mfcc_d = dict(zip(self.orders_, self.deltas(mfcc)))
+
+        stack = []
+
+        if self.e:
+            stack.append(mfcc[:, :, :1])
+
+        stack.append(mfcc[:, :, 1:])
+
+        if self.De:
+            stack.append(mfcc_d[1][:, :, :1])
+
+        if self.D:
+            stack.append(mfcc_d[1][:, :, 1:])
+
+        if self.DDe:
+            stack.append(mfcc_d[2][:, :, :1])
+
+        if self.DD:
+            stack.append(mfcc_d[2][:, :, 1:])
+
+        return torch.cat(stack, dim=2)
+
+    @property
+    def dimension(self):
+        """Output features dimension"""
+        n_features = 0
+        n_features += self.e
+        n_features += self.De
+        n_features += self.DDe
+        n_features += self.coefs
+        n_features += self.coefs * self.D
+        n_features += self.coefs * self.DD
+        return n_features
@@ -35,7 +35,6 @@ import numpy as np
 import scipy.signal
 from pyannote.core import Segment, Timeline
 from pyannote.core.utils.generators import pairwise
-from sklearn.mixture import GaussianMixture
 from pyannote.core.utils.numpy import one_hot_decoding
 
 
@@ -299,6 +298,8 @@ class GMMResegmentation(object):
 
         """
 
+        from sklearn.mixture import GaussianMixture
+
         sliding_window = features.sliding_window
         window = np.ones((1, sliding_window.samples(self.window)))
 
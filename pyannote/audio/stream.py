@@ -26,9 +26,14 @@
 # AUTHORS
 # Hervé BREDIN - http://herve.niderb.fr
 
-import dask
+import time
+from collections import deque
+
 import numpy as np
-from .features.utils import read_audio
+import scipy.signal
+import soundfile as sf
+from .features.utils import StreamingResampler
+from .features.normalization import StreamingShortTermStandardization
 from pyannote.core import Segment, Timeline
 from pyannote.core import SlidingWindow, SlidingWindowFeature
 
@@ -42,19 +47,231 @@ class More(object):
         super(More, self).__init__()
         self.output = output
 
-def stream_audio(current_file, sample_rate=None, mono=True, duration=1.):
-    """Simulate audio file streaming
+
+class _RingBuffer(object):
+    """Preallocated buffer of frames sharing a common time base
+
+    Frames are appended at the end and discarded from the beginning. Live
+    frames are always stored contiguously so that `view` returns zero-copy
+    slices. When the write head reaches the end of the storage, live frames
+    are moved back to the front (i.e. it wraps around). As long as `capacity`
+    is at least twice the number of live frames, this costs O(1) amortized
+    per frame.
 
     Parameters
     ----------
-    current_file : dict
-        Dictionary given by pyannote.database.
+    frames : SlidingWindow
+        Time base. Frame #0 is the very first frame of the stream.
+    shape : tuple
+        Shape of one frame.
+    dtype : np.dtype
+        Frames data type.
+    capacity : int, optional
+        Initial capacity, in number of frames. Storage grows when needed.
+        Defaults to 1024.
+    max_frames : int, optional
+        When provided, only keep the `max_frames` most recent frames.
+
+    Notes
+    -----
+    Data returned by `view` is only valid until the next call to `append`:
+    copy it if it needs to be kept.
+    """
+
+    def __init__(self, frames, shape, dtype, capacity=None, max_frames=None):
+        super(_RingBuffer, self).__init__()
+        self.frames = frames
+        self.max_frames = max_frames
+
+        if capacity is None:
+            capacity = 1024
+        if max_frames is not None:
+            capacity = max(capacity, 2 * max_frames)
+        self.data_ = np.empty((capacity, ) + tuple(shape), dtype=dtype)
+
+        # absolute index of first live frame (start_) and of the frame
+        # expected next (end_). live frames are stored in data_[head_:tail_]
+        self.start_, self.end_ = 0, 0
+        self.head_, self.tail_ = 0, 0
+
+    def __len__(self):
+        return max(0, self.end_ - self.start_)
+
+    @property
+    def start(self):
+        """Absolute index of first live frame"""
+        return self.start_
+
+    @property
+    def end(self):
+        """Absolute index of the next expected frame"""
+        return self.end_
+
+    def _reserve(self, n):
+        """Make room for `n` additional frames"""
+
+        if self.tail_ + n <= len(self.data_):
+            return
+
+        n_live = self.tail_ - self.head_
+        capacity = len(self.data_)
+        if n_live + n > capacity // 2:
+            capacity = max(2 * (n_live + n), 2 * capacity)
+
+        # wrap around: move live frames to the front of (new) storage
+        if capacity > len(self.data_):
+            data = np.empty((capacity, ) + self.data_.shape[1:],
+                            dtype=self.data_.dtype)
+        else:
+            data = self.data_
+        data[:n_live] = self.data_[self.head_:self.tail_]
+        self.data_ = data
+        self.head_, self.tail_ = 0, n_live
+
+    def append(self, data):
+        """Append frames at the end of the buffer
+
+        Parameters
+        ----------
+        data : (n_frames, ...) np.ndarray
+            New frames, starting at absolute index `end`.
+        """
+
+        # only the `max_frames` most recent frames will survive anyway
+        if self.max_frames is not None:
+            self.discard(self.end_ + len(data) - self.max_frames)
+
+        # frames that were already discarded (see `discard`) are skipped
+        skip = min(len(data), max(0, self.start_ - self.end_))
+        data = data[skip:]
+        self.end_ += skip
+        n = len(data)
+
+        self._reserve(n)
+        self.data_[self.tail_:self.tail_ + n] = data
+        self.tail_ += n
+        self.end_ += n
+
+    def add(self, index, data):
+        """Add frames to the buffer, starting at absolute index `index`
+
+        Frames overlapping live frames are summed with them, other frames are
+        appended. Missing frames between `end` and `index` are zero-filled.
+
+        Parameters
+        ----------
+        index : int
+            Absolute index of first frame. Must not be smaller than `start`.
+        data : (n_frames, ...) np.ndarray
+            Frames.
+        """
+
+        if index < self.start_:
+            msg = (
+                f'Cannot add frames starting at index {index:d}: '
+                f'frames before index {self.start_:d} have been discarded.'
+            )
+            raise ValueError(msg)
+
+        if index > self.end_:
+            gap = index - self.end_
+            self.append(np.zeros((gap, ) + self.data_.shape[1:],
+                                 dtype=self.data_.dtype))
+
+        overlap = max(0, min(len(data), self.end_ - index))
+        i = self.head_ + index - self.start_
+        self.data_[i:i + overlap] += data[:overlap]
+        self.append(data[overlap:])
+
+    def discard(self, index):
+        """Discard all frames before absolute index `index`
+
+        Frames that have not been appended yet are skipped on arrival.
+        """
+        if index <= self.start_:
+            return
+        n = min(index, self.end_) - self.start_
+        self.head_ += n
+        self.start_ = index
+        if self.start_ >= self.end_:
+            self.head_ = self.tail_ = 0
+
+    def view(self, n=None):
+        """Return (at most) `n` first live frames without copying them
+
+        Returns
+        -------
+        sequence : SlidingWindowFeature
+        """
+        n = len(self) if n is None else min(n, len(self))
+        frames = SlidingWindow(start=self.frames[self.start_].start,
+                               duration=self.frames.duration,
+                               step=self.frames.step)
+        return SlidingWindowFeature(self.data_[self.head_:self.head_ + n],
+                                    frames)
+
+def _open_audio(audio, raw=None):
+    """Open audio for sequential reading
+
+    Parameters
+    ----------
+    audio : str, int or file-like object
+        Path, file descriptor or file-like object.
+    raw : dict, optional
+        See `stream_audio`.
+
+    Returns
+    -------
+    f : soundfile.SoundFile
+    """
+
+    kwargs = dict()
+    if raw is not None:
+        kwargs = dict(format='RAW',
+                      samplerate=raw['sample_rate'],
+                      channels=raw.get('channels', 1),
+                      subtype=raw.get('subtype', 'PCM_16'),
+                      endian=raw.get('endian', 'FILE'))
+
+    # libsndfile reads pipes (e.g. stdin) sequentially through their file
+    # descriptor, but cannot do it through Python file-like objects
+    if hasattr(audio, 'read') and hasattr(audio, 'fileno'):
+        try:
+            seekable = audio.seekable()
+        except (AttributeError, ValueError):
+            seekable = False
+        if not seekable:
+            audio = audio.fileno()
+
+    if isinstance(audio, int):
+        kwargs['closefd'] = False
+
+    return sf.SoundFile(audio, mode='r', **kwargs)
+
+
+def stream_audio(current_file, sample_rate=None, mono=True, duration=1.,
+                 raw=None):
+    """Stream audio file
+
+    Audio is decoded (and resampled) incrementally, block by block, so that
+    memory usage does not depend on the duration of the file.
+
+    Parameters
+    ----------
+    current_file : dict, str, int or file-like object
+        Dictionary given by pyannote.database, or directly what its `audio`
+        key would contain: path, file descriptor or file-like object
+        (including non-seekable ones, e.g. sys.stdin.buffer).
     sample_rate: int, optional
         Target sampling rate. Defaults to using native sampling rate.
     mono : int, optional
         Convert multi-channel to mono. Defaults to True.
     duration : float, optional
         Buffer duration, in seconds. Defaults to 1.
+    raw : dict, optional
+        Set to read headerless PCM data. Must contain a 'sample_rate' key and
+        may contain 'channels' (defaults to 1), 'subtype' (defaults to
+        'PCM_16') and 'endian' (defaults to 'FILE') keys.
 
     Returns
     -------
@@ -73,26 +290,73 @@ def stream_audio(current_file, sample_rate=None, mono=True, duration=1.):
 
     """
 
-    y, sample_rate = read_audio(current_file,
-                                sample_rate=sample_rate,
-                                mono=mono)
+    if not isinstance(current_file, dict):
+        current_file = {'audio': current_file}
+    channel = current_file.get('channel', None)
 
-    n_samples_total = len(y)
-    n_samples_buffer = int(duration * sample_rate)
+    with _open_audio(current_file['audio'], raw=raw) as f:
 
-    for i in range(0, n_samples_total, n_samples_buffer):
-        data = y[i: i + n_samples_buffer, np.newaxis]
-        sw = SlidingWindow(start=i / sample_rate,
-                           duration=1 / sample_rate,
-                           step=1 / sample_rate)
-        yield SlidingWindowFeature(data, sw)
+        file_sample_rate = f.samplerate
+        if sample_rate is None or sample_rate == file_sample_rate:
+            sample_rate = file_sample_rate
+            resampler = None
+        else:
+            resampler = StreamingResampler(file_sample_rate, sample_rate)
+
+        n_samples_buffer = int(duration * sample_rate)
+        blocksize = int(duration * file_sample_rate)
+
+        # buffers are yielded as soon as `n_samples_buffer` samples are ready
+        pending, n_pending = [], 0
+        i = 0
+
+        while True:
+
+            y = f.read(blocksize, dtype='float32', always_2d=True)
+            eof = len(y) == 0
+
+            if not eof:
+
+                # extract specific channel if requested
+                if channel is not None:
+                    y = y[:, channel - 1:channel]
+
+                # convert to mono
+                if mono and y.shape[1] > 1:
+                    y = np.mean(y, axis=1, keepdims=True)
+
+            if resampler is not None:
+                y = resampler.flush() if eof else resampler(y)
+
+            if y is not None and len(y) > 0:
+                pending.append(y)
+                n_pending += len(y)
+
+            while n_pending >= n_samples_buffer or (eof and n_pending > 0):
+                y = np.concatenate(pending, axis=0)
+                data, y = y[:n_samples_buffer], y[n_samples_buffer:]
+                pending, n_pending = [y], len(y)
+
+                sw = SlidingWindow(start=i / sample_rate,
+                                   duration=1 / sample_rate,
+                                   step=1 / sample_rate)
+                yield SlidingWindowFeature(data, sw)
+                i += len(data)
+
+            if eof:
+                break
 
     while True:
         yield Stream.EndOfStream
 
 
 def stream_features(feature_extraction, current_file, duration=1.):
-    """Simulate online feature extraction
+    """Stream features
+
+    When `feature_extraction` supports it (e.g. `FeatureExtraction` and
+    `RawAudio`), features are computed incrementally from the (streamed)
+    waveform, so that the whole file is never loaded at once. Otherwise,
+    features are extracted from the whole file first, and then streamed.
 
     Parameters
     ----------
@@ -115,6 +379,24 @@ def stream_features(feature_extraction, current_file, duration=1.):
 
     """
 
+    if hasattr(feature_extraction, 'incremental'):
+        buffers = _stream_features_incremental(feature_extraction,
+                                               current_file,
+                                               duration=duration)
+    else:
+        buffers = _stream_features_offline(feature_extraction, current_file,
+                                           duration=duration)
+
+    for buffer in buffers:
+        yield buffer
+
+    while True:
+        yield Stream.EndOfStream
+
+
+def _stream_features_offline(feature_extraction, current_file, duration=1.):
+    """Extract features from the whole file and yield them by buffers"""
+
     features = feature_extraction(current_file)
     sliding_window = features.sliding_window
     data = features.data
@@ -128,8 +410,48 @@ def stream_features(feature_extraction, current_file, duration=1.):
                            step=sliding_window.step)
         yield SlidingWindowFeature(data[i: i+n_samples_buffer], sw)
 
-    while True:
-        yield Stream.EndOfStream
+
+def _stream_features_incremental(feature_extraction, current_file,
+                                 duration=1.):
+    """Extract features incrementally and yield them by buffers"""
+
+    incremental = feature_extraction.incremental()
+
+    # buffers of `n_samples_buffer` frames are yielded as soon as ready
+    pending, n_pending = [], 0
+    frames, n_samples_buffer = None, None
+    i = 0
+
+    # down-mixing and resampling are taken care of by `incremental`
+    for waveform in stream_audio(current_file, mono=False,
+                                 duration=duration):
+
+        eof = waveform is Stream.EndOfStream
+        features = incremental.flush() if eof else incremental(waveform)
+        if features is None:
+            break
+
+        if frames is None:
+            frames = features.sliding_window
+            n_samples_buffer = frames.samples(duration, mode='center')
+
+        if len(features.data) > 0:
+            pending.append(features.data)
+            n_pending += len(features.data)
+
+        while n_pending >= n_samples_buffer or (eof and n_pending > 0):
+            data = np.concatenate(pending, axis=0)
+            data, rest = data[:n_samples_buffer], data[n_samples_buffer:]
+            pending, n_pending = [rest], len(rest)
+
+            sw = SlidingWindow(start=frames[i].start,
+                               duration=frames.duration,
+                               step=frames.step)
+            yield SlidingWindowFeature(data, sw)
+            i += len(data)
+
+        if eof:
+            break
 
 
 class StreamBuffer(object):
@@ -145,6 +467,11 @@ class StreamBuffer(object):
     incomplete : bool, optional
         Set to True to return the current buffer on "end-of-stream"
         even if is is not complete. Defaults to False.
+
+    Notes
+    -----
+    Frames are stored in a preallocated ring buffer and returned windows are
+    views of it: they are only valid until the next call.
     """
 
     def __init__(self, duration=3.2, step=None, incomplete=False):
@@ -162,13 +489,17 @@ class StreamBuffer(object):
                                      duration=sw.duration,
                                      step=sw.step)
 
-        self.buffer_ = np.array(sequence.data)
-
         self.window_ = SlidingWindow(start=sw.start,
                                      duration=self.duration,
                                      step=self.step)
         self.current_window_ = next(self.window_)
         self.n_samples_ = self.frames_.samples(self.duration, mode='center')
+
+        data = sequence.data
+        self.buffer_ = _RingBuffer(self.frames_, data.shape[1:], data.dtype,
+                                   capacity=2 * max(self.n_samples_,
+                                                    len(data)))
+        self.buffer_.append(data)
         self.initialized_ = True
 
     def __call__(self, sequence=Stream.NoNewData):
@@ -188,7 +519,7 @@ class StreamBuffer(object):
 
             # if requested, return the current buffer on "end-of-stream"
             if self.incomplete:
-                return SlidingWindowFeature(self.buffer_, self.frames_)
+                return self.buffer_.view()
 
             return Stream.EndOfStream
 
@@ -204,40 +535,36 @@ class StreamBuffer(object):
                 assert sw.step == self.frames_.step
 
                 # check that first frame is exactly the one that is expected
-                expected = self.frames_[len(self.buffer_)]
+                expected = self.frames_[self.buffer_.end]
                 assert np.allclose(expected, sw[0])
 
                 # append the new samples at the end of buffer
-                self.buffer_ = np.concatenate([self.buffer_, sequence.data],
-                                              axis=0)
+                self.buffer_.append(sequence.data)
 
             # initialize buffer
             else:
                 self.initialize(sequence)
 
         # if not enough samples are available, there is nothing to return
-        if not self.initialized_ or self.buffer_.shape[0] < self.n_samples_:
+        if not self.initialized_ or len(self.buffer_) < self.n_samples_:
             return Stream.NoNewData
 
         # if enough samples are available, prepare output
-        output = SlidingWindowFeature(self.buffer_[:self.n_samples_],
-                                      self.frames_)
+        output = self.buffer_.view(self.n_samples_)
 
         # switch to next window
         self.current_window_ = next(self.window_)
 
-        # update buffer by removing old samples and updating start time
+        # remove old samples. first valid frame is computed in the (absolute)
+        # time base of the stream so that rounding errors do not accumulate.
         first_valid = self.frames_.crop(self.current_window_,
                                         mode='center',
                                         fixed=self.duration)[0]
-        self.buffer_ = self.buffer_[first_valid:]
-        self.frames_ = SlidingWindow(start=self.frames_[first_valid].start,
-                                     duration=self.frames_.duration,
-                                     step=self.frames_.step)
+        self.buffer_.discard(first_valid)
 
         # if enough samples are available for next window
         # wrap output into a More instance
-        if self.buffer_.shape[0] >= self.n_samples_:
+        if len(self.buffer_) >= self.n_samples_:
             output = More(output)
 
         return output
@@ -245,10 +572,23 @@ class StreamBuffer(object):
 
 class StreamAccumulate(object):
     """This module concatenates (adjacent) input sequences
+
+    Parameters
+    ----------
+    duration : float, optional
+        Maximum history duration, in seconds. Older frames are forgotten so
+        that memory usage and cost per call remain constant. Defaults to
+        keeping the whole history.
+
+    Notes
+    -----
+    Frames are stored in a preallocated ring buffer and returned sequences are
+    views of it: they are only valid until the next call.
     """
 
-    def __init__(self):
+    def __init__(self, duration=None):
         super(StreamAccumulate, self).__init__()
+        self.duration = duration
         self.initialized_ = False
 
     def initialize(self, sequence):
@@ -259,7 +599,14 @@ class StreamAccumulate(object):
                                      duration=sw.duration,
                                      step=sw.step)
 
-        self.buffer_ = np.array(sequence.data)
+        max_frames = None
+        if self.duration is not None:
+            max_frames = self.frames_.samples(self.duration, mode='center')
+
+        data = sequence.data
+        self.buffer_ = _RingBuffer(self.frames_, data.shape[1:], data.dtype,
+                                   max_frames=max_frames)
+        self.buffer_.append(data)
         self.initialized_ = True
 
     def __call__(self, sequence=Stream.NoNewData):
@@ -279,23 +626,70 @@ class StreamAccumulate(object):
             assert sw.step == self.frames_.step
 
             # check that first frame is exactly the one that is expected
-            expected = self.frames_[len(self.buffer_)]
+            expected = self.frames_[self.buffer_.end]
             assert np.allclose(expected, sw[0])
 
             # append the new samples at the end of buffer
-            self.buffer_ = np.concatenate(
-                [self.buffer_, sequence.data], axis=0)
+            self.buffer_.append(sequence.data)
 
         # initialize buffer
         else:
             self.initialize(sequence)
 
-        return SlidingWindowFeature(self.buffer_, self.frames_)
+        return self.buffer_.view()
+
 
+class StreamStandardize(object):
+    """This module applies short-term mean/variance normalization
+
+    Normalized frames are returned as soon as their (centered) window is
+    complete, and remaining frames are returned on "end-of-stream".
+
+    Parameters
+    ----------
+    duration : float, optional
+        Normalization window duration. Defaults to 3 seconds.
+    """
+
+    def __init__(self, duration=3.):
+        super(StreamStandardize, self).__init__()
+        self.duration = duration
+        self.normalization_ = StreamingShortTermStandardization(
+            duration=duration)
+
+    def __call__(self, sequence=Stream.NoNewData):
+
+        if isinstance(sequence, More):
+            sequence = sequence.output
+
+        if sequence is Stream.NoNewData:
+            return Stream.NoNewData
+
+        if sequence is Stream.EndOfStream:
+            output = self.normalization_.flush()
+            return Stream.EndOfStream if output is None else output
+
+        output = self.normalization_(sequence)
+        if len(output.data) == 0:
+            return Stream.NoNewData
+        return output
 
 
 class StreamBinarize(object):
     """This module binarizes input score sequence
+
+    Parameters
+    ----------
+    onset : float, optional
+        Switch from inactive to active state when score goes above `onset`.
+        Defaults to 0.5.
+    offset : float, optional
+        Switch from active to inactive state when score goes below `offset`.
+        Defaults to 0.5.
+
+    Notes
+    -----
+    Hysteresis state is carried from one input sequence to the next.
     """
 
     def __init__(self, onset=0.5, offset=0.5):
@@ -320,16 +714,37 @@ class StreamBinarize(object):
         if not self.initialized_:
             self.initialize(sequence)
 
-        sw = sequence.sliding_window
-        binarized = np.NAN * np.ones(sequence.data.shape, dtype=np.bool)
-        for i, y in enumerate(sequence.data):
-            if self.active_:
-                self.active_ = ~(y < self.offset)
-            else:
-                self.active_ = y > self.onset
-            binarized[i] = self.active_
+        data = sequence.data
+        n_frames = len(data)
+        y = data.reshape(n_frames, -1)
+        active = np.asarray(self.active_).reshape(-1)
+
+        # frames whose state does not depend on previous state
+        on = y > self.onset
+        off = y < self.offset
+        decisive = on != off
 
-        return SlidingWindowFeature(binarized, sw)
+        # remaining frames either keep previous state (neither above `onset`
+        # nor below `offset`) or toggle it (both, when onset < offset).
+        n_toggles = np.cumsum(on & off, axis=0)
+
+        # index of the last decisive frame (-1 when there is none yet)
+        frames = np.arange(n_frames).reshape(-1, 1)
+        last = np.maximum.accumulate(np.where(decisive, frames, -1), axis=0)
+        dims = np.arange(y.shape[1]).reshape(1, -1)
+        has_last = last > -1
+        last = np.maximum(last, 0)
+
+        # state = state right after last decisive frame (or initial state),
+        # flipped by every toggling frame since then.
+        state = np.where(has_last, on[last, dims], active)
+        n_toggles = n_toggles - np.where(has_last, n_toggles[last, dims], 0)
+        binarized = state ^ (n_toggles % 2 == 1)
+
+        self.active_ = binarized[-1].reshape(np.shape(self.active_))
+
+        return SlidingWindowFeature(binarized.reshape(data.shape),
+                                    sequence.sliding_window)
 
 
 class StreamToTimeline(object):
@@ -347,29 +762,24 @@ class StreamToTimeline(object):
         if sequence in [Stream.EndOfStream, Stream.NoNewData]:
             return sequence
 
-        data = sequence.data
-        active = data[0]
+        y = np.array(sequence.data, dtype=bool).reshape(-1)
+        n_frames = len(y)
 
         sw = sequence.sliding_window
-        start = sw[0].middle
 
         timeline = Timeline()
-        timeline.start = start
+        timeline.start = sw[0].middle
 
-        for i, y in enumerate(data):
-            if active and not y:
-                segment = Segment(start, sw[i].middle)
-                timeline.add(segment)
-                active = False
-            elif not active and y:
-                active = True
-                start = sw[i].middle
+        # indices of inactive-to-active and active-to-inactive transitions.
+        # stream is padded with inactive frames so that they come in pairs.
+        changes = np.diff(np.hstack([[False], y, [False]]).astype(np.int8))
+        starts = np.flatnonzero(changes > 0)
+        ends = np.minimum(np.flatnonzero(changes < 0), n_frames - 1)
 
-        if active:
-            segment = Segment(start, sw[i].middle)
-            timeline.add(segment)
+        for start, end in zip(starts, ends):
+            timeline.add(Segment(sw[start].middle, sw[end].middle))
 
-        timeline.end = sw[i].middle
+        timeline.end = sw[n_frames - 1].middle
 
         return timeline
 
@@ -378,18 +788,66 @@ class StreamAggregate(object):
     """This module accumulates (possibly overlaping) sequences
     and returns their aggregated version as soon as possible.
 
+    Sequences are (optionally weighted and) added to a running sum, and frames
+    are returned (as weighted average) as soon as no future sequence can
+    overlap them, that is as soon as a sequence starting after them arrives.
+
     Parameters
     ----------
-    agg_func : callable, optional
-        Aggregation function. Takes buffer of (possibly overlaping) sequences
-        as input and returns their aggregation (must support the `axis=0`
-        keyword argument). Defaults to np.nanmean.
+    agg_func : {np.nanmean, np.mean}, optional
+        Aggregation function. With np.nanmean (default), NaN values are
+        ignored. With np.mean, they propagate to the aggregated frame. Other
+        aggregation functions are no longer supported.
+    window : str, tuple or callable, optional
+        Weighting window (e.g. 'hann'), applied to every incoming sequence.
+        Any window supported by `scipy.signal.get_window`, or a callable
+        taking a number of frames and returning as many weights. Defaults to
+        uniform weights (i.e. plain average).
+
+    Notes
+    -----
+    Values with zero total weight (e.g. NaN in every overlapping sequence)
+    are returned as NaN. Frames that are not covered by any sequence (i.e.
+    gaps between sequences) are skipped.
     """
 
-    def __init__(self, agg_func=np.nanmean):
+    AGG_FUNCS = {np.nanmean: True, np.mean: False}
+
+    def __init__(self, agg_func=np.nanmean, window=None):
         super(StreamAggregate, self).__init__()
+
+        if agg_func not in self.AGG_FUNCS:
+            msg = (f'Unsupported aggregation function: {agg_func!r} '
+                   f'(must be np.nanmean or np.mean).')
+            raise ValueError(msg)
         self.agg_func = agg_func
+        self.skip_nan_ = self.AGG_FUNCS[agg_func]
+
+        self.window = window
         self.initialized_ = False
+        self.weights_ = dict()
+
+    def get_weights(self, n_frames):
+        """Get weights for a sequence of `n_frames` frames"""
+
+        if n_frames in self.weights_:
+            return self.weights_[n_frames]
+
+        if self.window is None:
+            weights = np.ones((n_frames, ), dtype=np.float64)
+
+        elif callable(self.window):
+            weights = np.array(self.window(n_frames), dtype=np.float64)
+
+        # most windows taper down to zero at both ends. compute the window
+        # on two more frames and remove first and last (zero) weights so
+        # that first and last frames of the stream are still defined.
+        else:
+            weights = scipy.signal.get_window(self.window, n_frames + 2,
+                                              fftbins=False)[1:-1]
+
+        self.weights_[n_frames] = weights
+        return weights
 
     def initialize(self, sequence):
 
@@ -400,14 +858,57 @@ class StreamAggregate(object):
                                      step=sw.step)
 
         data = sequence.data
-        shape = (1,) + data.shape
-        self.buffer_ = np.ones(shape, dtype=data.dtype)
-        self.buffer_[0, :] = data
+        n_frames = len(data)
+        dtype = np.result_type(data.dtype, np.float32)
+        self.sum_ = _RingBuffer(self.frames_, data.shape[1:], dtype,
+                                capacity=2 * n_frames)
+        self.weight_ = _RingBuffer(self.frames_, data.shape[1:], np.float64,
+                                   capacity=2 * n_frames)
+        self.last_ = 0
+        self.add(0, data)
 
         self.initialized_ = True
 
         return Stream.NoNewData
 
+    def add(self, index, data):
+        """Add sequence starting at absolute index `index`"""
+
+        weights = self.get_weights(len(data))
+        shape = (len(data), ) + (1, ) * (data.ndim - 1)
+        weights = np.broadcast_to(weights.reshape(shape), data.shape)
+
+        # NaN values do not contribute to the (weighted) average
+        if self.skip_nan_:
+            valid = ~np.isnan(data)
+            data = np.where(valid, data, 0.)
+            weights = np.where(valid, weights, 0.)
+
+        self.sum_.add(index, weights * data)
+        self.weight_.add(index, weights)
+
+    def pop(self, index=None):
+        """Return (and forget) aggregated frames up to absolute index `index`
+
+        Defaults to returning all frames.
+        """
+
+        if index is None:
+            index = self.sum_.end
+        n_frames = index - self.sum_.start
+
+        sequence = self.sum_.view(n_frames)
+        weights = self.weight_.view(n_frames).data
+
+        data = np.full(sequence.data.shape, np.NAN,
+                       dtype=sequence.data.dtype)
+        np.divide(sequence.data, weights, out=data, where=weights > 0)
+
+        self.sum_.discard(index)
+        self.weight_.discard(index)
+
+        return SlidingWindowFeature(data, sequence.sliding_window)
+
     def __call__(self, sequence=Stream.NoNewData):
 
         if isinstance(sequence, More):
@@ -422,8 +923,7 @@ class StreamAggregate(object):
                 return Stream.EndOfStream
 
             self.initialized_ = False
-            data = self.agg_func(self.buffer_, axis=0)
-            return SlidingWindowFeature(data, self.frames_)
+            return self.pop()
 
         if not self.initialized_:
             return self.initialize(sequence)
@@ -432,33 +932,15 @@ class StreamAggregate(object):
         sw = sequence.sliding_window
         assert sw.duration == self.frames_.duration
         assert sw.step == self.frames_.step
-        assert sw.start > self.frames_.start
-
-        delta_start = sw.start - self.frames_.start
-        ready = self.frames_.samples(delta_start, mode='center')
-        data = self.agg_func(self.buffer_[:, :ready], axis=0)
-        output = SlidingWindowFeature(data, self.frames_)
 
-        self.buffer_ = self.buffer_[:, ready:]
-        self.frames_ = SlidingWindow(start=sw.start,
-                                     duration=sw.duration,
-                                     step=sw.step)
-
-        # remove empty (all NaN) buffers
-        n_buffers = self.buffer_.shape[0]
-        for i in range(n_buffers):
-            if np.any(~np.isnan(self.buffer_[i])):
-                break
-        self.buffer_ = self.buffer_[i:]
+        # absolute index of first frame
+        index = int(np.rint((sw.start - self.frames_.start) / sw.step))
+        assert index > self.last_
+        self.last_ = index
 
-        n_samples = self.buffer_.shape[1]
-        n_new_samples = sequence.data.shape[0]
-        pad_width = ((0, 1), (0, max(0, n_new_samples - n_samples)))
-        for _ in sequence.data.shape[1:]:
-            pad_width += ((0, 0), )
-        self.buffer_ = np.pad(self.buffer_, pad_width, 'constant',
-                              constant_values=np.NAN)
-        self.buffer_[-1] = sequence.data
+        # frames before the start of this sequence will not be updated anymore
+        output = self.pop(index=index)
+        self.add(index, sequence.data)
 
         return output
 
@@ -496,103 +978,516 @@ class StreamProcess(object):
 
 
 class StreamPredict(object):
-    def __init__(self, model, dimension=None):
+    """This module applies a (PyTorch) sequence labeling model
+
+    Parameters
+    ----------
+    model : `nn.Module`
+        Sequence labeling model (e.g. `StackedRNN` or `PyanNet`).
+    dimension : int, optional
+        Only return this dimension of the model output. Defaults to returning
+        all dimensions.
+    stateful : bool, optional
+        Set to True to process input sequences as consecutive chunks of one
+        long sequence, carrying recurrent hidden state from one chunk to the
+        next (i.e. per-frame cost does not depend on sequence duration).
+        Requires a model whose `supports_stateful` attribute is True (e.g. a
+        mono-directional `StackedRNN`). Defaults to False, i.e. process input
+        sequences (e.g. overlapping windows from `StreamBuffer`)
+        independently.
+    batch_size : int, optional
+        When not `stateful`, windows that are ready at the same time (i.e.
+        wrapped into `More` instances) are processed by batches of (at most)
+        `batch_size`. Defaults to 32.
+    device : torch.device, optional
+        Defaults to CPU.
+    """
+
+    def __init__(self, model, dimension=None, stateful=False, batch_size=32,
+                 device=None):
 
         super(StreamPredict, self).__init__()
-        self.model = model
+
+        import torch
+        self.device = torch.device('cpu') if device is None \
+                                          else torch.device(device)
+        self.model = model.eval().to(self.device)
         self.dimension = dimension
 
-    def __call__(self, sequence=Stream.NoNewData):
+        if stateful and not getattr(self.model, 'supports_stateful', False):
+            msg = (f'{self.model.__class__.__name__} model does not support '
+                   f'"stateful" mode.')
+            raise ValueError(msg)
+        self.stateful = stateful
+        self.batch_size = batch_size
 
-        if isinstance(sequence, More):
-            sequence = sequence.output
+        self.frame_info_ = getattr(self.model, 'frame_info_', None)
+        self.frame_crop_ = getattr(self.model, 'frame_crop', 'center')
 
-        if sequence in [Stream.NoNewData, Stream.EndOfStream]:
-            return sequence
+        # pending input sequences and ready output sequences
+        self.pending_ = []
+        self.ready_ = []
+
+        self.hidden_ = None
+
+    def _forward(self, X, hidden=None):
+
+        import torch
+        with torch.no_grad():
+            X = torch.tensor(X, dtype=torch.float32, device=self.device)
+            if self.stateful:
+                fX, hidden = self.model(X, hidden=hidden, return_hidden=True)
+            else:
+                fX = self.model(X)
+        return fX.detach().to('cpu').numpy(), hidden
 
-        X = sequence.data[np.newaxis, :, :]
+    def _wrap(self, sequence, predicted, pooled=False):
+        """Wrap predictions with the correct time base"""
 
-        predicted = self.model.predict(X, batch_size=1)[0, :, :]
         if self.dimension is not None:
-            predicted = predicted[:, self.dimension]
+            predicted = predicted[..., self.dimension]
+
+        extent = sequence.getExtent()
+
+        # one prediction per sequence (e.g. temporal pooling)
+        if pooled:
+            sw = SlidingWindow(start=extent.start,
+                               duration=extent.duration,
+                               step=extent.duration)
+            return SlidingWindowFeature(predicted[np.newaxis], sw)
+
+        # model has its own frames (e.g. SincNet on waveform)
+        if self.frame_info_ is not None:
+            frames = self.frame_info_
+            index = frames.crop(extent, mode=self.frame_crop_,
+                                fixed=extent.duration)[0]
+            sw = SlidingWindow(start=frames[index].start,
+                               duration=frames.duration,
+                               step=frames.step)
+            return SlidingWindowFeature(predicted, sw)
 
         return SlidingWindowFeature(predicted, sequence.sliding_window)
 
+    def _process_pending(self):
+        """Process pending sequences by batches of same-length sequences"""
+
+        pending, self.pending_ = self.pending_, []
+        while pending:
+            n_samples = len(pending[0].data)
+            batch = []
+            while pending and len(batch) < self.batch_size and \
+                  len(pending[0].data) == n_samples:
+                batch.append(pending.pop(0))
+            fX, _ = self._forward(np.stack([s.data for s in batch]))
+            pooled = fX.ndim == 2
+            for sequence, predicted in zip(batch, fX):
+                self.ready_.append(self._wrap(sequence, predicted,
+                                              pooled=pooled))
+
+    def _pop(self):
+        """Return next ready output (wrapped into `More` if more is ready)"""
+        output = self.ready_.pop(0)
+        if self.ready_:
+            output = More(output)
+        return output
+
+    def __call__(self, sequence=Stream.NoNewData):
+
+        more = isinstance(sequence, More)
+        if more:
+            sequence = sequence.output
+
+        if self.stateful:
+
+            if sequence is Stream.EndOfStream:
+                self.hidden_ = None
+
+            if sequence in [Stream.NoNewData, Stream.EndOfStream]:
+                return sequence
+
+            X = sequence.data[np.newaxis]
+            fX, self.hidden_ = self._forward(X, hidden=self.hidden_)
+            output = self._wrap(sequence, fX[0])
+            return More(output) if more else output
+
+        if sequence not in [Stream.NoNewData, Stream.EndOfStream]:
+
+            # windows are usually views of StreamBuffer internal buffer
+            # and may not outlive this call: copy them
+            self.pending_.append(SlidingWindowFeature(
+                np.array(sequence.data), sequence.sliding_window))
+
+            # more sequences are coming right away: wait for them (unless
+            # there are enough of them already)
+            if more and len(self.pending_) < self.batch_size:
+                return Stream.NoNewData if not self.ready_ else self._pop()
+
+        if self.pending_:
+            self._process_pending()
+
+        if self.ready_:
+            return self._pop()
+
+        return sequence
+
 
 class StreamEmbed(object):
-    def __init__(self, model):
+    """This module embeds (fixed-duration) windows with a (PyTorch) embedding
+    model
+
+    Windows (e.g. from `StreamBuffer`) are embedded by micro-batches: they
+    are queued until either `batch_size` of them are pending, the stream has
+    moved `latency` seconds past the end of the oldest pending one, or the
+    input stream ends.
+
+    Parameters
+    ----------
+    model : `nn.Module`
+        Embedding model (e.g. `TristouNet` or `PyanNet` in representation
+        learning mode) returning one embedding per input sequence.
+    step : float, optional
+        Step between consecutive windows, in seconds (i.e. `StreamBuffer`
+        step). Used to build the time base of output embeddings so that they
+        can be concatenated with `StreamAccumulate`. Defaults to inferring it
+        from the first two windows (the first window is therefore only
+        embedded once the second one is received).
+    batch_size : int, optional
+        Maximum number of windows embedded at once. Defaults to 32.
+    latency : float, optional
+        Maximum delay (in seconds of stream time) between the end of a window
+        and its embedding. Defaults to 0, i.e. windows available at the same
+        time (wrapped into `More` instances) are embedded together, but no
+        window is kept waiting for the next input.
+    device : torch.device, optional
+        Defaults to CPU.
+
+    Returns
+    -------
+    embeddings : `SlidingWindowFeature`
+        (n_windows, dimension) embeddings of consecutive windows.
+    """
+
+    def __init__(self, model, step=None, batch_size=32, latency=0.,
+                 device=None):
 
         super(StreamEmbed, self).__init__()
-        self.model = model
 
-        import keras.backend as K
+        import torch
+        self.device = torch.device('cpu') if device is None \
+                                          else torch.device(device)
+        self.model = model.eval().to(self.device)
 
-        output_layer = self.model.get_layer(index=-1)
+        self.step = step
+        self.batch_size = batch_size
+        self.latency = latency
 
-        input_layer = self.model.get_layer(name='input')
-        K_func = K.function(
-            [input_layer.input, K.learning_phase()], [output_layer.output])
+        # pending windows, as (extent, data) tuples, and ready embeddings
+        self.pending_ = []
+        self.ready_ = []
 
-        def embed(batch):
-            return K_func([batch, 0])[0]
-        self.embed_ = embed
+        # time base of embeddings (defined by the first window)
+        self.windows_ = None
+        self.step_ = step
+        self.last_start_ = None
 
+    @property
+    def dimension(self):
+        """Dimension of embeddings"""
+        return self.model.dimension
+
+    def _embed(self, X):
+
+        import torch
+        with torch.no_grad():
+            X = torch.tensor(X, dtype=torch.float32, device=self.device)
+            fX = self.model(X).detach().to('cpu').numpy()
+
+        if fX.ndim != 2:
+            msg = (f'{self.model.__class__.__name__} model must return one '
+                   f'embedding per sequence (e.g. using temporal pooling).')
+            raise ValueError(msg)
+
+        return fX
+
+    def _process_pending(self):
+        """Embed pending windows by batches of consecutive same-length
+        windows"""
+
+        pending, self.pending_ = self.pending_, []
+        while pending:
+            n_samples = len(pending[0][1])
+            batch = []
+            while pending and len(batch) < self.batch_size and \
+                  len(pending[0][1]) == n_samples:
+                batch.append(pending.pop(0))
+
+            fX = self._embed(np.stack([data for _, data in batch]))
+
+            # windows are aligned on input frames: snap them to a regular
+            # grid defined by the first window so that consecutive batches
+            # share a common time base
+            extent = batch[0][0]
+            if self.windows_ is None:
+                # step is only unknown when the stream has a single window
+                step = extent.duration if self.step_ is None else self.step_
+                self.windows_ = SlidingWindow(start=extent.start,
+                                              duration=extent.duration,
+                                              step=step)
+                self.n_samples_ = n_samples
+            windows = self.windows_
+            index = int(np.rint((extent.start - windows.start) / windows.step))
+            duration = windows.duration if n_samples == self.n_samples_ \
+                                        else extent.duration
+            sw = SlidingWindow(start=windows[index].start,
+                               duration=duration,
+                               step=windows.step)
+            self.ready_.append(SlidingWindowFeature(fX, sw))
+
+    def _check_step(self, extent):
+        """Infer (or check) step between consecutive windows"""
+
+        if self.last_start_ is not None:
+            spacing = extent.start - self.last_start_
+            if self.step_ is None:
+                if spacing <= 0:
+                    msg = (f'Windows are expected to be in chronological '
+                           f'order (got {extent.start:g}s after '
+                           f'{self.last_start_:g}s).')
+                    raise ValueError(msg)
+                self.step_ = spacing
+
+            # windows are aligned on input frames: allow some jitter
+            elif abs(spacing - self.step_) > 0.5 * self.step_:
+                msg = (f'Windows are expected to be {self.step_:g}s apart '
+                       f'(got {spacing:g}s): `step` must be set to the step '
+                       f'of incoming windows (e.g. `StreamBuffer` step).')
+                raise ValueError(msg)
+
+        self.last_start_ = extent.start
+
+    def _pop(self):
+        """Return next ready embeddings (wrapped into `More` if more are
+        ready)"""
+        output = self.ready_.pop(0)
+        if self.ready_:
+            output = More(output)
+        return output
 
     def __call__(self, sequence=Stream.NoNewData):
 
-        if isinstance(sequence, More):
+        more = isinstance(sequence, More)
+        if more:
             sequence = sequence.output
 
-        if sequence in [Stream.NoNewData, Stream.EndOfStream]:
-            return sequence
+        if sequence not in [Stream.NoNewData, Stream.EndOfStream]:
+
+            # windows are usually views of StreamBuffer internal buffer
+            # and may not outlive this call: copy them
+            extent = sequence.getExtent()
+            self._check_step(extent)
+            self.pending_.append((extent, np.array(sequence.data)))
+
+            # step is inferred from the first two windows: wait for the
+            # second one before embedding anything
+            if self.step_ is None:
+                return Stream.NoNewData if not self.ready_ else self._pop()
+
+            # more windows are coming right away or oldest pending window
+            # may wait a bit longer: wait (unless there are enough of them)
+            wait = more or \
+                extent.end - self.pending_[0][0].end < self.latency
+            if wait and len(self.pending_) < self.batch_size:
+                return Stream.NoNewData if not self.ready_ else self._pop()
+
+        # NoNewData does not tell how far the stream has moved: only embed
+        # pending windows if they are not allowed to wait at all (and if
+        # their step is known, unless the stream ends)
+        if self.pending_ and (sequence is not Stream.NoNewData or
+                              not self.latency) and \
+           (self.step_ is not None or sequence is Stream.EndOfStream):
+            self._process_pending()
 
-        X = sequence.data[np.newaxis, :, :]
-        embedded = self.embed_(X)[0]
+        if sequence is Stream.EndOfStream:
+            self.windows_ = None
+            self.step_ = self.step
+            self.last_start_ = None
 
-        raise NotImplementedError('')
-        # data = ????
-        # extent = sequence.getExtent()
-        # sw = SlidingWindow(duration=extent.duration,
-        #                    step=?????,
-        #                    start=extent.start)
-        # return SlidingWindowFeature(data, ew)
+        if self.ready_:
+            return self._pop()
+
+        return sequence
 
 
 class Pipeline(object):
+    """Incremental pipeline of stream modules
+
+    Parameters
+    ----------
+    dsk : `dict`
+        Task graph, using the dask convention: each key maps to a task
+        `(module, *args)` where arguments that are keys of the graph (or the
+        special 'input' key) are replaced by the corresponding output, and
+        other arguments are passed as is. For instance:
+            {'buffer': (StreamBuffer(duration=2.), 'input'),
+             'predict': (StreamPredict(model), 'buffer')}
+    history : int, optional
+        Number of most recent calls used to estimate (per-module) latency
+        percentiles. Defaults to 1000.
+
+    Notes
+    -----
+    The graph is topologically sorted once and for all. At each step, modules
+    are called in that order, skipping those whose inputs are all
+    `Stream.NoNewData` (unless they asked to be called again by returning a
+    `More` instance at previous step).
 
-    def __init__(self, dsk):
+    Usage
+    -----
+    >>> pipeline = Pipeline(dsk)
+    >>> for outputs in pipeline(stream_features(feature_extraction, current_file)):
+    ...     # outputs['predict'] is the output of 'predict' module
+    ...     pass
+    >>> pipeline.timing['predict']
+    {'calls': ..., 'total': ..., 'p99': ...}
+    """
+
+    def __init__(self, dsk, history=1000):
         super(Pipeline, self).__init__()
-        # TODO -- check that at least one input depends on 'input'
         self.dsk = dsk
+        self.history = history
         self.t_ = Segment(0, 0)
+        self.compile()
 
     @property
     def t(self):
         return self.t_
 
+    def compile(self):
+        """Topologically sort the task graph"""
+
+        keys = set(self.dsk) | {'input'}
+
+        def is_key(arg):
+            try:
+                return arg in keys
+            except TypeError:  # e.g. unhashable argument
+                return False
+
+        # split tasks into modules and (resolved) arguments where each
+        # argument is either a key or a constant
+        nodes, dependencies = {}, {}
+        for key, task in self.dsk.items():
+            module, *args = task
+            args = [(True, arg) if is_key(arg) else (False, arg)
+                    for arg in args]
+            inputs = [arg for is_k, arg in args if is_k]
+            nodes[key] = (module, args, inputs)
+            dependencies[key] = set(inputs)
+
+        if not any('input' in deps for deps in dependencies.values()):
+            msg = 'At least one module must depend on "input".'
+            raise ValueError(msg)
+
+        # Kahn's algorithm (sorted for reproducibility)
+        order, done = [], {'input'}
+        todo = sorted(self.dsk)
+        while todo:
+            ready = [key for key in todo if dependencies[key] <= done]
+            if not ready:
+                msg = (f'Task graph contains a cycle involving '
+                       f'{", ".join(todo)}.')
+                raise ValueError(msg)
+            order.extend(ready)
+            done.update(ready)
+            todo = [key for key in todo if key not in done]
+
+        self.keys_ = sorted(keys)
+        self.nodes_ = [(key, ) + nodes[key] for key in order]
+        self.reset_timing()
+
+    def reset_timing(self):
+        """Reset per-module timing counters"""
+        self.calls_ = {key: 0 for key in self.dsk}
+        self.total_ = {key: 0. for key in self.dsk}
+        self.durations_ = {key: deque(maxlen=self.history)
+                           for key in self.dsk}
+
+    @property
+    def timing(self):
+        """Per-module timing counters
+
+        Returns
+        -------
+        timing : `dict`
+            Maps each module key to a {'calls': int, 'total': float,
+            'p99': float} dictionary providing the number of calls, the total
+            time spent in the module, and the 99th percentile of the latency
+            of one call (over the `history` most recent ones). Durations are
+            in seconds.
+        """
+        timing = {}
+        for key in self.dsk:
+            durations = self.durations_[key]
+            timing[key] = {
+                'calls': self.calls_[key],
+                'total': self.total_[key],
+                'p99': np.percentile(durations, 99) if durations else np.NAN}
+        return timing
+
     def __call__(self, input_buffer):
 
-        keys = sorted(['input'] + list(self.dsk.keys()))
-        more = False
+        calls, total, durations = self.calls_, self.total_, self.durations_
+
+        # modules that returned a `More` instance at previous step
+        more = set()
+        eos = False
 
         while True:
 
+            # one of the modules has more to say: do not consume input yet
             if more:
-                self.dsk['input'] = Stream.NoNewData
-                more = False
+                buf = Stream.NoNewData
             else:
-                buf = next(input_buffer)
-                if buf not in [Stream.EndOfStream, Stream.NoNewData]:
+                buf = Stream.EndOfStream if eos \
+                      else next(input_buffer, Stream.EndOfStream)
+                if buf is Stream.EndOfStream:
+                    eos = True
+                elif buf is not Stream.NoNewData:
                     self.t_ |= buf.getExtent()
-                self.dsk['input'] = buf
 
-            outputs = {key: output
-                       for key, output in zip(keys, dask.get(self.dsk, keys))}
+            # raw outputs are passed along (`More` wrapper included) so that
+            # downstream modules know that more is coming right away
+            outputs = {'input': buf}
+            called = more
+            more = set()
+
+            for key, module, args, inputs in self.nodes_:
+
+                # idle branch: no need to call the module
+                if inputs and key not in called and \
+                   all(outputs[arg] is Stream.NoNewData for arg in inputs):
+                    outputs[key] = Stream.NoNewData
+                    continue
+
+                values = [outputs[arg] if is_key else arg
+                          for is_key, arg in args]
+
+                t0 = time.perf_counter()
+                output = module(*values)
+                duration = time.perf_counter() - t0
+
+                calls[key] += 1
+                total[key] += duration
+                durations[key].append(duration)
+
+                if isinstance(output, More):
+                    more.add(key)
+                outputs[key] = output
 
-            for key in keys:
-                if isinstance(outputs[key], More):
-                    more = True
-                    outputs[key] = outputs[key].output
+            outputs = {key: outputs[key].output
+                            if isinstance(outputs[key], More)
+                            else outputs[key]
+                       for key in self.keys_}
 
             if all(Stream.EndOfStream == o for o in outputs.values()):
                 return
@@ -29,9 +29,6 @@
 
 import numpy as np
 from collections import deque
-from dlib import count_steps_without_decrease
-from dlib import count_steps_without_decrease_robust
-from dlib import probability_that_sequence_is_increasing
 from .callback import Callback
 from tqdm import tqdm
 from scipy.signal import convolve
@@ -94,6 +91,9 @@ class BaseSchedulerCallback(Callback):
         losses = convolve(losses, 3 * np.ones(K // 3) / K,
                           mode='same', method='auto')
 
+        # dlib is slow to import: only do it when actually needed
+        from dlib import probability_that_sequence_is_increasing
+
         # probability that loss has decreased in the last `K` steps.
         probability = [probability_that_sequence_is_increasing(-losses[i-K:i])
                        if i > K else np.NAN for i in range(len(losses))]
@@ -264,6 +264,9 @@ class DavisKingScheduler(BaseSchedulerCallback):
         loss = batch_loss['loss'].detach().cpu().item()
         self.losses_.append(loss)
 
+        from dlib import count_steps_without_decrease
+        from dlib import count_steps_without_decrease_robust
+
         # compute statistics on batch loss trend
         count = count_steps_without_decrease(self.losses_)
         count_robust = count_steps_without_decrease_robust(self.losses_)
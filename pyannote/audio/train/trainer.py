@@ -33,7 +33,6 @@ import tempfile
 from torch.optim import SGD
 from pyannote.audio.train.schedulers import ConstantScheduler
 from pyannote.audio.train.checkpoint import Checkpoint
-from tensorboardX import SummaryWriter
 from .logging import Logging
 from .callback import Callbacks
 
@@ -275,6 +274,7 @@ class Trainer:
         """
 
         # LOGGING
+        from tensorboardX import SummaryWriter
         if log_dir is None:
             self.log_dir_ = tempfile.mkdtemp()
         else:
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# The MIT License (MIT)
+
+# Copyright (c) 2019 CNRS
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# AUTHORS
+# Hervé BREDIN - http://herve.niderb.fr
+
+"""Tests of feature extraction"""
+
+import numpy as np
+import pytest
+
+from pyannote.core import Segment, SlidingWindow
+from pyannote.audio.features.base import FeatureExtraction
+from pyannote.audio.features.with_librosa import LibrosaSpectrogram
+from pyannote.audio.features.with_librosa import LibrosaMFCC
+from pyannote.audio.features.with_librosa import LibrosaMelSpectrogram
+
+
+class FrameIndex(FeatureExtraction):
+    """Dummy feature extraction
+
+    The only feature of each frame is the index (in the whole waveform) of
+    its first sample, so that crops only match if they are aligned the same.
+    """
+
+    LOCAL_FEATURES = True
+
+    def __init__(self, sample_rate=1000, step=0.01, crop_cache=0.):
+        super().__init__(sample_rate=sample_rate, crop_cache=crop_cache)
+        self.step = step
+        self.hop_length_ = int(step * sample_rate)
+        self.sliding_window_ = SlidingWindow(start=-.5 * step,
+                                             duration=step, step=step)
+
+    def get_dimension(self):
+        return 1
+
+    def get_frame_info(self):
+        return self.sliding_window_
+
+    def get_features(self, y, sample_rate):
+        # number of frames of a centered STFT (e.g. librosa)
+        n_frames = 1 + len(y) // self.hop_length_
+        index = y[0, 0] if len(y) else 0.
+        return (index + self.hop_length_ * np.arange(n_frames)).reshape(-1, 1)
+
+
+@pytest.fixture
+def current_file():
+    sample_rate, duration = 1000, 30.
+    waveform = np.arange(int(duration * sample_rate), dtype=np.float64)
+    return {'database': 'Dummy', 'uri': 'dummy',
+            'waveform': waveform.reshape(-1, 1),
+            'duration': duration}
+
+
+@pytest.mark.parametrize('mode, fixed', [('center', True),
+                                         ('center', False),
+                                         ('loose', False),
+                                         ('strict', False)])
+def test_crop_cache(current_file, mode, fixed):
+
+    uncached = FrameIndex()
+    cached = FrameIndex(crop_cache=5.)
+    assert uncached.crop_cache == 0.
+
+    def check(segment):
+        expected = uncached.crop(current_file, segment, mode=mode,
+                                 fixed=segment.duration if fixed else None)
+        actual = cached.crop(current_file, segment, mode=mode,
+                             fixed=segment.duration if fixed else None)
+        np.testing.assert_array_equal(actual, expected)
+
+    # overlapping sliding windows are served from the cache
+    for start in np.arange(0., 25., 0.5):
+        check(Segment(start, start + 2.))
+    assert cached.crop_cache_.data is not None
+
+    # so are (some of) these ones, possibly not aligned on the frame grid
+    random_state = np.random.RandomState(0)
+    for start, duration in zip(random_state.uniform(0., 25., size=100),
+                               random_state.uniform(0.1, 4., size=100)):
+        check(Segment(start, start + duration))
+
+    # near file boundaries
+    check(Segment(0., 1.))
+    check(Segment(current_file['duration'] - 1.,
+                  current_file['duration']))
+
+
+@pytest.fixture
+def noise_file():
+    sample_rate, duration = 16000, 20.
+    random_state = np.random.RandomState(0)
+    waveform = 0.1 * random_state.randn(int(duration * sample_rate), 1)
+    return {'database': 'Dummy', 'uri': 'noise',
+            'waveform': waveform.astype(np.float32),
+            'duration': duration}
+
+
+@pytest.mark.parametrize('mode, fixed', [('center', True),
+                                         ('center', False),
+                                         ('loose', False),
+                                         ('strict', False)])
+def test_crop_cache_spectrogram(noise_file, mode, fixed):
+
+    uncached = LibrosaSpectrogram()
+    cached = LibrosaSpectrogram(crop_cache=5.)
+
+    for start in np.arange(0., 17., 0.5):
+        segment = Segment(start, start + 2.)
+        expected = uncached.crop(noise_file, segment, mode=mode,
+                                 fixed=segment.duration if fixed else None)
+        actual = cached.crop(noise_file, segment, mode=mode,
+                             fixed=segment.duration if fixed else None)
+        np.testing.assert_allclose(actual, expected, rtol=1e-5, atol=1e-6)
+    assert cached.crop_cache_.data is not None
+
+
+@pytest.mark.parametrize('klass, params, rtol, atol', [
+    # magnitude spectrogram: relative precision
+    (LibrosaSpectrogram, {}, 1e-4, 0.),
+    # dB-scaled features: absolute precision
+    (LibrosaMelSpectrogram, {}, 0., 1e-4),
+    (LibrosaMFCC, {}, 0., 1e-4),
+    (LibrosaMFCC, {'e': True, 'De': True, 'DDe': True,
+                   'D': True, 'DD': True}, 0., 1e-4),
+])
+def test_numpy_engine(noise_file, klass, params, rtol, atol):
+
+    y, sample_rate = noise_file['waveform'], 16000
+
+    expected = klass(engine='librosa', **params).get_features(y, sample_rate)
+    actual = klass(engine='numpy', **params).get_features(y, sample_rate)
+
+    assert actual.dtype == np.float32
+    assert actual.shape == expected.shape
+    np.testing.assert_allclose(actual, expected, rtol=rtol, atol=atol)
+
+
+def test_crop_cache_not_local(noise_file):
+
+    # MFCC are relative to the loudest frame of the excerpt
+    with pytest.warns(UserWarning):
+        mfcc = LibrosaMFCC(crop_cache=5.)
+    assert mfcc.crop_cache == 0.
+
+    segment = Segment(1., 3.)
+    np.testing.assert_array_equal(
+        mfcc.crop(noise_file, segment, fixed=segment.duration),
+        LibrosaMFCC().crop(noise_file, segment, fixed=segment.duration))
+
+
+@pytest.mark.parametrize('use_memmap', [False, True])
+def test_cached_feature_extraction(tmp_path, use_memmap):
+
+    import soundfile as sf
+    from pyannote.audio.features.cache import CachedFeatureExtraction
+
+    audio = tmp_path / 'dummy.wav'
+    sf.write(str(audio), np.zeros((1000, 1), dtype=np.float32), 1000)
+    current_file = {'database': 'Dummy', 'uri': 'dummy', 'audio': audio}
+
+    feature_extraction = CachedFeatureExtraction(
+        FrameIndex(), tmp_path / 'cache', use_memmap=use_memmap)
+    expected = feature_extraction(current_file)  # extract and cache
+    actual = feature_extraction(current_file)  # load from cache
+    np.testing.assert_array_equal(actual.data, expected.data)
+
+    # cached features are only memory-mapped on demand
+    assert isinstance(actual.data, np.memmap) == use_memmap
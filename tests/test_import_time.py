@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# The MIT License (MIT)
+
+# Copyright (c) 2019 CNRS
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# AUTHORS
+# Hervé BREDIN - http://herve.niderb.fr
+
+"""Import-time regression tests
+
+Heavy optional dependencies must only be imported when actually needed, so
+that `pyannote-*` command line tools start quickly.
+"""
+
+import sys
+import json
+import subprocess
+
+import pytest
+
+
+# these must not be imported as a side effect of the statements below
+HEAVY_MODULES = ['librosa', 'yaafelib', 'dlib', 'sklearn', 'tensorboardX']
+
+# total (cumulative) import time budget, in seconds
+IMPORT_TIME_BUDGET = 5.
+
+
+def run_with_importtime(statement):
+    """Run `statement` in a fresh interpreter with -X importtime
+
+    Returns
+    -------
+    loaded : list
+        Heavy modules found in `sys.modules` after `statement`.
+    duration : float
+        Total import time, in seconds.
+    """
+
+    code = (
+        f'import sys, json\n'
+        f'{statement}\n'
+        f'print(json.dumps([m for m in {HEAVY_MODULES!r} '
+        f'if m in sys.modules]))\n'
+    )
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                             universal_newlines=True)
+    assert process.returncode == 0, process.stderr
+
+    loaded = json.loads(process.stdout.strip().splitlines()[-1])
+
+    # import time: self [us] | cumulative | imported package
+    duration = 0
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_us = line.split(':', 1)[1].split('|')[0].strip()
+        if self_us.isdigit():
+            duration += int(self_us)
+
+    return loaded, 1e-6 * duration
+
+
+@pytest.mark.parametrize('statement', [
+    'import pyannote.audio.features',
+    'from pyannote.audio.features import Precomputed, RawAudio',
+    'import pyannote.audio.applications.base',
+])
+def test_import_time(statement):
+    loaded, duration = run_with_importtime(statement)
+    assert loaded == [], f'"{statement}" imports {", ".join(loaded)}'
+    assert duration < IMPORT_TIME_BUDGET, \
+        f'"{statement}" takes {duration:.2f}s (budget: {IMPORT_TIME_BUDGET:.2f}s)'
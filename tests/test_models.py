@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# The MIT License (MIT)
+
+# Copyright (c) 2019 CNRS
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# AUTHORS
+# Hervé BREDIN - http://herve.niderb.fr
+
+"""Tests of on-tensor spectral front-ends and PyanNet"""
+
+import numpy as np
+import pytest
+import torch
+
+from pyannote.audio.features.with_librosa import LibrosaMFCC
+from pyannote.audio.features.with_librosa import LibrosaMelSpectrogram
+from pyannote.audio.models import TASK_MULTI_LABEL_CLASSIFICATION
+from pyannote.audio.models.models import PyanNet
+from pyannote.audio.models.spectral import MFCC, MelSpectrogram
+
+
+SAMPLE_RATE = 16000
+
+# frames are 25ms (400 samples) long, every 10ms (160 samples)
+N_FFT, HOP_LENGTH = 400, 160
+
+# `librosa` frame i is centered on sample i x HOP_LENGTH, i.e. it starts at
+# sample i x HOP_LENGTH - N_FFT // 2 (of the reflect-padded waveform), while
+# on-tensor frame j starts at sample j x HOP_LENGTH of its input. Feeding
+# waveform[SHIFT:] to the latter makes its j-th frame match the former's
+# (j + OFFSET)-th frame.
+OFFSET = 2
+SHIFT = OFFSET * HOP_LENGTH - N_FFT // 2
+
+
+@pytest.fixture
+def waveform():
+    random_state = np.random.RandomState(0)
+    return (0.1 * random_state.randn(3 * SAMPLE_RATE, 1)).astype(np.float32)
+
+
+def to_tensor(waveform):
+    return torch.tensor(waveform[np.newaxis])
+
+
+def test_n_frames(waveform):
+
+    expected = LibrosaMFCC().get_features(waveform, SAMPLE_RATE)
+    with torch.no_grad():
+        actual = MFCC()(to_tensor(waveform))[0].numpy()
+
+    # centered (padded) frames vs. non-centered frames
+    assert len(expected) == 1 + len(waveform) // HOP_LENGTH == 301
+    assert len(actual) == 1 + (len(waveform) - N_FFT) // HOP_LENGTH == 298
+    assert actual.shape[1] == expected.shape[1] == MFCC().dimension
+
+
+def test_melspectrogram(waveform):
+
+    # log-mel spectrogram, before dynamic range compression
+    expected = LibrosaMelSpectrogram().get_log_mel(waveform, SAMPLE_RATE)
+    with torch.no_grad():
+        actual = MelSpectrogram(ref=1.0, top_db=None)(
+            to_tensor(waveform[SHIFT:]))[0].numpy()
+
+    expected = expected[OFFSET:OFFSET + len(actual)]
+    assert len(expected) == len(actual)
+    np.testing.assert_allclose(actual, expected, rtol=1e-3, atol=1e-2)
+
+
+@pytest.mark.parametrize('params', [
+    {},
+    {'e': True, 'De': True, 'DDe': True, 'D': True, 'DD': True},
+    {'e': True, 'De': False, 'DDe': False, 'D': False, 'DD': False},
+])
+def test_mfcc(waveform, params):
+
+    expected = LibrosaMFCC(**params).get_features(waveform, SAMPLE_RATE)
+    with torch.no_grad():
+        actual = MFCC(**params)(to_tensor(waveform[SHIFT:]))[0].numpy()
+
+    expected = expected[OFFSET:OFFSET + len(actual)]
+    assert len(expected) == len(actual)
+
+    # derivatives of the first and last 4 frames are computed differently
+    # (polynomial fit on first and last 9 frames) so they are skipped
+    np.testing.assert_allclose(actual[4:-4], expected[4:-4],
+                               rtol=1e-3, atol=1e-2)
+
+
+@pytest.mark.parametrize('frontend', [{'mfcc': {}},
+                                      {'melspectrogram': {}},
+                                      {'mfcc': {'e': True, 'coefs': 12}}])
+def test_pyannet_frontend(frontend):
+
+    specifications = {'task': TASK_MULTI_LABEL_CLASSIFICATION,
+                      'X': {'dimension': 1},
+                      'y': {'classes': ['A', 'B', 'C']}}
+    model = PyanNet(specifications, **frontend)
+    assert model.frontend_ is not None
+    assert model.frame_info_.step == HOP_LENGTH / SAMPLE_RATE
+
+    batch_size, n_samples = 4, 2 * SAMPLE_RATE
+    waveforms = torch.randn(batch_size, n_samples, 1)
+    with torch.no_grad():
+        output = model(waveforms)
+
+    n_frames = 1 + (n_samples - N_FFT) // HOP_LENGTH
+    assert output.shape == (batch_size, n_frames, 3)
+    assert torch.all((output >= 0.) & (output <= 1.))
+
+
+def test_pyannet_single_frontend():
+    specifications = {'task': TASK_MULTI_LABEL_CLASSIFICATION,
+                      'X': {'dimension': 1},
+                      'y': {'classes': ['A']}}
+    with pytest.raises(ValueError):
+        PyanNet(specifications, mfcc={}, melspectrogram={})
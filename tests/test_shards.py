@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# The MIT License (MIT)
+
+# Copyright (c) 2019 CNRS
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# AUTHORS
+# Hervé BREDIN - http://herve.niderb.fr
+
+"""Tests of sharded feature storage"""
+
+import numpy as np
+
+from pyannote.audio.features.shards import ShardedStorage
+
+
+def test_incremental_index(tmp_path):
+
+    writer = ShardedStorage(tmp_path)
+    reader = ShardedStorage(tmp_path)
+
+    data = np.arange(12, dtype=np.float32).reshape(4, 3)
+    writer.write('a', data)
+    assert 'a' in reader
+    assert 'b' not in reader
+    np.testing.assert_array_equal(reader.read('a', start=1, end=3), data[1:3])
+
+    # lines appended by other writers are picked up...
+    writer.write('b', 2 * data)
+    assert 'b' in reader
+    np.testing.assert_array_equal(reader.read('b'), 2 * data)
+
+    # ... but only once they are complete
+    foreign = tmp_path / 'other-0.idx'
+    line = f'c\t{writer.entry("a")[0]}\t0\t4x3\t{data.dtype.str}\n'
+    with open(foreign, 'w') as f:
+        f.write(line[:5])
+    assert 'c' not in reader
+    with open(foreign, 'a') as f:
+        f.write(line[5:])
+    assert 'c' in reader
+    np.testing.assert_array_equal(reader.read('c'), data)
+
+    # every index file has been read exactly up to its end
+    for path in tmp_path.glob('*.idx'):
+        assert reader.offsets_[path.name] == path.stat().st_size
+
+    # own writes do not need re-parsing
+    writer.load_index()
+    writer.write('d', data)
+    assert writer.offsets_[f'{writer.writer}.idx'] == \
+        (tmp_path / f'{writer.writer}.idx').stat().st_size
@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+# The MIT License (MIT)
+
+# Copyright (c) 2019 CNRS
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# AUTHORS
+# Hervé BREDIN - http://herve.niderb.fr
+
+"""Equivalence tests of stream modules against reference implementations"""
+
+import warnings
+
+import numpy as np
+import pytest
+
+from pyannote.core import Segment, Timeline
+from pyannote.core import SlidingWindow, SlidingWindowFeature
+from pyannote.audio.stream import Stream, More
+from pyannote.audio.stream import StreamBinarize, StreamToTimeline
+from pyannote.audio.stream import StreamAggregate
+
+
+STEP = 0.01
+
+
+class LoopBinarize(object):
+    """Reference (per-frame hysteresis loop) implementation of StreamBinarize"""
+
+    def __init__(self, onset=0.5, offset=0.5):
+        super().__init__()
+        self.onset = onset
+        self.offset = offset
+        self.initialized_ = False
+
+    def __call__(self, sequence):
+
+        if not self.initialized_:
+            self.active_ = sequence.data[0] > self.onset
+            self.initialized_ = True
+
+        binarized = np.zeros(sequence.data.shape, dtype=bool)
+        for i, y in enumerate(sequence.data):
+            # same as "if active: ~(y < offset) else: y > onset", applied
+            # independently to every dimension
+            self.active_ = np.where(self.active_, ~(y < self.offset),
+                                    y > self.onset)
+            binarized[i] = self.active_
+
+        return SlidingWindowFeature(binarized, sequence.sliding_window)
+
+
+def loop_to_timeline(sequence):
+    """Reference (per-frame loop) implementation of StreamToTimeline"""
+
+    data = sequence.data
+    active = data[0]
+
+    sw = sequence.sliding_window
+    start = sw[0].middle
+
+    timeline = Timeline()
+    timeline.start = start
+
+    for i, y in enumerate(data):
+        if active and not y:
+            segment = Segment(start, sw[i].middle)
+            timeline.add(segment)
+            active = False
+        elif not active and y:
+            active = True
+            start = sw[i].middle
+
+    if active:
+        segment = Segment(start, sw[i].middle)
+        timeline.add(segment)
+
+    timeline.end = sw[i].middle
+
+    return timeline
+
+
+def random_chunks(data, random_state):
+    """Split `data` into chunks of random size (including size 1)"""
+
+    n_frames = len(data)
+    i = 0
+    while i < n_frames:
+        size = random_state.choice([1, 1, 2, 3, 7, 20, 100])
+        frames = SlidingWindow(start=i * STEP, duration=STEP, step=STEP)
+        yield SlidingWindowFeature(data[i:i + size], frames)
+        i += size
+
+
+def random_scores(n_frames, dimension, random_state, nan_ratio=0.):
+    scores = random_state.rand(n_frames, dimension)
+    # make long runs above/below thresholds likely
+    scores = scores * 0.2 + np.repeat(
+        random_state.rand(n_frames // 10 + 1, dimension), 10, axis=0)[:n_frames]
+    scores[random_state.rand(n_frames, dimension) < nan_ratio] = np.NAN
+    return scores
+
+
+@pytest.mark.parametrize('seed', range(10))
+@pytest.mark.parametrize('onset, offset', [(0.5, 0.5),
+                                           (0.7, 0.3),
+                                           (0.3, 0.7),
+                                           (0.6, 0.6)])
+@pytest.mark.parametrize('dimension', [1, 3])
+@pytest.mark.parametrize('nan_ratio', [0., 0.1])
+def test_binarize(seed, onset, offset, dimension, nan_ratio):
+
+    random_state = np.random.RandomState(seed)
+    scores = random_scores(500, dimension, random_state, nan_ratio=nan_ratio)
+
+    reference = LoopBinarize(onset=onset, offset=offset)
+    binarize = StreamBinarize(onset=onset, offset=offset)
+
+    for chunk in random_chunks(scores, random_state):
+        expected = reference(chunk)
+        actual = binarize(chunk)
+        assert actual.data.dtype == np.bool_
+        np.testing.assert_array_equal(actual.data, expected.data)
+        assert actual.sliding_window.start == expected.sliding_window.start
+
+    # end-of-stream is passed through, and so is "no new data"
+    assert binarize(Stream.EndOfStream) == Stream.EndOfStream
+    assert binarize(Stream.NoNewData) is Stream.NoNewData
+
+
+def test_binarize_more():
+
+    scores = np.array([[0.1], [0.9], [0.4]])
+    frames = SlidingWindow(start=0., duration=STEP, step=STEP)
+    sequence = SlidingWindowFeature(scores, frames)
+
+    expected = LoopBinarize()(sequence)
+    actual = StreamBinarize()(More(sequence))
+    np.testing.assert_array_equal(actual.data, expected.data)
+
+
+@pytest.mark.parametrize('seed', range(10))
+@pytest.mark.parametrize('nan_ratio', [0., 0.1])
+def test_to_timeline(seed, nan_ratio):
+
+    random_state = np.random.RandomState(seed)
+    scores = random_scores(500, 1, random_state, nan_ratio=nan_ratio)
+
+    binarize = StreamBinarize(onset=0.7, offset=0.3)
+    to_timeline = StreamToTimeline()
+
+    for chunk in random_chunks(scores, random_state):
+        binarized = binarize(chunk)
+        expected = loop_to_timeline(binarized)
+        actual = to_timeline(binarized)
+        assert list(actual) == list(expected)
+        assert actual.start == expected.start
+        assert actual.end == expected.end
+
+    assert to_timeline(Stream.EndOfStream) == Stream.EndOfStream
+    assert to_timeline(Stream.NoNewData) is Stream.NoNewData
+
+
+@pytest.mark.parametrize('agg_func', [np.nanmean, np.mean])
+def test_aggregate(agg_func):
+
+    random_state = np.random.RandomState(0)
+    n_frames, step, n_sequences, dimension = 20, 5, 10, 2
+
+    # overlapping sequences, with some NaN values
+    sequences = random_state.rand(n_sequences, n_frames, dimension)
+    sequences[random_state.rand(*sequences.shape) < 0.1] = np.NAN
+
+    # reference: aggregate NaN-padded sequences stacked on a common time base
+    total = (n_sequences - 1) * step + n_frames
+    stacked = np.full((n_sequences, total, dimension), np.NAN)
+    covered = np.zeros((n_sequences, total, 1), dtype=bool)
+    for i, data in enumerate(sequences):
+        stacked[i, i * step:i * step + n_frames] = data
+        covered[i, i * step:i * step + n_frames] = True
+    if agg_func is np.nanmean:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', category=RuntimeWarning)
+            expected = np.nanmean(stacked, axis=0)
+    else:
+        expected = np.where(covered, stacked, 0.).sum(axis=0) / \
+                   covered.sum(axis=0)
+
+    aggregate = StreamAggregate(agg_func=agg_func)
+    outputs = []
+    for i, data in enumerate(sequences):
+        frames = SlidingWindow(start=i * step * STEP, duration=STEP,
+                               step=STEP)
+        output = aggregate(SlidingWindowFeature(data, frames))
+        if output is not Stream.NoNewData:
+            outputs.append(output.data)
+    outputs.append(aggregate(Stream.EndOfStream).data)
+
+    np.testing.assert_allclose(np.vstack(outputs), expected)
+
+
+def test_aggregate_unsupported():
+    with pytest.raises(ValueError):
+        StreamAggregate(agg_func=np.nanmedian)